@@ -0,0 +1,243 @@
+"""
+Async versions of the hot API handlers, backed by models.get_async_db.
+
+main.py and mcp_server.py mount these routers ahead of their sync handlers when
+ITINERARY_DB_MODE=async, so the same paths are served without holding a
+threadpool worker for the duration of each database round trip. Request and
+response formats are identical to the sync handlers.
+"""
+from fastapi import APIRouter, Depends, Header, HTTPException, Path, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select, tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+import models
+import schemas
+import pagination
+import recommendations
+import recommendation_index
+import similarity
+import response_cache
+import fulltext
+import summaries
+import changes
+import idempotency
+import serializers
+import settings
+
+itinerary_router = APIRouter(include_in_schema=False)
+recommendation_router = APIRouter(include_in_schema=False)
+
+
+@itinerary_router.get("/api/itineraries", response_model=List[schemas.Itinerary])
+async def get_itineraries_async(
+    request: Request,
+    skip: int = 0,
+    limit: int = 100,
+    db: AsyncSession = Depends(models.get_async_db)
+):
+    cache_key = f"itineraries:{skip}:{limit}"
+    generation = response_cache.cache.generation()
+    entry = response_cache.cache.get(cache_key, generation)
+    if entry is not None:
+        return response_cache.conditional_response(request, entry, "HIT")
+
+    if settings.SERIALIZATION_MODE == "fast":
+        itineraries = (await db.execute(serializers.itinerary_rows().offset(skip).limit(limit))).all()
+        content = await db.run_sync(lambda session: serializers.build_itineraries(session, itineraries))
+        body = serializers.dumps(content)
+    else:
+        result = await db.execute(
+            select(models.Itinerary)
+            .options(*models.itinerary_load_options("selectin"))
+            .offset(skip)
+            .limit(limit)
+        )
+        itineraries = result.scalars().all()
+        body = serializers.serialize_itineraries(itineraries)
+    entry = response_cache.cache.put(cache_key, body, serializers.last_modified(itineraries), generation)
+    return response_cache.conditional_response(request, entry, "MISS")
+
+
+@itinerary_router.get("/api/itineraries/page", response_model=schemas.ItineraryPage)
+async def get_itineraries_page_async(
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(models.get_async_db)
+):
+    statement = select(models.Itinerary).options(*models.itinerary_load_options("selectin"))
+    if cursor:
+        try:
+            created_at, last_id = pagination.decode_cursor(cursor)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+        statement = statement.where(
+            tuple_(models.Itinerary.created_at, models.Itinerary.id) > tuple_(created_at, last_id)
+        )
+
+    result = await db.execute(
+        statement.order_by(models.Itinerary.created_at, models.Itinerary.id).limit(limit + 1)
+    )
+    itineraries = result.scalars().all()
+    next_cursor = None
+    if len(itineraries) > limit:
+        itineraries = itineraries[:limit]
+        last = itineraries[-1]
+        next_cursor = pagination.encode_cursor(last.created_at, last.id)
+    return {"items": itineraries, "next_cursor": next_cursor}
+
+
+@itinerary_router.get("/api/itineraries/{itinerary_id:int}", response_model=schemas.Itinerary)
+async def get_itinerary_async(
+    request: Request,
+    itinerary_id: int,
+    db: AsyncSession = Depends(models.get_async_db)
+):
+    cache_key = f"itinerary:{itinerary_id}"
+    generation = response_cache.cache.generation()
+    entry = response_cache.cache.get(cache_key, generation)
+    if entry is not None:
+        return response_cache.conditional_response(request, entry, "HIT")
+
+    if settings.SERIALIZATION_MODE == "fast":
+        itinerary = (await db.execute(
+            serializers.itinerary_rows().where(models.Itinerary.id == itinerary_id)
+        )).first()
+        if itinerary is None:
+            raise HTTPException(status_code=404, detail="Itinerary not found")
+        content = await db.run_sync(lambda session: serializers.build_itineraries(session, [itinerary]))
+        body = serializers.dumps(content[0])
+    else:
+        result = await db.execute(
+            select(models.Itinerary)
+            .options(*models.itinerary_load_options("joined"))
+            .where(models.Itinerary.id == itinerary_id)
+        )
+        itinerary = result.unique().scalars().first()
+        if itinerary is None:
+            raise HTTPException(status_code=404, detail="Itinerary not found")
+        body = serializers.serialize_itinerary(itinerary)
+    entry = response_cache.cache.put(cache_key, body, serializers.last_modified([itinerary]), generation)
+    return response_cache.conditional_response(request, entry, "MISS")
+
+
+@itinerary_router.post("/api/itineraries", response_model=schemas.Itinerary)
+async def create_itinerary_async(
+    itinerary: schemas.ItineraryCreate,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, max_length=idempotency.MAX_KEY_LENGTH),
+    db: AsyncSession = Depends(models.get_async_db)
+):
+    fingerprint = None
+    if idempotency_key is not None:
+        fingerprint = idempotency.fingerprint(itinerary)
+        existing = await _replay(db, response, idempotency_key, fingerprint)
+        if existing is not None:
+            return existing
+
+    db_itinerary = models.Itinerary(
+        title=itinerary.title,
+        duration_nights=itinerary.duration_nights,
+        description=itinerary.description,
+        accommodations=[models.Accommodation(**a.model_dump()) for a in itinerary.accommodations],
+        transfers=[models.Transfer(**t.model_dump()) for t in itinerary.transfers],
+        activities=[models.Activity(**a.model_dump()) for a in itinerary.activities],
+    )
+    db.add(db_itinerary)
+    await db.flush()
+
+    def index(session):
+        fulltext.index_created(session, [db_itinerary.id], [itinerary])
+        summaries.summarize_created(session, [db_itinerary.id], [itinerary])
+        changes.record(session, [db_itinerary.id])
+        if idempotency_key is not None:
+            idempotency.remember(session, idempotency_key, fingerprint, db_itinerary.id, db_itinerary.created_at)
+
+    created = schemas.Itinerary.model_validate(db_itinerary, from_attributes=True)
+    try:
+        await db.run_sync(index)
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        if idempotency_key is None:
+            raise
+        existing = await _replay(db, response, idempotency_key, fingerprint)
+        if existing is None:
+            raise HTTPException(status_code=409, detail="Conflicting request with the same Idempotency-Key")
+        return existing
+    response_cache.cache.invalidate()
+    return created
+
+
+async def _replay(db, response, key, fingerprint):
+    try:
+        existing = await db.run_sync(lambda session: idempotency.replay(session, key, fingerprint))
+    except idempotency.KeyReused as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+    if existing is not None:
+        response.headers[idempotency.REPLAYED_HEADER] = "true"
+    return existing
+
+
+@recommendation_router.get("/api/recommendations/{nights}", response_model=List[schemas.RecommendedItinerary])
+async def get_recommendations_async(
+    nights: int = Path(..., ge=2, le=8),
+    limit: Optional[int] = Query(None, ge=1, le=100),
+    min_score: Optional[float] = Query(None, ge=0, le=1),
+    db: AsyncSession = Depends(models.get_async_db)
+):
+    if settings.RECOMMENDATION_INDEX:
+        index = recommendation_index.index
+        # A refresh (or a first build) reads and sorts summaries for a while: do it
+        # in a worker thread, so it never holds up the event loop
+        if index.due and not await run_in_threadpool(_refresh_recommendation_index):
+            raise HTTPException(status_code=503, detail="The recommendation index is being built")
+        return index.recommend(nights, limit=limit, min_score=min_score)
+
+    # The scoring engine is written against a sync Session; run_sync hands it one
+    # whose IO still goes through the async driver
+    return await db.run_sync(
+        lambda session: recommendations.recommend(session, nights, limit=limit, min_score=min_score)
+    )
+
+
+def _refresh_recommendation_index():
+    db = models.ReadSessionLocal()
+    try:
+        return recommendation_index.index.refresh_if_due(db, wait=False)
+    finally:
+        db.close()
+
+
+@recommendation_router.post("/api/recommendations:batch", response_model=schemas.BatchRecommendationResult)
+async def get_batch_recommendations_async(
+    request: schemas.BatchRecommendationRequest,
+    db: AsyncSession = Depends(models.get_async_db)
+):
+    try:
+        groups = await db.run_sync(lambda session: recommendations.recommend_batch(session, request.queries))
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return {
+        "results": [
+            {"nights": query.nights, "user_id": query.user_id, "items": items}
+            for query, items in groups
+        ]
+    }
+
+
+@recommendation_router.get("/api/itineraries/{itinerary_id:int}/similar", response_model=List[schemas.SimilarItinerary])
+async def get_similar_itineraries_async(
+    itinerary_id: int,
+    limit: int = Query(10, ge=1, le=100),
+    db: AsyncSession = Depends(models.get_async_db)
+):
+    # Stats and maps the index files: keep that disk I/O off the event loop
+    state = await run_in_threadpool(similarity.index.snapshot)
+    if state is None:
+        raise HTTPException(status_code=503, detail=similarity.NOT_BUILT)
+    items = await db.run_sync(lambda session: similarity.similar(session, itinerary_id, limit, state=state))
+    if items is None:
+        raise HTTPException(status_code=404, detail="Itinerary not found")
+    return items
@@ -0,0 +1,58 @@
+"""
+Catches up rows written before a column or table existed: created_at of older
+itineraries (dates), itinerary_summary (summaries.backfill) and the full-text
+index (fulltext.backfill).
+
+run.py runs this once before it starts any worker and tells the workers to
+skip it (STARTUP_BACKFILL=false), so several workers never compute and rewrite
+the same rows at the same time. A server started on its own runs it at startup.
+
+    python backfill.py
+"""
+from datetime import datetime
+from sqlalchemy import update
+import models
+import summaries
+import fulltext
+import changes
+
+
+def dates(db):
+    """
+    Give itineraries created before created_at was NOT NULL a timestamp, so they
+    have a place in the (created_at, id) pagination order instead of being skipped
+    by the keyset comparison. The tables were created without the constraint on
+    those databases, and create_all doesn't alter existing tables. Returns how
+    many were dated.
+    """
+    return db.execute(
+        update(models.Itinerary)
+        .where(models.Itinerary.created_at.is_(None))
+        .values(created_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+
+def run(session_factory=None):
+    """
+    Backfill everything in one transaction, through the primary engine even
+    when reads use a replica. New summaries go on the change feed, so running
+    recommendation indexes pick them up. Returns (dated, summarized, indexed)
+    counts.
+    """
+    db = (session_factory or models.SessionLocal)()
+    try:
+        dated = dates(db)
+        summarized = summaries.backfill(db)
+        changes.record(db, summarized)
+        indexed = fulltext.backfill(db)
+        if dated or summarized or indexed:
+            db.commit()
+        return dated, len(summarized), indexed
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    dated, summarized, indexed = run()
+    print(f"Backfilled {dated} creation dates, {summarized} summaries and {indexed} full-text documents")
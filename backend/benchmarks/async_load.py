@@ -0,0 +1,100 @@
+"""
+Load test of the sync and async handler modes (ITINERARY_DB_MODE) under uvicorn.
+
+Each mode runs as a single uvicorn process against the same seeded SQLite
+database; requests are issued by an asyncio client at several concurrency
+levels and p50/p99 latency and requests/sec are printed per endpoint. The
+response cache is off, as in benchmarks.suite.
+
+    python -m benchmarks.async_load [requests_per_level]
+"""
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+from benchmarks.common import temp_database, populate
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PORT = 8765
+CONCURRENCY_LEVELS = (1, 8, 32)
+ENDPOINTS = (
+    ("main", "/api/itineraries?limit=20"),
+    ("main", "/api/itineraries/7"),
+    ("mcp_server", "/api/recommendations/5?limit=10"),
+)
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def start_server(module, mode, workdir):
+    # Without the response cache, so the numbers time the database path
+    env = dict(os.environ, ITINERARY_DB_MODE=mode, PYTHONPATH=BACKEND_DIR, RESPONSE_CACHE_BACKEND="none")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", f"{module}:app", "--port", str(PORT), "--log-level", "critical"],
+        cwd=workdir, env=env,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{PORT}/").status_code == 200:
+                return process
+        except httpx.TransportError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f"{module} did not start")
+
+
+async def drive(path, total, concurrency):
+    latencies = []
+    errors = 0
+    queue = asyncio.Queue()
+    for _ in range(total):
+        queue.put_nowait(None)
+
+    async def worker(client):
+        nonlocal errors
+        while not queue.empty():
+            queue.get_nowait()
+            started = time.perf_counter()
+            response = await client.get(path)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                errors += 1
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{PORT}", limits=limits, timeout=60) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return latencies, total / elapsed, errors
+
+
+def run(total):
+    _, session_factory, path = temp_database("travel_itineraries.db")
+    populate(session_factory, 2000)
+    workdir = os.path.dirname(path)
+
+    print(f"{'endpoint':<36} {'mode':<6} {'conc':>5} {'p50 ms':>8} {'p99 ms':>8} {'req/s':>8} {'errors':>7}")
+    for module, endpoint in ENDPOINTS:
+        for mode in ("sync", "async"):
+            process = start_server(module, mode, workdir)
+            try:
+                for concurrency in CONCURRENCY_LEVELS:
+                    latencies, rate, errors = asyncio.run(drive(endpoint, total, concurrency))
+                    print(f"{endpoint:<36} {mode:<6} {concurrency:>5} "
+                          f"{percentile(latencies, 0.5) * 1000:>8.2f} "
+                          f"{percentile(latencies, 0.99) * 1000:>8.2f} {rate:>8.1f} {errors:>7}")
+            finally:
+                process.terminate()
+                process.wait()
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -0,0 +1,68 @@
+"""
+POST /api/recommendations:batch against one GET /api/recommendations/{nights}
+per night count, as the front end issues them today.
+
+Both variants ask for the top 10 of every night count from 2 to 8, in-process
+(no network round trips, which only widen the gap), and report median latency
+and SQL statements per variant.
+
+    python -m benchmarks.batch_recommendations [itineraries] [repeats]
+"""
+import statistics
+import sys
+import time
+
+from fastapi.testclient import TestClient
+
+import mcp_server
+import synthetic_data
+from query_counter import QueryCounter
+from benchmarks.common import temp_database, override_db
+
+NIGHTS = range(2, 9)
+LIMIT = 10
+
+
+def timed(call, repeats, engine):
+    samples = []
+    with QueryCounter(engine) as counter:
+        for _ in range(repeats):
+            started = time.perf_counter()
+            call()
+            samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000, counter.count / repeats
+
+
+def run(itineraries, repeats):
+    engine, session_factory, _ = temp_database()
+    synthetic_data.seed_synthetic(engine, itineraries)
+    override_db(mcp_server.app, mcp_server.get_db, session_factory)
+    client = TestClient(mcp_server.app)
+
+    def sequential():
+        for nights in NIGHTS:
+            assert client.get(f"/api/recommendations/{nights}", params={"limit": LIMIT}).status_code == 200
+
+    def batch():
+        queries = [{"nights": nights, "limit": LIMIT} for nights in NIGHTS]
+        assert client.post("/api/recommendations:batch", json={"queries": queries}).status_code == 200
+
+    def personalised():
+        queries = [
+            {"nights": nights, "limit": LIMIT, "user_id": f"user-{nights}", "weights": {"pacing": nights, "coverage": 1}}
+            for nights in NIGHTS
+        ]
+        assert client.post("/api/recommendations:batch", json={"queries": queries}).status_code == 200
+
+    print(f"{itineraries} itineraries, top {LIMIT} for nights {NIGHTS.start}-{NIGHTS.stop - 1}, median of {repeats}")
+    for label, call in (
+        (f"{len(NIGHTS)} sequential GETs", sequential),
+        ("1 batch POST", batch),
+        ("1 batch POST, per-user weights", personalised),
+    ):
+        milliseconds, queries = timed(call, repeats, engine)
+        print(f"{label:<34} {milliseconds:>8.2f} ms {queries:>6.1f} queries")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20000, int(sys.argv[2]) if len(sys.argv) > 2 else 20)
@@ -0,0 +1,69 @@
+"""
+Throughput of POST /api/itineraries:bulk against one POST /api/itineraries per item.
+
+    python -m benchmarks.bulk_ingest [items]
+"""
+import json
+import sys
+import time
+
+from fastapi.testclient import TestClient
+
+import main
+from benchmarks.common import temp_database, override_db
+
+
+def make_payload(i):
+    return {
+        "title": f"Imported Trip {i}",
+        "duration_nights": 2 + i % 7,
+        "description": "Partner catalogue import",
+        "accommodations": [{
+            "name": "Kata Beach Resort", "location": "Kata Beach, Phuket",
+            "check_in_date": "2024-03-01T00:00:00", "check_out_date": "2024-03-04T00:00:00",
+            "nights": 3,
+        }],
+        "transfers": [
+            {"from_location": "Phuket International Airport", "to_location": "Kata Beach Resort",
+             "transport_type": "Private Car", "date": "2024-03-01T00:00:00"},
+            {"from_location": "Kata Beach Resort", "to_location": "Phuket International Airport",
+             "transport_type": "Private Car", "date": "2024-03-04T00:00:00"},
+        ],
+        "activities": [
+            {"name": "Phi Phi Islands Tour", "location": "Phi Phi Islands",
+             "date": "2024-03-02T00:00:00", "duration_hours": 8},
+            {"name": "Big Buddha Visit", "location": "Chalong, Phuket",
+             "date": "2024-03-03T00:00:00", "duration_hours": 3},
+        ],
+    }
+
+
+def run(items):
+    payloads = [make_payload(i) for i in range(items)]
+
+    _, session_factory, _ = temp_database()
+    override_db(main.app, main.get_db, session_factory)
+    client = TestClient(main.app)
+    single_items = min(items, 500)
+    started = time.perf_counter()
+    for payload in payloads[:single_items]:
+        assert client.post("/api/itineraries", json=payload).status_code == 200
+    single_rate = single_items / (time.perf_counter() - started)
+    print(f"POST /api/itineraries         : {single_rate:10.1f} items/sec ({single_items} items)")
+
+    for label, body, content_type in (
+        ("JSON array", json.dumps(payloads), "application/json"),
+        ("NDJSON", "\n".join(json.dumps(p) for p in payloads), "application/x-ndjson"),
+    ):
+        _, session_factory, _ = temp_database()
+        override_db(main.app, main.get_db, session_factory)
+        response = client.post("/api/itineraries:bulk", content=body,
+                               headers={"Content-Type": content_type})
+        result = response.json()
+        assert response.status_code == 200 and result["created"] == items, result
+        print(f"POST /api/itineraries:bulk {label:<10}: {result['items_per_second']:10.1f} items/sec "
+              f"({items} items)")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,70 @@
+"""
+Change feed lag and cost.
+
+Seeds a database, builds the recommendation index and follows the change feed
+with a ChangeFeedFollower, as the MCP server does. Then creates itineraries one
+transaction at a time, as the API does, and reports how long each takes to
+show up in the index (commit to visible), plus the cost of a poll that finds
+nothing new, which every follower pays every CHANGE_FEED_POLL_MS.
+
+    python -m benchmarks.change_feed [itineraries] [writes]
+"""
+import statistics
+import sys
+import time
+
+import changes
+import ingest
+import schemas
+import settings
+import synthetic_data
+from recommendation_index import RecommendationIndex
+from benchmarks.async_load import percentile
+from benchmarks.bulk_ingest import make_payload
+from benchmarks.common import temp_database
+
+
+def run(itineraries, writes):
+    engine, session_factory, _ = temp_database()
+    synthetic_data.seed_synthetic(engine, itineraries)
+
+    index = RecommendationIndex(refresh_interval=3600)
+    db = session_factory()
+    index.build(db)
+    db.close()
+
+    idle = changes.ChangeFeedFollower(session_factory)
+    idle.cursor = changes.FeedCursor(index.position)
+    samples = []
+    for _ in range(200):
+        started = time.perf_counter()
+        idle.poll()
+        samples.append(time.perf_counter() - started)
+    idle_ms = statistics.median(samples) * 1000
+
+    follower = changes.ChangeFeedFollower(session_factory)
+    follower.subscribe(index.apply)
+    follower.start(index.position)
+    lags = []
+    try:
+        for i in range(writes):
+            db = session_factory()
+            [itinerary_id] = ingest.bulk_insert_itineraries(db, [schemas.ItineraryCreate(**make_payload(i))])
+            db.commit()
+            db.close()
+            committed = time.perf_counter()
+            while itinerary_id not in index._details:
+                time.sleep(0.001)
+            lags.append(time.perf_counter() - committed)
+    finally:
+        follower.stop()
+
+    print(f"{itineraries} itineraries, poll interval {follower.interval * 1000:.0f} ms, {writes} writes")
+    print(f"idle poll: {idle_ms:.3f} ms")
+    print(f"commit -> visible in index: p50 {percentile(lags, 0.5) * 1000:.1f} ms, "
+          f"p99 {percentile(lags, 0.99) * 1000:.1f} ms, max {max(lags) * 1000:.1f} ms "
+          f"(bound: CHANGE_FEED_POLL_MS={settings.CHANGE_FEED_POLL_MS})")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100000, int(sys.argv[2]) if len(sys.argv) > 2 else 50)
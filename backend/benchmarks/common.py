@@ -0,0 +1,88 @@
+"""
+Shared helpers for the benchmark scripts.
+
+Run benchmarks from the backend directory, e.g. `python -m benchmarks.query_counts`.
+"""
+import os
+import random
+import tempfile
+from datetime import date, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import models
+import summaries
+
+LOCATIONS = [
+    "Patong Beach, Phuket", "Phuket Old Town", "Phi Phi Islands", "Kata Beach, Phuket",
+    "Ao Nang, Krabi", "Railay Beach", "Krabi Town", "Phang Nga Bay",
+]
+TRANSPORT_TYPES = ["Private Car", "Ferry", "Speedboat", "Minivan"]
+
+
+def temp_database(filename="bench.db"):
+    """
+    Create an empty SQLite database in a temporary directory.
+
+    Returns (engine, session_factory, path).
+    """
+    path = os.path.join(tempfile.mkdtemp(prefix="itinerary-bench-"), filename)
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    models.Base.metadata.create_all(bind=engine)
+    return engine, sessionmaker(autocommit=False, autoflush=False, bind=engine), path
+
+
+def populate(session_factory, count, children=3, seed=0):
+    """
+    Insert `count` itineraries, each with `children` accommodations, transfers and activities.
+    """
+    rng = random.Random(seed)
+    db = session_factory()
+    try:
+        for i in range(count):
+            nights = rng.randint(2, 8)
+            start = date(2023, 1, 1) + timedelta(days=rng.randint(0, 364))
+            itinerary = models.Itinerary(
+                title=f"Benchmark Trip {i}",
+                duration_nights=nights,
+                description="Synthetic itinerary for benchmarking",
+            )
+            for c in range(children):
+                location = rng.choice(LOCATIONS)
+                itinerary.accommodations.append(models.Accommodation(
+                    name=f"Hotel {c}", location=location,
+                    check_in_date=start, check_out_date=start + timedelta(days=nights),
+                    nights=nights,
+                ))
+                itinerary.transfers.append(models.Transfer(
+                    from_location=location, to_location=rng.choice(LOCATIONS),
+                    transport_type=rng.choice(TRANSPORT_TYPES),
+                    date=start + timedelta(days=c),
+                ))
+                itinerary.activities.append(models.Activity(
+                    name=f"Activity {c}", location=location,
+                    date=start + timedelta(days=c),
+                    duration_hours=rng.choice([2, 3, 4, 6, 8]),
+                    description="Synthetic activity",
+                ))
+            db.add(itinerary)
+        db.flush()
+        summaries.refresh(db)
+        db.commit()
+    finally:
+        db.close()
+
+
+def override_db(app, dependency, session_factory):
+    """
+    Point an app's `get_db` dependency at a different session factory.
+    """
+    def get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[dependency] = get_db
@@ -0,0 +1,51 @@
+"""
+Checks with EXPLAIN QUERY PLAN that every /api/itineraries/search filter is
+answered from an index, and prints each plan. Exits non-zero if a filter
+falls back to scanning its table.
+
+    python -m benchmarks.explain_search
+"""
+import sys
+from datetime import date
+
+from sqlalchemy import select
+
+import models
+import search
+from benchmarks.common import temp_database, populate
+
+CASES = [
+    ({"location": "Railay Beach"}, {"idx_accommodation_location", "idx_activity_location"}),
+    ({"date_from": date(2023, 3, 1), "date_to": date(2023, 3, 31)}, {"idx_activity_date", "idx_transfer_date"}),
+    ({"min_nights": 3, "max_nights": 5}, {"idx_duration_nights"}),
+    ({"transport_type": "Ferry"}, {"idx_transfer_transport_type"}),
+]
+
+
+def query_plan(connection, statement):
+    compiled = statement.compile(dialect=connection.dialect)
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params).all()
+    return [row[-1] for row in rows]
+
+
+def run():
+    engine, session_factory, _ = temp_database()
+    populate(session_factory, 2000)
+
+    failures = 0
+    with engine.connect() as connection:
+        for filters, expected_indexes in CASES:
+            statement = select(models.Itinerary.id).where(*search.itinerary_filters(**filters))
+            plan = query_plan(connection, statement)
+            used = {index for index in expected_indexes if any(index in step for step in plan)}
+            missing = expected_indexes - used
+            print(f"{filters}: {'OK' if not missing else 'MISSING ' + ', '.join(sorted(missing))}")
+            for step in plan:
+                print(f"    {step}")
+            failures += bool(missing)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,34 @@
+"""
+Peak Python memory while streaming the NDJSON export at growing table sizes.
+The peak should stay flat as the catalogue grows.
+
+    python -m benchmarks.export_memory
+"""
+import sys
+import time
+import tracemalloc
+
+import export
+from benchmarks.common import temp_database, populate
+
+
+def run(sizes):
+    for size in sizes:
+        _, session_factory, _ = temp_database()
+        populate(session_factory, size)
+        tracemalloc.start()
+        started = time.perf_counter()
+        lines = total_bytes = 0
+        for chunk in export.iter_ndjson(session_factory):
+            lines += chunk.count(b"\n")
+            total_bytes += len(chunk)
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{size:>8} itineraries: {total_bytes / 1e6:8.1f} MB streamed in {elapsed:6.2f}s, "
+              f"peak memory {peak / 1e6:6.2f} MB")
+        assert lines == size
+
+
+if __name__ == "__main__":
+    run([int(arg) for arg in sys.argv[1:]] or [5000, 20000, 80000])
@@ -0,0 +1,99 @@
+"""
+Full-text search latency versus a LIKE scan on a synthetic corpus.
+
+Builds N activities (default 1,000,000, five per itinerary) from a small
+travel vocabulary, indexes them with fulltext.reindex and times
+fulltext.search against the equivalent LIKE '%term%' query.
+
+    python -m benchmarks.fulltext [activities]
+"""
+import random
+import sys
+import time
+from datetime import date
+
+from sqlalchemy import insert, text
+
+import fulltext
+import models
+from benchmarks.common import temp_database, LOCATIONS
+
+ACTIVITIES_PER_ITINERARY = 5
+ADJECTIVES = ["Sunset", "Private", "Full Day", "Half Day", "Guided", "Family", "Luxury", "Island"]
+NOUNS = ["Snorkeling", "Kayaking", "Cooking Class", "Temple Visit", "Elephant Sanctuary",
+         "Rock Climbing", "Night Market", "Boat Tour", "Diving", "Spa Retreat", "Hiking"]
+PLACES = ["Phi Phi", "James Bond Island", "Railay", "Hong Island", "Similan", "Old Town", "Big Buddha"]
+# Rare guide names make selective queries: one in every few thousand activities
+GUIDES = [f"Khun{n:05d}" for n in range(20000)]
+QUERIES = ["snorkeling Phi Phi", "cooking class", "sunset kayaking Railay", "Khun00042", "Khun12345 diving"]
+
+
+def build_corpus(engine, activities, seed=1):
+    rng = random.Random(seed)
+    itineraries = activities // ACTIVITIES_PER_ITINERARY
+    with engine.begin() as conn:
+        for start in range(0, itineraries, 20000):
+            stop = min(start + 20000, itineraries)
+            conn.execute(insert(models.Itinerary), [
+                {"id": i + 1, "title": f"{rng.choice(PLACES)} {rng.choice(NOUNS)} Trip",
+                 "duration_nights": rng.randint(2, 8), "description": "Synthetic itinerary"}
+                for i in range(start, stop)
+            ])
+            conn.execute(insert(models.Activity), [
+                {"itinerary_id": i + 1,
+                 "name": f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)}",
+                 "location": rng.choice(LOCATIONS), "date": date(2024, 1, 1),
+                 "duration_hours": rng.choice([2, 4, 8]),
+                 "description": f"{rng.choice(NOUNS)} near {rng.choice(PLACES)} with {rng.choice(GUIDES)}"}
+                for i in range(start, stop) for _ in range(ACTIVITIES_PER_ITINERARY)
+            ])
+
+
+def like_search(db, query, limit=20):
+    clauses, params = [], {"limit": limit}
+    for n, word in enumerate(query.split()):
+        clauses.append(
+            f"(i.title || ' ' || coalesce(i.description, '') || ' ' || a.name || ' ' || "
+            f"a.location || ' ' || coalesce(a.description, '')) LIKE :w{n}"
+        )
+        params[f"w{n}"] = f"%{word}%"
+    sql = (
+        "SELECT DISTINCT i.id FROM itineraries i JOIN activities a ON a.itinerary_id = i.id "
+        f"WHERE {' AND '.join(clauses)} LIMIT :limit"
+    )
+    return db.execute(text(sql), params).all()
+
+
+def best_of(fn, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def run(activities):
+    engine, session_factory, _ = temp_database()
+    started = time.perf_counter()
+    build_corpus(engine, activities)
+    print(f"corpus: {activities} activities in {time.perf_counter() - started:.1f}s")
+
+    db = session_factory()
+    started = time.perf_counter()
+    fulltext.reindex(db)
+    db.commit()
+    print(f"full-text index built in {time.perf_counter() - started:.1f}s")
+
+    # Common words let LIKE stop after the first 20 hits; selective ones force a full scan
+    print(f"{'query':<26} {'hits':>5} {'fts ms':>9} {'like ms':>10}")
+    for query in QUERIES:
+        hits = len(fulltext.search(db, query))
+        fts_ms = best_of(lambda: fulltext.search(db, query))
+        like_ms = best_of(lambda: like_search(db, query), repeat=3)
+        print(f"{query:<26} {hits:>5} {fts_ms:>9.2f} {like_ms:>10.2f}")
+    db.close()
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
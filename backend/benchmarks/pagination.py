@@ -0,0 +1,65 @@
+"""
+Deep-page latency of OFFSET paging versus keyset (cursor) paging.
+
+    python -m benchmarks.pagination [rows]
+"""
+import sys
+import time
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+
+import main
+import models
+import pagination
+import response_cache
+from benchmarks.common import temp_database, override_db
+
+PAGE_SIZE = 50
+
+
+def insert_parents(engine, total):
+    start = datetime(2023, 1, 1)
+    with engine.begin() as conn:
+        for offset in range(0, total, 10000):
+            conn.execute(insert(models.Itinerary), [
+                {
+                    "title": f"Trip {i}",
+                    "duration_nights": 2 + i % 7,
+                    "description": None,
+                    "created_at": start + timedelta(seconds=i),
+                }
+                for i in range(offset, min(offset + 10000, total))
+            ])
+
+
+def timed_get(client, url, params, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = client.get(url, params=params)
+        best = min(best, time.perf_counter() - started)
+        assert response.status_code == 200
+    return best * 1000
+
+
+def run(total):
+    engine, session_factory, _ = temp_database()
+    insert_parents(engine, total)
+    override_db(main.app, main.get_db, session_factory)
+    # Time the queries, not cache hits on the repeated requests
+    response_cache.cache.backend = None
+    client = TestClient(main.app)
+
+    print(f"{'depth':>10} {'offset ms':>10} {'keyset ms':>10}")
+    for depth in (0, total // 10, total // 2, total - PAGE_SIZE):
+        offset_ms = timed_get(client, "/api/itineraries", {"skip": depth, "limit": PAGE_SIZE})
+        # Row `depth` has id depth + 1 and created_at start + depth seconds
+        cursor = pagination.encode_cursor(datetime(2023, 1, 1) + timedelta(seconds=depth - 1), depth)
+        keyset_ms = timed_get(client, "/api/itineraries/page", {"cursor": cursor, "limit": PAGE_SIZE})
+        print(f"{depth:>10} {offset_ms:>10.2f} {keyset_ms:>10.2f}")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
@@ -0,0 +1,50 @@
+"""
+Query-count check for the itinerary read endpoints.
+
+Pages of any size must cost the same fixed number of SQL statements. Exits with
+an AssertionError if a page size regresses into per-row (N+1) loading.
+
+    python -m benchmarks.query_counts
+"""
+from fastapi.testclient import TestClient
+
+import main
+import mcp_server
+from query_counter import QueryCounter, assert_max_queries
+from benchmarks.common import temp_database, populate, override_db
+
+# 1 query for the page + 1 selectin query per child table
+LIST_PAGE_QUERIES = 4
+SINGLE_ITINERARY_QUERIES = 1
+
+
+def run(total=600):
+    engine, session_factory, _ = temp_database()
+    populate(session_factory, total)
+    override_db(main.app, main.get_db, session_factory)
+    override_db(mcp_server.app, mcp_server.get_db, session_factory)
+
+    api = TestClient(main.app)
+    mcp = TestClient(mcp_server.app)
+
+    for limit in (10, 100, 500):
+        with assert_max_queries(engine, LIST_PAGE_QUERIES) as counter:
+            response = api.get("/api/itineraries", params={"limit": limit})
+        assert response.status_code == 200 and len(response.json()) == limit
+        print(f"GET /api/itineraries?limit={limit}: {counter.count} queries")
+
+    with assert_max_queries(engine, SINGLE_ITINERARY_QUERIES) as counter:
+        response = api.get("/api/itineraries/1")
+    assert response.status_code == 200
+    print(f"GET /api/itineraries/1: {counter.count} queries")
+
+    for nights in (2, 5, 8):
+        with QueryCounter(engine) as counter:
+            response = mcp.get(f"/api/recommendations/{nights}")
+        assert response.status_code == 200
+        print(f"GET /api/recommendations/{nights}: {counter.count} queries "
+              f"for {len(response.json())} itineraries")
+
+
+if __name__ == "__main__":
+    run()
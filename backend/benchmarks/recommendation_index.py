@@ -0,0 +1,70 @@
+"""
+In-memory recommendation index: build time, memory and lookup latency.
+
+Seeds a database without 4-night itineraries (so 4 exercises the ±1 fallback),
+builds recommendation_index.RecommendationIndex from it, checks every lookup
+against the SQL path (recommendations.recommend) and reports build time, memory
+held per 100k itineraries, p50/p99 lookup latency against SQL, and the cost of
+an incremental refresh.
+
+    python -m benchmarks.recommendation_index [itineraries]
+"""
+import sys
+import time
+import tracemalloc
+
+import recommendations
+import synthetic_data
+from recommendation_index import RecommendationIndex
+from benchmarks.async_load import percentile
+from benchmarks.common import temp_database
+
+NIGHTS_DISTRIBUTION = {2: 1, 3: 3, 5: 3, 6: 2, 7: 2, 8: 1}
+LOOKUPS = 500
+NEW_ITINERARIES = 1000
+
+
+def latencies(call, repeats=LOOKUPS):
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        call()
+        samples.append(time.perf_counter() - started)
+    return percentile(samples, 0.5) * 1000, percentile(samples, 0.99) * 1000
+
+
+def run(itineraries):
+    engine, session_factory, _ = temp_database()
+    synthetic_data.seed_synthetic(engine, itineraries, nights_distribution=NIGHTS_DISTRIBUTION)
+    db = session_factory()
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    index = RecommendationIndex(refresh_interval=0)
+    index.build(db)
+    held = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    for nights in range(2, 9):
+        for limit, min_score in ((10, None), (None, None), (5, 0.9)):
+            expected = recommendations.recommend(db, nights, limit=limit, min_score=min_score)
+            assert index.recommend(nights, limit=limit, min_score=min_score) == expected, (nights, limit)
+
+    print(f"{itineraries} itineraries")
+    print(f"build: {index.build_seconds:.2f} s, {held / 2 ** 20:.1f} MiB "
+          f"({held / 2 ** 20 * 100000 / itineraries:.1f} MiB per 100k itineraries)")
+    print(f"{'lookup':<28} {'index p50':>10} {'p99':>8} {'SQL p50':>10} {'p99':>8}  (ms)")
+    for label, nights in (("exact, top 10", 5), ("fallback (4 nights), top 10", 4)):
+        index_p50, index_p99 = latencies(lambda: index.recommend(nights, limit=10))
+        sql_p50, sql_p99 = latencies(lambda: recommendations.recommend(db, nights, limit=10))
+        print(f"{label:<28} {index_p50:>10.3f} {index_p99:>8.3f} {sql_p50:>10.3f} {sql_p99:>8.3f}")
+
+    synthetic_data.seed_synthetic(engine, NEW_ITINERARIES, seed=1, nights_distribution=NIGHTS_DISTRIBUTION)
+    started = time.perf_counter()
+    added = index.refresh(db)
+    print(f"refresh: {added} new itineraries merged in {(time.perf_counter() - started) * 1000:.1f} ms")
+    assert index.recommend(5, limit=10) == recommendations.recommend(db, 5, limit=10)
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,77 @@
+"""
+Cost of rendering a page of itineraries as JSON, per serialization path:
+
+- response_model: ORM objects validated and encoded the way FastAPI does it
+- pydantic: ORM objects through serializers.serialize_itineraries (SERIALIZATION_MODE=pydantic)
+- fast: Core rows to dicts encoded with orjson (SERIALIZATION_MODE=fast)
+
+Times include the queries. Also checks that all paths produce the same bytes.
+
+    python -m benchmarks.serialization [page_size] [repeat]
+"""
+import json
+import sys
+import time
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from typing import List
+
+import models
+import schemas
+import serializers
+from benchmarks.common import temp_database, populate
+
+RESPONSE_ADAPTER = TypeAdapter(List[schemas.Itinerary])
+
+
+def response_model_path(db, page_size):
+    itineraries = db.query(models.Itinerary).options(
+        *models.itinerary_load_options("selectin")
+    ).limit(page_size).all()
+    content = jsonable_encoder(RESPONSE_ADAPTER.validate_python(itineraries, from_attributes=True))
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+
+def pydantic_path(db, page_size):
+    itineraries = db.query(models.Itinerary).options(
+        *models.itinerary_load_options("selectin")
+    ).limit(page_size).all()
+    return serializers.serialize_itineraries(itineraries)
+
+
+def fast_path(db, page_size):
+    rows = db.execute(serializers.itinerary_rows().limit(page_size)).all()
+    return serializers.dumps(serializers.build_itineraries(db, rows))
+
+
+def run(page_size, repeat):
+    _, session_factory, _ = temp_database()
+    populate(session_factory, page_size, children=5)
+
+    outputs = {}
+    for name, render in (("response_model", response_model_path),
+                         ("pydantic", pydantic_path),
+                         ("fast", fast_path)):
+        timings = []
+        for _ in range(repeat):
+            db = session_factory()
+            started = time.perf_counter()
+            outputs[name] = render(db, page_size)
+            timings.append(time.perf_counter() - started)
+            db.close()
+        timings.sort()
+        print(f"{name:<15} median {timings[len(timings) // 2] * 1000:8.2f} ms  "
+              f"best {timings[0] * 1000:8.2f} ms  ({len(outputs[name])} bytes)")
+
+    identical = len(set(outputs.values())) == 1
+    print("identical output:", identical)
+    if not identical:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    run(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 100,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 50,
+    )
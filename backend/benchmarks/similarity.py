@@ -0,0 +1,76 @@
+"""
+Similar-itineraries index: offline build, size on disk, query latency and recall.
+
+Seeds a database, builds the index with similarity.build, maps it the way the
+MCP server does and queries the neighbours of random itineraries, reporting
+p50/p99 latency and recall@10 for several SIMILARITY_NPROBE values against an
+exact scan of every vector.
+
+    python -m benchmarks.similarity [itineraries] [queries]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import similarity
+import synthetic_data
+from benchmarks.async_load import percentile
+from benchmarks.common import temp_database
+
+LIMIT = 10
+NPROBES = (1, 4, 8, 16)
+
+
+def run(itineraries, queries):
+    engine, session_factory, _ = temp_database()
+    synthetic_data.seed_synthetic(engine, itineraries)
+    path = os.path.join(tempfile.mkdtemp(prefix="itinerary-similarity-"), "index")
+
+    db = session_factory()
+    meta = similarity.build(db, path)
+    db.close()
+    size = sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+    print(f"{itineraries} itineraries: built in {meta['build_seconds']:.2f} s, {meta['dimensions']} dimensions, "
+          f"{meta['clusters']} clusters, {size / 2 ** 20:.1f} MiB on disk")
+
+    index = similarity.SimilarityIndex(path)
+    started = time.perf_counter()
+    state = index.snapshot()
+    print(f"memory-mapped in {(time.perf_counter() - started) * 1000:.2f} ms")
+
+    _, arrays = state
+    vectors, ids = np.asarray(arrays["vectors"]), np.asarray(arrays["ids"])
+    rng = np.random.default_rng(0)
+    sample = [int(itinerary_id) for itinerary_id in rng.choice(ids, queries, replace=False)]
+
+    def exact(itinerary_id):
+        similarities = vectors @ index.vector(itinerary_id)
+        similarities[ids == itinerary_id] = -np.inf
+        return np.sort(similarities)[-LIMIT]
+
+    kth = {itinerary_id: exact(itinerary_id) for itinerary_id in sample}
+    samples = []
+    for itinerary_id in sample:
+        started = time.perf_counter()
+        exact(itinerary_id)
+        samples.append(time.perf_counter() - started)
+    print(f"{'scan':<12} {'p50':>8} {'p99':>8} {'recall@' + str(LIMIT):>10}  (ms)")
+    print(f"{'exact':<12} {percentile(samples, 0.5) * 1000:>8.3f} {percentile(samples, 0.99) * 1000:>8.3f} {1:>10.3f}")
+
+    for nprobe in NPROBES:
+        samples, hits = [], 0
+        for itinerary_id in sample:
+            started = time.perf_counter()
+            neighbours = index.nearest(index.vector(itinerary_id), LIMIT, exclude=itinerary_id, nprobe=nprobe)
+            samples.append(time.perf_counter() - started)
+            # Ties at the cut-off count as hits: any of them is an exact answer
+            hits += sum(score >= kth[itinerary_id] - 1e-6 for score, _ in neighbours)
+        print(f"{'nprobe=' + str(nprobe):<12} {percentile(samples, 0.5) * 1000:>8.3f} "
+              f"{percentile(samples, 0.99) * 1000:>8.3f} {hits / (LIMIT * queries):>10.3f}")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100000, int(sys.argv[2]) if len(sys.argv) > 2 else 200)
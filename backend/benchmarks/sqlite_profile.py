@@ -0,0 +1,117 @@
+"""
+Mixed read/write load on one SQLite file, before and after the performance profile.
+
+One writer commits itineraries the way create_itinerary does while reader
+threads page through itineraries, as the API and recommendation processes do
+against the shared file. The "performance" run uses WAL and the other
+pragmas from models.apply_sqlite_profile plus a separate read-only pool.
+
+    python -m benchmarks.sqlite_profile [seconds] [readers]
+"""
+import sys
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+import ingest
+import models
+import schemas
+from benchmarks.common import temp_database, populate
+from benchmarks.async_load import percentile
+
+
+def new_itinerary(i):
+    day = datetime(2024, 1, 1)
+    return schemas.ItineraryCreate(
+        title=f"Write Load {i}", duration_nights=3, description=None,
+        accommodations=[schemas.AccommodationCreate(
+            name="Hotel", location="Krabi Town", check_in_date=day, check_out_date=day, nights=3)],
+        transfers=[schemas.TransferCreate(
+            from_location="Airport", to_location="Hotel", transport_type="Minivan", date=day)],
+        activities=[schemas.ActivityCreate(
+            name="Kayaking", location="Ao Thalane", date=day, duration_hours=4)],
+    )
+
+
+def run_profile(profile, path, seconds, readers):
+    write_engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    read_url = f"sqlite:///{path}"
+    if profile == "performance":
+        models.apply_sqlite_profile(write_engine)
+        read_url = f"sqlite:///file:{path}?mode=ro&uri=true"
+    read_engine = create_engine(read_url, connect_args={"check_same_thread": False})
+    if profile == "performance":
+        models.apply_sqlite_profile(read_engine, read_only=True)
+    WriteSession = sessionmaker(bind=write_engine)
+    ReadSession = sessionmaker(bind=read_engine)
+
+    stop = time.perf_counter() + seconds
+    read_latencies, write_latencies = [], []
+    errors = {"read": 0, "write": 0}
+
+    def writer():
+        i = 0
+        while time.perf_counter() < stop:
+            started = time.perf_counter()
+            db = WriteSession()
+            try:
+                ingest.bulk_insert_itineraries(db, [new_itinerary(i)])
+                db.commit()
+                write_latencies.append(time.perf_counter() - started)
+            except OperationalError:
+                db.rollback()
+                errors["write"] += 1
+            finally:
+                db.close()
+            i += 1
+
+    def reader(offset):
+        skip = offset
+        while time.perf_counter() < stop:
+            started = time.perf_counter()
+            db = ReadSession()
+            try:
+                db.query(models.Itinerary).options(
+                    *models.itinerary_load_options("selectin")
+                ).offset(skip % 1000).limit(20).all()
+                read_latencies.append(time.perf_counter() - started)
+            except OperationalError:
+                errors["read"] += 1
+            finally:
+                db.close()
+            skip += 20
+
+    threads = [threading.Thread(target=writer)]
+    threads += [threading.Thread(target=reader, args=(i * 100,)) for i in range(readers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    write_engine.dispose()
+    read_engine.dispose()
+
+    print(f"{profile:<12} reads/s {len(read_latencies) / seconds:>8.1f}  "
+          f"read p50 {percentile(read_latencies, 0.5) * 1000:>7.2f} ms  "
+          f"read p99 {percentile(read_latencies, 0.99) * 1000:>7.2f} ms  "
+          f"writes/s {len(write_latencies) / seconds:>7.1f}  "
+          f"write p99 {percentile(write_latencies, 0.99) * 1000:>7.2f} ms  "
+          f"errors {errors}")
+
+
+def run(seconds, readers):
+    for profile in ("default", "performance"):
+        engine, session_factory, path = temp_database()
+        populate(session_factory, 1000)
+        engine.dispose()
+        run_profile(profile, path, seconds, readers)
+
+
+if __name__ == "__main__":
+    run(
+        float(sys.argv[1]) if len(sys.argv) > 1 else 10,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 4,
+    )
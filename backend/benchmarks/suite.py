@@ -0,0 +1,247 @@
+"""
+Benchmark suite for the itinerary API (main.py) and the MCP server (mcp_server.py).
+
+Both apps are driven in-process through httpx's ASGI transport, so sync handlers
+run in Starlette's threadpool exactly as under uvicorn, against a temporary
+SQLite database seeded with synthetic_data at each dataset size. For every
+endpoint, dataset size and concurrency level the suite records throughput,
+p50/p95/p99 latency, SQL statements per request and peak RSS, and writes the
+results as JSON. Each cell runs in a fresh process (`--cell`) against the seeded
+database, so its peak RSS is that cell's own and not the high-water mark of
+every cell before it.
+
+    python -m benchmarks.suite [--sizes 1000 10000] [--concurrency 1 8 32]
+                               [--requests 200] [--output results.json]
+                               [--compare baseline.json] [--tolerance 0.2]
+
+With --compare, cells whose throughput, p95 latency, peak RSS or query count
+regressed by more than the tolerance against a previous run are listed and the
+exit status is 1. The response cache is disabled unless --response-cache is given, so reads
+measure the handlers rather than cache hits.
+"""
+import argparse
+import asyncio
+import json
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+import httpx
+import sqlalchemy
+from sqlalchemy.orm import sessionmaker
+
+import main
+import mcp_server
+import recommendation_index
+import response_cache
+import settings
+import synthetic_data
+from query_counter import QueryCounter
+from benchmarks.bulk_ingest import make_payload
+from benchmarks.common import temp_database, override_db
+from benchmarks.async_load import percentile
+
+DATASET_SIZES = (1000, 10000)
+CONCURRENCY_LEVELS = (1, 8, 32)
+REQUESTS_PER_CELL = 200
+PAGE_SIZE = 20
+
+
+def _get_itineraries(i, size):
+    return "GET", f"/api/itineraries?skip={(i * PAGE_SIZE) % max(size - PAGE_SIZE, 1)}&limit={PAGE_SIZE}", None
+
+
+def _get_itinerary(i, size):
+    return "GET", f"/api/itineraries/{i % size + 1}", None
+
+
+def _create_itinerary(i, size):
+    return "POST", "/api/itineraries", make_payload(i)
+
+
+def _get_recommendations(i, size):
+    return "GET", f"/api/recommendations/{2 + i % 7}?limit=10", None
+
+
+# name -> (app, request factory); creates run last so reads see the seeded size
+ENDPOINTS = {
+    "get_itineraries": (main.app, _get_itineraries),
+    "get_itinerary": (main.app, _get_itinerary),
+    "get_recommendations": (mcp_server.app, _get_recommendations),
+    "create_itinerary": (main.app, _create_itinerary),
+}
+
+
+def peak_rss_kb():
+    """
+    Peak resident set size of this process so far (never decreases, hence one
+    process per cell).
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+async def drive(app, make_request, size, total, concurrency):
+    latencies = []
+    errors = 0
+    next_index = iter(range(total))
+
+    async def worker(client):
+        nonlocal errors
+        for i in next_index:
+            method, path, payload = make_request(i, size)
+            started = time.perf_counter()
+            response = await client.request(method, path, json=payload)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                errors += 1
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return latencies, elapsed, errors
+
+
+def run_cell(engine, endpoint, size, total, concurrency):
+    app, make_request = ENDPOINTS[endpoint]
+    with QueryCounter(engine) as counter:
+        latencies, elapsed, errors = asyncio.run(drive(app, make_request, size, total, concurrency))
+    return {
+        "endpoint": endpoint,
+        "dataset_size": size,
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": errors,
+        "throughput_rps": round(total / elapsed, 2),
+        "latency_ms": {
+            "p50": round(percentile(latencies, 0.50) * 1000, 3),
+            "p95": round(percentile(latencies, 0.95) * 1000, 3),
+            "p99": round(percentile(latencies, 0.99) * 1000, 3),
+            "mean": round(sum(latencies) / len(latencies) * 1000, 3),
+        },
+        "queries_per_request": round(counter.count / total, 2),
+        "peak_rss_kb": peak_rss_kb(),
+    }
+
+
+def cell_main(path, endpoint, size, total, concurrency, keep_response_cache):
+    """
+    Run one cell against the database at `path`; the body of a `--cell` process.
+    """
+    if not keep_response_cache:
+        response_cache.cache.backend = None
+    engine = sqlalchemy.create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    override_db(main.app, main.get_db, session_factory)
+    override_db(mcp_server.app, mcp_server.get_db, session_factory)
+    recommendation_index.index.clear()
+    return run_cell(engine, endpoint, size, total, concurrency)
+
+
+def run_cell_process(path, endpoint, size, total, concurrency, keep_response_cache):
+    command = [
+        sys.executable, "-m", "benchmarks.suite", "--cell", endpoint, "--database", path,
+        "--sizes", str(size), "--concurrency", str(concurrency), "--requests", str(total),
+    ]
+    if keep_response_cache:
+        command.append("--response-cache")
+    output = subprocess.run(command, check=True, stdout=subprocess.PIPE).stdout
+    return json.loads(output)
+
+
+def run(sizes=DATASET_SIZES, concurrency_levels=CONCURRENCY_LEVELS, total=REQUESTS_PER_CELL,
+        endpoints=tuple(ENDPOINTS), keep_response_cache=False):
+    results = []
+    for size in sizes:
+        engine, _, path = temp_database()
+        synthetic_data.seed_synthetic(engine, size)
+        engine.dispose()
+
+        for endpoint in endpoints:
+            for concurrency in concurrency_levels:
+                result = run_cell_process(path, endpoint, size, total, concurrency, keep_response_cache)
+                results.append(result)
+                print(f"{endpoint:<20} size={size:<7} conc={concurrency:<3} "
+                      f"{result['throughput_rps']:>9.1f} req/s  p95 {result['latency_ms']['p95']:>8.2f} ms  "
+                      f"{result['queries_per_request']:>5} queries/req  "
+                      f"peak RSS {result['peak_rss_kb'] / 1024:>6.1f} MiB", file=sys.stderr)
+
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "sqlalchemy": sqlalchemy.__version__,
+            "platform": platform.platform(),
+            "serialization_mode": settings.SERIALIZATION_MODE,
+            "response_cache": keep_response_cache,
+            "requests_per_cell": total,
+        },
+        "results": results,
+    }
+
+
+def compare(current, baseline, tolerance):
+    """
+    Return human-readable regressions of `current` against `baseline`.
+    """
+    def key(result):
+        return result["endpoint"], result["dataset_size"], result["concurrency"]
+
+    previous = {key(result): result for result in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        before = previous.get(key(result))
+        if before is None:
+            continue
+        label = "{} size={} conc={}".format(*key(result))
+        if result["throughput_rps"] < before["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{label}: throughput {before['throughput_rps']} -> {result['throughput_rps']} req/s")
+        if result["latency_ms"]["p95"] > before["latency_ms"]["p95"] * (1 + tolerance):
+            regressions.append(f"{label}: p95 {before['latency_ms']['p95']} -> {result['latency_ms']['p95']} ms")
+        if result["peak_rss_kb"] > before["peak_rss_kb"] * (1 + tolerance):
+            regressions.append(f"{label}: peak RSS {before['peak_rss_kb']} -> {result['peak_rss_kb']} KiB")
+        if result["queries_per_request"] > before["queries_per_request"]:
+            regressions.append(
+                f"{label}: queries/request {before['queries_per_request']} -> {result['queries_per_request']}"
+            )
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DATASET_SIZES))
+    parser.add_argument("--concurrency", type=int, nargs="+", default=list(CONCURRENCY_LEVELS))
+    parser.add_argument("--requests", type=int, default=REQUESTS_PER_CELL, help="requests per cell")
+    parser.add_argument("--endpoints", nargs="+", choices=list(ENDPOINTS), default=list(ENDPOINTS))
+    parser.add_argument("--response-cache", action="store_true", help="keep the response cache enabled")
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    parser.add_argument("--compare", metavar="BASELINE", help="JSON from a previous run")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression")
+    parser.add_argument("--cell", choices=list(ENDPOINTS), help=argparse.SUPPRESS)
+    parser.add_argument("--database", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.cell:
+        result = cell_main(args.database, args.cell, args.sizes[0], args.requests, args.concurrency[0],
+                           args.response_cache)
+        json.dump(result, sys.stdout)
+        sys.exit(0)
+
+    report = run(args.sizes, args.concurrency, args.requests, args.endpoints, args.response_cache)
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare) as baseline:
+            regressions = compare(report, json.load(baseline), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,80 @@
+"""
+Columnar (vector_scoring.FeatureMatrix) against row-by-row recommendation scoring.
+
+For one night bucket and for the whole table, compares:
+
+- load + score: ORM itineraries with their children, scored one by one with
+  scoring.score_itinerary, against FeatureMatrix.load (grouped queries) and
+  FeatureMatrix.scores
+- re-weighting: scoring.score_features over every itinerary's features in a
+  Python loop, against FeatureMatrix.scores on the loaded matrix
+
+and checks that both paths produce identical scores.
+
+    python -m benchmarks.vector_scoring [itineraries] [weight sets]
+"""
+import random
+import sys
+import time
+
+import models
+import scoring
+import synthetic_data
+import vector_scoring
+from benchmarks.common import temp_database
+
+BUCKET = 5
+
+
+def timed(call):
+    started = time.perf_counter()
+    result = call()
+    return result, (time.perf_counter() - started) * 1000
+
+
+def compare(db, nights, weight_sets):
+    def row_by_row():
+        statement = db.query(models.Itinerary).options(*models.itinerary_load_options("selectin"))
+        if nights is not None:
+            statement = statement.filter(models.Itinerary.duration_nights.in_(nights))
+        return {itinerary.id: scoring.score_itinerary(itinerary) for itinerary in statement}
+
+    def columnar():
+        matrix = vector_scoring.FeatureMatrix.load(db, nights)
+        return matrix, matrix.scores()
+
+    expected, row_ms = timed(row_by_row)
+    db.expunge_all()
+    (matrix, scores), vector_ms = timed(columnar)
+    assert dict(zip(matrix.ids.tolist(), scores.tolist())) == {key: value.score for key, value in expected.items()}
+
+    features = [result.features for result in expected.values()]
+    _, row_reweight_ms = timed(lambda: [
+        [scoring.score_features(row, weights) for row in features] for weights in weight_sets
+    ])
+    _, vector_reweight_ms = timed(lambda: [matrix.scores(weights) for weights in weight_sets])
+
+    label = "all nights" if nights is None else f"{nights[0]} nights"
+    print(f"{label:<12} {len(matrix):>8} {row_ms:>12.1f} {vector_ms:>12.1f} {row_ms / vector_ms:>7.1f}x "
+          f"{row_reweight_ms / len(weight_sets):>12.2f} {vector_reweight_ms / len(weight_sets):>12.3f} "
+          f"{row_reweight_ms / vector_reweight_ms:>7.1f}x")
+
+
+def run(itineraries, weight_count):
+    engine, session_factory, _ = temp_database()
+    synthetic_data.seed_synthetic(engine, itineraries)
+    rng = random.Random(0)
+    weight_sets = [{name: rng.random() for name in scoring.FEATURE_NAMES} for _ in range(weight_count)]
+
+    print(f"{itineraries} itineraries; re-weighting times are per weight set, averaged over {weight_count}")
+    print(f"{'bucket':<12} {'rows':>8} {'row load+score':>12} {'vector':>12} {'speedup':>8} "
+          f"{'row reweight':>12} {'vector':>12} {'speedup':>8}  (ms)")
+    db = session_factory()
+    for nights in ([BUCKET], None):
+        compare(db, nights, weight_sets)
+        db.expunge_all()
+    db.close()
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20000, int(sys.argv[2]) if len(sys.argv) > 2 else 20)
@@ -0,0 +1,96 @@
+"""
+API throughput under run.py at increasing worker counts.
+
+For each worker count the supervisor is started against the same seeded SQLite
+database (response cache off), warmed up, and driven at a fixed concurrency;
+requests/sec and p50/p99 latency are printed per worker count. Throughput
+should grow with the worker count until it reaches the number of cores.
+
+    python -m benchmarks.workers [requests] [concurrency]
+"""
+import asyncio
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import httpx
+
+import synthetic_data
+from benchmarks.async_load import percentile
+from benchmarks.common import temp_database
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+API_PORT = 8775
+PATH = "/api/itineraries?limit=20"
+WARMUP_SECONDS = 2
+
+
+def worker_counts():
+    cores = os.cpu_count() or 1
+    return sorted({1, 2, 4, cores})
+
+
+def start_supervisor(workers, database_url):
+    env = dict(os.environ, DATABASE_URL=database_url, RESPONSE_CACHE_BACKEND="none")
+    process = subprocess.Popen(
+        [sys.executable, "run.py", "--no-seed", "--api-workers", str(workers), "--mcp-workers", "1",
+         "--api-port", str(API_PORT), "--mcp-port", str(API_PORT + 1)],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+    )
+    for line in process.stdout:
+        if "all services ready" in line:
+            # Keep draining so access logs never fill the pipe and block the workers
+            threading.Thread(target=process.stdout.read, daemon=True).start()
+            return process
+    process.wait()
+    raise RuntimeError("run.py exited before its services were ready")
+
+
+async def drive(total, concurrency):
+    latencies = []
+    errors = 0
+    remaining = iter(range(total))
+
+    async def worker(client):
+        nonlocal errors
+        for _ in remaining:
+            started = time.perf_counter()
+            response = await client.get(PATH)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                errors += 1
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{API_PORT}", limits=limits, timeout=60) as client:
+        # Let every worker finish booting and warm its connections
+        deadline = time.perf_counter() + WARMUP_SECONDS
+        while time.perf_counter() < deadline:
+            await asyncio.gather(*(client.get(PATH) for _ in range(concurrency)))
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return latencies, total / elapsed, errors
+
+
+def run(total, concurrency):
+    engine, _, path = temp_database("travel_itineraries.db")
+    synthetic_data.seed_synthetic(engine, 5000)
+    engine.dispose()
+
+    print(f"{os.cpu_count()} CPU(s), {total} requests of GET {PATH} at concurrency {concurrency}")
+    print(f"{'workers':>7} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for workers in worker_counts():
+        process = start_supervisor(workers, f"sqlite:///{path}")
+        try:
+            latencies, rate, errors = asyncio.run(drive(total, concurrency))
+        finally:
+            process.terminate()
+            process.wait()
+        print(f"{workers:>7} {rate:>8.1f} {percentile(latencies, 0.5) * 1000:>8.2f} "
+              f"{percentile(latencies, 0.99) * 1000:>8.2f} {errors:>7}")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 2000, int(sys.argv[2]) if len(sys.argv) > 2 else 32)
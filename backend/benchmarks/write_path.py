@@ -0,0 +1,71 @@
+"""
+POST /api/itineraries write path: latency, SQL statements and commits per create.
+
+Each commit is a durability point: in SQLite's default rollback-journal mode it
+costs about three fsyncs (journal, journal header, database), one in WAL mode
+with synchronous=FULL, so commits per request is what to watch for fsync
+counts. Creates go through the real app in-process against a temporary SQLite
+database; the second round sends an Idempotency-Key with every request and the
+third replays the same keys, as a client retrying after timeouts would.
+
+    python -m benchmarks.write_path [requests]
+"""
+import statistics
+import sys
+import time
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+import main
+import synthetic_data
+from query_counter import QueryCounter
+from benchmarks.async_load import percentile
+from benchmarks.bulk_ingest import make_payload
+from benchmarks.common import temp_database, override_db
+
+
+def measure(client, engine, requests, keys=None):
+    commits = [0]
+
+    def count_commit(connection):
+        commits[0] += 1
+
+    event.listen(engine, "commit", count_commit)
+    samples, statuses = [], set()
+    try:
+        with QueryCounter(engine) as counter:
+            for i in range(requests):
+                headers = {"Idempotency-Key": keys[i]} if keys else {}
+                started = time.perf_counter()
+                response = client.post("/api/itineraries", json=make_payload(i), headers=headers)
+                samples.append(time.perf_counter() - started)
+                statuses.add(response.status_code)
+    finally:
+        event.remove(engine, "commit", count_commit)
+    return {
+        "p50_ms": statistics.median(samples) * 1000,
+        "p99_ms": percentile(samples, 0.99) * 1000,
+        "queries": counter.count / requests,
+        "commits": commits[0] / requests,
+        "statuses": sorted(statuses),
+    }
+
+
+def run(requests):
+    engine, session_factory, _ = temp_database()
+    synthetic_data.seed_synthetic(engine, 1000)
+    override_db(main.app, main.get_db, session_factory)
+    client = TestClient(main.app)
+    keys = [f"bench-{time.time_ns()}-{i}" for i in range(requests)]
+
+    print(f"{requests} creates per round against 1000 seeded itineraries")
+    print(f"{'round':<26} {'p50 ms':>8} {'p99 ms':>8} {'queries':>8} {'commits':>8}  statuses")
+    for label, round_keys in (("no key", None), ("new Idempotency-Key", keys), ("replayed Idempotency-Key", keys)):
+        result = measure(client, engine, requests, round_keys)
+        print(f"{label:<26} {result['p50_ms']:>8.2f} {result['p99_ms']:>8.2f} "
+              f"{result['queries']:>8.1f} {result['commits']:>8.1f}  {result['statuses']}")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 300)
@@ -0,0 +1,320 @@
+"""
+Change feed from the writers (main.py, ingest, seeding) to the processes that
+derive state from itineraries: the MCP server's recommendation index and the
+per-worker response caches.
+
+Every write path appends the ids it created, updated or deleted to
+itinerary_changes in the same transaction as the write, so a change becomes visible exactly when its data
+does. A ChangeFeedFollower polls for rows past its position every
+CHANGE_FEED_POLL_MS from a daemon thread and hands them, in sequence order and
+batches of at most CHANGE_FEED_BATCH, to its subscribers. A poll is a range
+scan on the primary key, so lag is bounded by the poll interval and never needs
+a rescan of the itinerary tables.
+
+Sequences become visible in order on SQLite (one writer at a time), but not on
+PostgreSQL, where a transaction holding a lower sequence can commit after one
+holding a higher sequence. A FeedCursor therefore remembers the sequences it
+skipped over as gaps and keeps polling them for CHANGE_FEED_GAP_GRACE seconds,
+so a late commit is still delivered; after that the gap is taken to be a rolled
+back transaction. Subscribers may see late changes out of sequence order.
+
+clear_database records a reset instead of one change per deleted row;
+subscribers rebuild from scratch when they see one. The API prunes changes
+older than CHANGE_FEED_RETENTION_HOURS (FeedPruner); a follower that falls
+further behind than that misses changes, but followers restart from a fresh
+build, so only a stalled process is at risk.
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import and_, delete, func, insert, or_, select
+import models
+import settings
+
+CREATED = "created"
+UPDATED = "updated"
+DELETED = "deleted"
+RESET = "reset"
+
+logger = logging.getLogger("itinerary.changes")
+
+
+def record(db, itinerary_ids, operation=CREATED):
+    """
+    Append one change per itinerary. Works with a Session or a Connection and
+    runs in the caller's transaction.
+    """
+    changed_at = datetime.utcnow()
+    rows = [
+        {"itinerary_id": itinerary_id, "operation": operation, "changed_at": changed_at}
+        for itinerary_id in itinerary_ids
+    ]
+    if rows:
+        db.execute(insert(models.ItineraryChange), rows)
+
+
+def record_reset(db):
+    db.execute(insert(models.ItineraryChange).values(operation=RESET, changed_at=datetime.utcnow()))
+
+
+def latest_sequence(db):
+    return db.execute(select(func.max(models.ItineraryChange.sequence))).scalar() or 0
+
+
+_FEED_COLUMNS = (
+    models.ItineraryChange.sequence,
+    models.ItineraryChange.itinerary_id,
+    models.ItineraryChange.operation,
+)
+
+
+def since(db, sequence, limit=None):
+    """
+    Changes after `sequence`, oldest first, as (sequence, itinerary_id, operation) rows.
+    """
+    return db.execute(
+        select(*_FEED_COLUMNS)
+        .where(models.ItineraryChange.sequence > sequence)
+        .order_by(models.ItineraryChange.sequence)
+        .limit(limit or settings.CHANGE_FEED_BATCH)
+    ).all()
+
+
+def prune(db, older_than=None):
+    """
+    Delete changes older than `older_than` (a timedelta, by default
+    CHANGE_FEED_RETENTION_HOURS). Runs in the caller's transaction and returns
+    how many rows were deleted.
+    """
+    cutoff = datetime.utcnow() - (older_than or timedelta(hours=settings.CHANGE_FEED_RETENTION_HOURS))
+    return db.execute(
+        delete(models.ItineraryChange).where(models.ItineraryChange.changed_at < cutoff)
+    ).rowcount
+
+
+class FeedCursor:
+    """
+    A reader's place in the feed: the highest sequence it has seen, plus the
+    ranges below it that were not visible yet when it moved past them.
+
+    fetch() returns changes that are new to the cursor without moving it, and
+    observe() moves it once they have been handled, so a reader that fails in
+    between fetches the same changes again.
+    """
+
+    def __init__(self, position=0, grace=None):
+        self.position = position
+        self.grace = grace if grace is not None else settings.CHANGE_FEED_GAP_GRACE
+        # [first, last, deadline] ranges of sequences not seen yet
+        self._gaps = []
+
+    @classmethod
+    def at(cls, db, position, grace=None, lookback=None):
+        """
+        A cursor at `position` that also watches the holes in the `lookback`
+        sequences before it: transactions still in flight when the position
+        was taken.
+        """
+        cursor = cls(position, grace)
+        lookback = lookback or settings.CHANGE_FEED_BATCH
+        seen = db.execute(
+            select(models.ItineraryChange.sequence)
+            .where(models.ItineraryChange.sequence > position - lookback,
+                   models.ItineraryChange.sequence <= position)
+            .order_by(models.ItineraryChange.sequence)
+        ).scalars().all()
+        deadline = time.monotonic() + cursor.grace
+        for previous, sequence in zip(seen, seen[1:]):
+            if sequence > previous + 1:
+                cursor._gaps.append([previous + 1, sequence - 1, deadline])
+        return cursor
+
+    @property
+    def gaps(self):
+        return sum(last - first + 1 for first, last, _ in self._gaps)
+
+    def fetch(self, db, limit=None):
+        """
+        Changes that filled a gap, then changes past the position, oldest first
+        within each.
+        """
+        limit = limit or settings.CHANGE_FEED_BATCH
+        now = time.monotonic()
+        self._gaps = [gap for gap in self._gaps if gap[2] > now]
+        late = []
+        if self._gaps:
+            late = db.execute(
+                select(*_FEED_COLUMNS)
+                .where(or_(*(
+                    and_(models.ItineraryChange.sequence >= first, models.ItineraryChange.sequence <= last)
+                    for first, last, _ in self._gaps
+                )))
+                .order_by(models.ItineraryChange.sequence)
+                .limit(limit)
+            ).all()
+        return late + since(db, self.position, limit)
+
+    def unseen(self, changes):
+        """
+        The changes this cursor has not observed yet.
+        """
+        return [change for change in changes if change.sequence > self.position or self._in_gap(change.sequence)]
+
+    def observe(self, changes):
+        """
+        Mark `changes` as handled: fill the gaps they were in and move past them,
+        remembering any sequences skipped on the way as new gaps.
+        """
+        deadline = time.monotonic() + self.grace
+        for change in sorted(changes, key=lambda change: change.sequence):
+            sequence = change.sequence
+            if sequence > self.position:
+                if sequence > self.position + 1:
+                    self._gaps.append([self.position + 1, sequence - 1, deadline])
+                self.position = sequence
+            else:
+                self._fill(sequence)
+
+    def _in_gap(self, sequence):
+        return any(first <= sequence <= last for first, last, _ in self._gaps)
+
+    def _fill(self, sequence):
+        for position, (first, last, deadline) in enumerate(self._gaps):
+            if first <= sequence <= last:
+                remaining = [[first, sequence - 1, deadline], [sequence + 1, last, deadline]]
+                self._gaps[position:position + 1] = [gap for gap in remaining if gap[0] <= gap[1]]
+                return
+
+
+class ChangeFeedFollower:
+    """
+    Tails itinerary_changes and calls every subscriber as `callback(db, changes)`
+    for each batch. The position only advances once all subscribers have taken
+    a batch, so a subscriber that raises sees the batch again on the next poll.
+    """
+
+    def __init__(self, session_factory, interval=None, batch_size=None):
+        self.session_factory = session_factory
+        self.interval = interval if interval is not None else settings.CHANGE_FEED_POLL_MS / 1000
+        self.batch_size = batch_size or settings.CHANGE_FEED_BATCH
+        self.cursor = None
+        self.delivered = 0
+        self.last_poll = None
+        self._subscribers = []
+        self._thread = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def position(self):
+        return self.cursor.position if self.cursor is not None else None
+
+    def subscribe(self, callback):
+        self._subscribers.append(callback)
+
+    def start(self, position=None):
+        """
+        Follow from `position`, or from the end of the feed.
+        """
+        db = self.session_factory()
+        try:
+            if position is None:
+                position = latest_sequence(db)
+            self.cursor = FeedCursor.at(db, position)
+        finally:
+            db.close()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="change-feed", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def poll(self):
+        """
+        Deliver every change past the current position. Returns how many.
+        """
+        delivered = 0
+        db = self.session_factory()
+        try:
+            while True:
+                batch = self.cursor.fetch(db, self.batch_size)
+                if not batch:
+                    break
+                for callback in self._subscribers:
+                    callback(db, batch)
+                self.cursor.observe(batch)
+                delivered += len(batch)
+                if len(batch) < self.batch_size:
+                    break
+        finally:
+            db.close()
+        self.last_poll = time.time()
+        self.delivered += delivered
+        return delivered
+
+    def stats(self):
+        return {
+            "running": self.running,
+            "position": self.position,
+            "gaps": self.cursor.gaps if self.cursor is not None else 0,
+            "delivered": self.delivered,
+            "last_poll": self.last_poll,
+        }
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+            except Exception:
+                # Keep following; the failed batch is delivered again next time
+                logger.exception("Change feed poll failed")
+
+
+class FeedPruner:
+    """
+    Deletes old changes (see prune) every `interval` seconds from a daemon
+    thread. Needs a session factory that can write.
+    """
+
+    def __init__(self, session_factory, interval=3600):
+        self.session_factory = session_factory
+        self.interval = interval
+        self.pruned = 0
+        self._thread = None
+        self._stop = threading.Event()
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="change-feed-pruner", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def prune(self):
+        db = self.session_factory()
+        try:
+            deleted = prune(db)
+            db.commit()
+        finally:
+            db.close()
+        self.pruned += deleted
+        return deleted
+
+    def _run(self):
+        while True:
+            try:
+                self.prune()
+            except Exception:
+                logger.exception("Change feed pruning failed")
+            if self._stop.wait(self.interval):
+                return
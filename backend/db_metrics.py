@@ -0,0 +1,110 @@
+import threading
+import time
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+
+
+class PoolMetrics:
+    """
+    Counters for connection pool checkouts: how many, how long callers waited
+    for a connection and how often they gave up after the pool timeout.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def observe_wait(self, seconds, timed_out=False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = self.timeouts = 0
+            self.wait_seconds_total = self.wait_seconds_max = 0.0
+
+
+class _TimedCheckoutMixin:
+    """
+    Times how long each checkout blocks waiting for a free connection.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Created with the pool: made lazily, two threads checking out first at
+        # the same time could each make one and lose the other's samples
+        self._metrics = PoolMetrics()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.metrics.observe_wait(time.perf_counter() - started, timed_out=True)
+            raise
+        self.metrics.observe_wait(time.perf_counter() - started)
+        return connection
+
+    @property
+    def metrics(self):
+        # One PoolMetrics per logical pool; SQLAlchemy recreates pool objects
+        # (e.g. on dispose) through recreate(), which copies _metrics over
+        return self._metrics
+
+    def recreate(self):
+        pool = super().recreate()
+        pool._metrics = self.metrics
+        return pool
+
+
+class TimedQueuePool(_TimedCheckoutMixin, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(_TimedCheckoutMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def pool_status(engine, async_engine=None):
+    """
+    Snapshot of an engine's pool: occupancy, saturation and checkout wait times.
+    Pools that don't queue (e.g. in-memory SQLite) only report their class.
+    `async_engine`'s pool, if given, is reported under "async".
+    """
+    if async_engine is not None:
+        return dict(pool_status(engine), **{"async": pool_status(async_engine)})
+    pool = engine.pool
+    status = {"pool_class": type(pool).__name__}
+    if not isinstance(pool, QueuePool):
+        return status
+
+    capacity = pool.size() + max(pool._max_overflow, 0)
+    checked_out = pool.checkedout()
+    status.update(
+        size=pool.size(),
+        max_overflow=pool._max_overflow,
+        checked_out=checked_out,
+        checked_in=pool.checkedin(),
+        overflow=pool.overflow(),
+        saturation=round(checked_out / capacity, 4) if capacity else 0.0,
+    )
+    metrics = getattr(pool, "metrics", None)
+    if metrics is not None:
+        status.update(
+            checkouts=metrics.checkouts,
+            checkout_timeouts=metrics.timeouts,
+            checkout_wait_seconds_total=round(metrics.wait_seconds_total, 6),
+            checkout_wait_seconds_max=round(metrics.wait_seconds_max, 6),
+            checkout_wait_seconds_avg=round(
+                metrics.wait_seconds_total / metrics.checkouts, 6
+            ) if metrics.checkouts else 0.0,
+        )
+    return status
@@ -0,0 +1,84 @@
+import csv
+import io
+from sqlalchemy import select
+import models
+import serializers
+
+# Rows fetched per round trip; memory use is bounded by this, not by table size
+EXPORT_BATCH_SIZE = 500
+
+CSV_TABLES = {
+    "itineraries": models.Itinerary,
+    "accommodations": models.Accommodation,
+    "transfers": models.Transfer,
+    "activities": models.Activity,
+}
+
+
+def _batches(session_factory, statement, id_column, after_id, batch_size, render):
+    """
+    Yield render(db, rows) for consecutive keyset batches of `statement`
+    (id > the last id seen, in id order). Each batch is read in a session of its
+    own that is closed before its chunk is yielded, so a slow client never holds
+    a transaction (a SQLite read lock, a PostgreSQL snapshot) open.
+    """
+    last_id = after_id
+    while True:
+        db = session_factory()
+        try:
+            rows = db.execute(
+                statement.where(id_column > last_id).order_by(id_column).limit(batch_size)
+            ).all()
+            if not rows:
+                return
+            chunk = render(db, rows)
+        finally:
+            db.close()
+        last_id = rows[-1].id
+        yield chunk
+
+
+def iter_ndjson(session_factory, after_id=0, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Yield every itinerary with id > after_id, in id order, as one NDJSON line
+    of the same JSON as GET /api/itineraries/{id}.
+
+    Parents are read in keyset batches; each batch's children are fetched with
+    one query per table. Batches are separate reads, so itineraries written
+    during the export appear in it if their id is past the ones already sent.
+    """
+    def render(db, rows):
+        return b"".join(
+            serializers.dumps(itinerary) + b"\n"
+            for itinerary in serializers.build_itineraries(db, rows)
+        )
+
+    yield from _batches(session_factory, serializers.itinerary_rows(), models.Itinerary.id,
+                        after_id, batch_size, render)
+
+
+def iter_csv(session_factory, table, after_id=0, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Yield one table as CSV, header first, rows with id > after_id in id order.
+    """
+    model = CSV_TABLES[table]
+    columns = [column for column in model.__table__.columns]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush():
+        chunk = buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+        return chunk
+
+    def render(db, rows):
+        writer.writerows(
+            [value.isoformat() if hasattr(value, "isoformat") else value for value in row]
+            for row in rows
+        )
+        return flush()
+
+    writer.writerow([column.name for column in columns])
+    yield flush()
+    yield from _batches(session_factory, select(*columns), model.id, after_id, batch_size, render)
@@ -0,0 +1,178 @@
+import re
+from collections import defaultdict
+from sqlalchemy import column, select, table, text
+import models
+
+# Relative weight of matches in the title, description and activities columns
+SQLITE_BM25_WEIGHTS = (10.0, 5.0, 3.0)
+
+REINDEX_CHUNK_SIZE = 1000
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+class UnsupportedDialect(ValueError):
+    pass
+
+
+def _dialect_name(db):
+    # Works for both Sessions and Connections
+    bind = db.get_bind() if hasattr(db, "get_bind") else db
+    return bind.dialect.name
+
+
+def supported(db):
+    """
+    Whether the database has a full-text index (see models.FULLTEXT_DDL).
+    """
+    return _dialect_name(db) in models.FULLTEXT_DDL
+
+
+def activities_text(activities):
+    """
+    Searchable text for a list of activities: names, locations and descriptions.
+    """
+    parts = []
+    for activity in activities:
+        parts.extend(
+            value for value in (activity.name, activity.location, activity.description) if value
+        )
+    return " ".join(parts)
+
+
+def index_documents(db, documents):
+    """
+    Add or replace full-text documents, given as
+    (itinerary_id, title, description, activities_text) tuples.
+    Runs in the caller's transaction.
+    """
+    documents = list(documents)
+    if not documents:
+        return
+    dialect = _dialect_name(db)
+    if dialect == "sqlite":
+        db.execute(
+            text("DELETE FROM itinerary_fts WHERE rowid = :id"),
+            [{"id": document[0]} for document in documents],
+        )
+        db.execute(
+            text(
+                "INSERT INTO itinerary_fts (rowid, title, description, activities) "
+                "VALUES (:id, :title, :description, :activities)"
+            ),
+            [
+                {"id": i, "title": title, "description": description or "", "activities": activities}
+                for i, title, description, activities in documents
+            ],
+        )
+    elif dialect == "postgresql":
+        db.execute(
+            text(
+                "INSERT INTO itinerary_fts (itinerary_id, document) VALUES (:id, "
+                "setweight(to_tsvector('english', :title), 'A') || "
+                "setweight(to_tsvector('english', :description), 'B') || "
+                "setweight(to_tsvector('english', :activities), 'C')) "
+                "ON CONFLICT (itinerary_id) DO UPDATE SET document = EXCLUDED.document"
+            ),
+            [
+                {"id": i, "title": title, "description": description or "", "activities": activities}
+                for i, title, description, activities in documents
+            ],
+        )
+
+
+def index_created(db, itinerary_ids, itineraries):
+    """
+    Index freshly created itineraries straight from their `schemas.ItineraryCreate`
+    payloads, without reading them back.
+    """
+    index_documents(db, (
+        (itinerary_id, itinerary.title, itinerary.description, activities_text(itinerary.activities))
+        for itinerary_id, itinerary in zip(itinerary_ids, itineraries)
+    ))
+
+
+def reindex(db, itinerary_ids=None):
+    """
+    Rebuild documents from the itinerary tables, for the given ids or for every
+    itinerary, in chunks. Runs in the caller's transaction.
+    """
+    if itinerary_ids is None:
+        itinerary_ids = db.execute(select(models.Itinerary.id).order_by(models.Itinerary.id)).scalars().all()
+    itinerary_ids = list(itinerary_ids)
+    for start in range(0, len(itinerary_ids), REINDEX_CHUNK_SIZE):
+        chunk = itinerary_ids[start:start + REINDEX_CHUNK_SIZE]
+        activities = defaultdict(list)
+        for activity in db.execute(
+            select(models.Activity.itinerary_id, models.Activity.name,
+                   models.Activity.location, models.Activity.description)
+            .where(models.Activity.itinerary_id.in_(chunk))
+            .order_by(models.Activity.id)
+        ):
+            activities[activity.itinerary_id].append(activity)
+        index_documents(db, (
+            (row.id, row.title, row.description, activities_text(activities[row.id]))
+            for row in db.execute(
+                select(models.Itinerary.id, models.Itinerary.title, models.Itinerary.description)
+                .where(models.Itinerary.id.in_(chunk))
+            )
+        ))
+
+
+def backfill(db):
+    """
+    Index itineraries that have no full-text document yet, e.g. rows written
+    before the index existed. Returns how many were added; 0 on databases
+    without full-text support.
+    """
+    if not supported(db):
+        return 0
+    document_id = "rowid" if _dialect_name(db) == "sqlite" else "itinerary_id"
+    missing = db.execute(
+        select(models.Itinerary.id)
+        .where(models.Itinerary.id.not_in(select(column(document_id)).select_from(table("itinerary_fts"))))
+        .order_by(models.Itinerary.id)
+    ).scalars().all()
+    reindex(db, missing)
+    return len(missing)
+
+
+def sqlite_match_expression(query):
+    """
+    FTS5 MATCH expression requiring every word of a free-text query. Words are
+    quoted so user input can't inject FTS5 syntax.
+    """
+    return " ".join(f'"{token}"' for token in _TOKEN.findall(query))
+
+
+def search(db, query, limit=20):
+    """
+    [(itinerary_id, rank)] for the best matches, best first; higher rank is better.
+    Raises UnsupportedDialect on databases without full-text support.
+    """
+    dialect = _dialect_name(db)
+    if dialect == "sqlite":
+        expression = sqlite_match_expression(query)
+        if not expression:
+            return []
+        weights = ", ".join(str(weight) for weight in SQLITE_BM25_WEIGHTS)
+        rows = db.execute(
+            text(
+                f"SELECT rowid, bm25(itinerary_fts, {weights}) AS score FROM itinerary_fts "
+                "WHERE itinerary_fts MATCH :expression ORDER BY score LIMIT :limit"
+            ),
+            {"expression": expression, "limit": limit},
+        )
+        # bm25() is lower-is-better and negative; flip it so higher is better
+        return [(row.rowid, -row.score) for row in rows]
+    if dialect == "postgresql":
+        rows = db.execute(
+            text(
+                "SELECT itinerary_id, ts_rank(document, query) AS score "
+                "FROM itinerary_fts, plainto_tsquery('english', :query) AS query "
+                "WHERE document @@ query ORDER BY score DESC LIMIT :limit"
+            ),
+            {"query": query, "limit": limit},
+        )
+        return [(row.itinerary_id, row.score) for row in rows]
+    raise UnsupportedDialect(f"Full-text search is not available on {dialect} databases")
@@ -0,0 +1,81 @@
+"""
+Idempotency-Key support for POST /api/itineraries.
+
+A client retrying a create after a timeout sends the same Idempotency-Key header
+each time. The first request stores the key, a fingerprint of its payload and
+the new itinerary's id in the same transaction as the itinerary, so either both
+exist or neither does. Later requests with that key get the stored itinerary
+back instead of creating another, and reusing a key for a different payload is
+refused. Keys expire after IDEMPOTENCY_KEY_TTL seconds, and every keyed create
+deletes the expired ones. A key whose itinerary has since been deleted counts
+as expired, including when a later itinerary has taken its id (SQLite reuses
+the ids of deleted rows): a key is stamped with its itinerary's created_at and
+only matches an itinerary created no later than that.
+"""
+import hashlib
+from datetime import datetime, timedelta
+from sqlalchemy import and_, delete, insert, select
+import models
+import schemas
+import settings
+
+MAX_KEY_LENGTH = 255
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+
+class KeyReused(ValueError):
+    pass
+
+
+def fingerprint(itinerary):
+    """
+    SHA-256 of a `schemas.ItineraryCreate` payload.
+    """
+    return hashlib.sha256(itinerary.model_dump_json().encode()).hexdigest()
+
+
+def _expiry():
+    return datetime.utcnow() - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+
+
+def replay(db, key, request_fingerprint):
+    """
+    The itinerary created earlier with `key` as a `schemas.Itinerary`, or None if
+    the key is unknown, expired or its itinerary was deleted. The key of a deleted
+    itinerary is deleted too, in the caller's transaction. Raises KeyReused if
+    the key came with a different payload.
+    """
+    stored = db.execute(
+        select(models.IdempotencyKey.fingerprint, models.IdempotencyKey.itinerary_id,
+               models.IdempotencyKey.created_at, models.Itinerary.id.label("existing_id"))
+        .outerjoin(models.Itinerary, and_(
+            models.Itinerary.id == models.IdempotencyKey.itinerary_id,
+            models.Itinerary.created_at <= models.IdempotencyKey.created_at,
+        ))
+        .where(models.IdempotencyKey.key == key)
+    ).first()
+    if stored is None or stored.created_at < _expiry():
+        return None
+    if stored.existing_id is None:
+        db.execute(delete(models.IdempotencyKey).where(models.IdempotencyKey.key == key))
+        return None
+    if stored.fingerprint != request_fingerprint:
+        raise KeyReused("Idempotency-Key was already used for a different request")
+    itinerary = db.execute(
+        select(models.Itinerary)
+        .options(*models.itinerary_load_options("selectin"))
+        .where(models.Itinerary.id == stored.itinerary_id)
+    ).scalar_one_or_none()
+    return schemas.Itinerary.model_validate(itinerary, from_attributes=True) if itinerary is not None else None
+
+
+def remember(db, key, request_fingerprint, itinerary_id, created_at):
+    """
+    Store `key` for a new itinerary, created at `created_at`, in the caller's
+    transaction, after deleting every expired key. The insert raises
+    IntegrityError when a concurrent request with the same key got there first.
+    """
+    db.execute(delete(models.IdempotencyKey).where(models.IdempotencyKey.created_at < _expiry()))
+    db.execute(insert(models.IdempotencyKey).values(
+        key=key, fingerprint=request_fingerprint, itinerary_id=itinerary_id, created_at=created_at,
+    ))
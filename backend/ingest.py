@@ -0,0 +1,77 @@
+from sqlalchemy import insert
+import models
+import fulltext
+import summaries
+import changes
+
+# Rows per executemany batch for bulk ingestion
+DEFAULT_BATCH_SIZE = 1000
+
+
+def begin_transaction(db):
+    """
+    Open the session's transaction with an explicit BEGIN on SQLite.
+
+    pysqlite only begins a transaction implicitly before INSERT/UPDATE/DELETE, so
+    a SAVEPOINT sent first starts one of its own and its RELEASE commits. After
+    BEGIN, savepoints nest inside one transaction that only the final commit
+    makes durable.
+    """
+    connection = db.connection()
+    if connection.dialect.name == "sqlite" and not connection.connection.dbapi_connection.in_transaction:
+        connection.exec_driver_sql("BEGIN")
+
+
+def bulk_insert_itineraries(db, itineraries):
+    """
+    Insert validated `schemas.ItineraryCreate` objects with executemany-style
+    statements: one INSERT ... RETURNING for the parents and one INSERT per
+    child table, instead of a flush per row.
+
+    Runs inside the caller's transaction and does not commit. Returns the new
+    itinerary ids in input order.
+    """
+    if not itineraries:
+        return []
+
+    result = db.execute(
+        insert(models.Itinerary).returning(models.Itinerary.id, sort_by_parameter_order=True),
+        [
+            {
+                "title": itinerary.title,
+                "duration_nights": itinerary.duration_nights,
+                "description": itinerary.description,
+            }
+            for itinerary in itineraries
+        ],
+    )
+    ids = list(result.scalars())
+
+    accommodations, transfers, activities = [], [], []
+    for itinerary_id, itinerary in zip(ids, itineraries):
+        accommodations.extend(
+            dict(accommodation.model_dump(), itinerary_id=itinerary_id)
+            for accommodation in itinerary.accommodations
+        )
+        transfers.extend(
+            dict(transfer.model_dump(), itinerary_id=itinerary_id)
+            for transfer in itinerary.transfers
+        )
+        activities.extend(
+            dict(activity.model_dump(), itinerary_id=itinerary_id)
+            for activity in itinerary.activities
+        )
+
+    # Add accommodations, transfers and activities
+    for model, rows in (
+        (models.Accommodation, accommodations),
+        (models.Transfer, transfers),
+        (models.Activity, activities),
+    ):
+        if rows:
+            db.execute(insert(model), rows)
+
+    fulltext.index_created(db, ids, itineraries)
+    summaries.summarize_created(db, ids, itineraries)
+    changes.record(db, ids)
+    return ids
@@ -0,0 +1,229 @@
+"""
+Request-level instrumentation for the API and MCP server.
+
+install(app, service, engine) adds a middleware that records a latency histogram
+per route, counts the SQL statements and database time spent by each request,
+adds a Server-Timing header to the response, and serves everything on
+GET /metrics in the Prometheus text format. Statements slower than
+SLOW_QUERY_MS are logged to the "itinerary.sql" logger.
+
+SQL is timed through cursor events on every Engine (the primary, read and async
+engines alike) and attributed to the request through a context variable, which
+Starlette carries into the threadpool that runs sync handlers. Streaming
+responses (the export) are measured up to the start of the response body.
+"""
+import contextvars
+import logging
+import threading
+import time
+from fastapi import Response
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+import db_metrics
+import settings
+
+logger = logging.getLogger("itinerary.sql")
+
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Pool status fields exported as gauges, see db_metrics.pool_status
+POOL_GAUGES = ("size", "checked_out", "overflow", "saturation", "checkouts",
+               "checkout_timeouts", "checkout_wait_seconds_total")
+
+# Starlette appends "; charset=utf-8"
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4"
+
+
+class RequestStats:
+    """
+    SQL statements and database time of the request being handled.
+    """
+
+    __slots__ = ("path", "queries", "db_seconds")
+
+    def __init__(self, path):
+        self.path = path
+        self.queries = 0
+        self.db_seconds = 0.0
+
+
+_current_request = contextvars.ContextVar("current_request_stats", default=None)
+
+_slow_queries = 0
+_slow_queries_lock = threading.Lock()
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    global _slow_queries
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    stats = _current_request.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+    if elapsed * 1000 >= settings.SLOW_QUERY_MS:
+        with _slow_queries_lock:
+            _slow_queries += 1
+        logger.warning(
+            "slow query: %.1f ms%s: %s", elapsed * 1000,
+            f" ({stats.path})" if stats is not None else "", " ".join(statement.split())[:1000],
+        )
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(exception_context):
+    # after_cursor_execute doesn't run for a statement that raised; drop its start
+    # time so later statements on this pooled connection don't pop it
+    connection = exception_context.connection
+    if connection is not None:
+        connection.info.pop("query_started", None)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for position, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[position] += 1
+                break
+        self.total += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """
+    Per-route request metrics for one app, rendered in the Prometheus text format.
+    """
+
+    def __init__(self, service, engine=None, async_engine=None, buckets=LATENCY_BUCKETS):
+        self.service = service
+        self.engine = engine
+        self.async_engine = async_engine
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._latency = {}
+        self._requests = {}
+        self._db_queries = {}
+        self._db_seconds = {}
+
+    def observe(self, method, route, status, seconds, stats):
+        key = (method, route)
+        with self._lock:
+            histogram = self._latency.get(key)
+            if histogram is None:
+                histogram = self._latency[key] = Histogram(self.buckets)
+            histogram.observe(seconds)
+            status_key = (method, route, str(status))
+            self._requests[status_key] = self._requests.get(status_key, 0) + 1
+            self._db_queries[key] = self._db_queries.get(key, 0) + stats.queries
+            self._db_seconds[key] = self._db_seconds.get(key, 0.0) + stats.db_seconds
+
+    def render(self):
+        lines = []
+        service = f'service="{_escape(self.service)}"'
+
+        def route_labels(method, route):
+            return f'{service},method="{method}",route="{_escape(route)}"'
+
+        with self._lock:
+            lines += [
+                "# HELP http_request_duration_seconds Request latency by route.",
+                "# TYPE http_request_duration_seconds histogram",
+            ]
+            for (method, route), histogram in sorted(self._latency.items()):
+                labels = route_labels(method, route)
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                lines.append(f"http_request_duration_seconds_sum{{{labels}}} {histogram.total:.6f}")
+                lines.append(f"http_request_duration_seconds_count{{{labels}}} {histogram.count}")
+
+            lines += [
+                "# HELP http_requests_total Requests by route and status code.",
+                "# TYPE http_requests_total counter",
+            ]
+            for (method, route, status), count in sorted(self._requests.items()):
+                lines.append(f'http_requests_total{{{route_labels(method, route)},status="{status}"}} {count}')
+
+            lines += [
+                "# HELP http_request_db_queries_total SQL statements executed by requests, by route.",
+                "# TYPE http_request_db_queries_total counter",
+            ]
+            for (method, route), count in sorted(self._db_queries.items()):
+                lines.append(f"http_request_db_queries_total{{{route_labels(method, route)}}} {count}")
+
+            lines += [
+                "# HELP http_request_db_seconds_total Time spent executing SQL by requests, by route.",
+                "# TYPE http_request_db_seconds_total counter",
+            ]
+            for (method, route), seconds in sorted(self._db_seconds.items()):
+                lines.append(f"http_request_db_seconds_total{{{route_labels(method, route)}}} {seconds:.6f}")
+
+        lines += [
+            f"# HELP db_slow_queries_total Statements slower than {settings.SLOW_QUERY_MS} ms.",
+            "# TYPE db_slow_queries_total counter",
+            f"db_slow_queries_total{{{service}}} {_slow_queries}",
+        ]
+
+        pools = [(service, self.engine), (f'{service},pool="async"', self.async_engine)]
+        statuses = [(labels, db_metrics.pool_status(engine)) for labels, engine in pools if engine is not None]
+        for name in POOL_GAUGES:
+            samples = [f"db_pool_{name}{{{labels}}} {status[name]}" for labels, status in statuses if name in status]
+            if samples:
+                lines += [f"# TYPE db_pool_{name} gauge", *samples]
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def install(app, service, engine=None, async_engine=None):
+    """
+    Add the timing middleware and GET /metrics to `app`. `engine` is the one
+    whose pool gauges are exported; `async_engine`'s pool, if given, is exported
+    too, labelled pool="async".
+    """
+    registry = MetricsRegistry(service, engine, async_engine)
+    app.state.metrics = registry
+
+    @app.middleware("http")
+    async def record_request(request, call_next):
+        stats = RequestStats(request.url.path)
+        token = _current_request.set(stats)
+        started = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+        finally:
+            elapsed = time.perf_counter() - started
+            _current_request.reset(token)
+            # Label by route template, not the raw path, to keep series bounded
+            route = request.scope.get("route")
+            registry.observe(request.method, route.path if route is not None else "unmatched",
+                             status, elapsed, stats)
+        response.headers["Server-Timing"] = (
+            f'db;dur={stats.db_seconds * 1000:.2f};desc="{stats.queries} queries", '
+            f"total;dur={elapsed * 1000:.2f}"
+        )
+        return response
+
+    @app.get("/metrics", include_in_schema=False)
+    def get_metrics():
+        return Response(content=registry.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+    return registry
@@ -1,12 +1,46 @@
-from fastapi import FastAPI, Depends, HTTPException, Query
+from fastapi import FastAPI, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy import tuple_
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from sqlalchemy.orm import Session
 from typing import List, Optional
 import models
+import db_metrics
 import schemas
+import async_api
+import pagination
+import ingest
+import response_cache
+import serializers
+import settings
+import search
+import fulltext
+import summaries
+import changes
+import backfill
+import idempotency
+import export
+import instrumentation
+import profiler
+import json
+import time
 from datetime import date, timedelta
 
 app = FastAPI(title="Travel Itinerary API")
 
+if settings.METRICS_ENABLED:
+    instrumentation.install(app, "api", models.engine,
+                            async_engine=models.get_async_engine() if models.ASYNC_MODE else None)
+if settings.PROFILER_ENABLED:
+    profiler.install(app, "api")
+
+# With ITINERARY_DB_MODE=async the async handlers are registered first and
+# take over the matching paths below
+if models.ASYNC_MODE:
+    app.include_router(async_api.itinerary_router)
+
 # Dependency to get the database session
 def get_db():
     db = models.SessionLocal()
@@ -15,88 +49,455 @@ def get_db():
     finally:
         db.close()
 
+# The memory cache is per worker process; following the change feed lets writes
+# handled by other workers invalidate it within CHANGE_FEED_POLL_MS
+change_feed = changes.ChangeFeedFollower(models.SessionLocal)
+change_feed.subscribe(lambda db, feed: response_cache.cache.invalidate())
+# The API writes, so it also trims the feed to CHANGE_FEED_RETENTION_HOURS
+feed_pruner = changes.FeedPruner(models.SessionLocal)
+
+@app.on_event("startup")
+def backfill_existing_itineraries():
+    """
+    Index and summarize itineraries written before those tables existed, so text
+    search finds them after an upgrade. Under run.py the supervisor has done this
+    once already.
+    """
+    if settings.STARTUP_BACKFILL:
+        backfill.run()
+
+@app.on_event("startup")
+def follow_changes():
+    if isinstance(response_cache.cache.backend, response_cache.MemoryBackend):
+        change_feed.start()
+    feed_pruner.start()
+
+@app.on_event("shutdown")
+def stop_following_changes():
+    change_feed.stop()
+    feed_pruner.stop()
+
 @app.get("/")
 def read_root():
     return {"message": "Welcome to the Travel Itinerary API!"}
 
 
+@app.get("/api/metrics/pool")
+def get_pool_metrics():
+    """
+    Connection pool occupancy, saturation and checkout wait times; in async
+    mode the async handlers' pool is under `async`
+    """
+    return db_metrics.pool_status(models.engine, models.get_async_engine() if models.ASYNC_MODE else None)
+
+
+@app.get("/api/metrics/cache")
+def get_cache_metrics():
+    """
+    Response cache hit and miss counters, and how far this worker has followed
+    the change feed
+    """
+    return dict(response_cache.cache.stats(), change_feed=change_feed.stats())
+
+
 @app.get("/api/itineraries", response_model=List[schemas.Itinerary])
 def get_itineraries(
+    request: Request,
     skip: int = 0, 
     limit: int = 100, 
     db: Session = Depends(get_db)
 ):
     """
     Get all itineraries with pagination support
+
+    Offset-based paging kept for existing clients; prefer /api/itineraries/page,
+    whose cost does not grow with the page depth. Responses are cached and carry
+    an ETag; send it back in If-None-Match to get a 304.
+    """
+    cache_key = f"itineraries:{skip}:{limit}"
+    generation = response_cache.cache.generation()
+    entry = response_cache.cache.get(cache_key, generation)
+    if entry is not None:
+        return response_cache.conditional_response(request, entry, "HIT")
+
+    if settings.SERIALIZATION_MODE == "fast":
+        itineraries = db.execute(serializers.itinerary_rows().offset(skip).limit(limit)).all()
+        body = serializers.dumps(serializers.build_itineraries(db, itineraries))
+    else:
+        itineraries = (
+            db.query(models.Itinerary)
+            .options(*models.itinerary_load_options("selectin"))
+            .offset(skip)
+            .limit(limit)
+            .all()
+        )
+        body = serializers.serialize_itineraries(itineraries)
+    entry = response_cache.cache.put(cache_key, body, serializers.last_modified(itineraries), generation)
+    return response_cache.conditional_response(request, entry, "MISS")
+
+
+@app.get("/api/itineraries/page", response_model=schemas.ItineraryPage)
+def get_itineraries_page(
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db)
+):
+    """
+    Get itineraries with keyset pagination ordered by (created_at, id).
+
+    Pass the returned `next_cursor` to fetch the following page; it is null on
+    the last page. Unlike skip/limit, deep pages cost the same as the first one.
+    """
+    query = db.query(models.Itinerary).options(*models.itinerary_load_options("selectin"))
+    if cursor:
+        try:
+            created_at, last_id = pagination.decode_cursor(cursor)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+        query = query.filter(
+            tuple_(models.Itinerary.created_at, models.Itinerary.id) > tuple_(created_at, last_id)
+        )
+
+    # Fetch one extra row to know whether another page exists
+    itineraries = (
+        query.order_by(models.Itinerary.created_at, models.Itinerary.id)
+        .limit(limit + 1)
+        .all()
+    )
+    next_cursor = None
+    if len(itineraries) > limit:
+        itineraries = itineraries[:limit]
+        last = itineraries[-1]
+        next_cursor = pagination.encode_cursor(last.created_at, last.id)
+    return {"items": itineraries, "next_cursor": next_cursor}
+
+
+@app.get("/api/itineraries/search", response_model=List[schemas.Itinerary])
+def search_itineraries(
+    location: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    min_nights: Optional[int] = Query(None, ge=0),
+    max_nights: Optional[int] = Query(None, ge=0),
+    transport_type: Optional[str] = None,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db)
+):
+    """
+    Search itineraries by location (accommodation or activity), date range
+    (activity or transfer dates), number of nights and transport type.
+
+    All filters are optional and combined with AND; each one is answered from
+    an index rather than by scanning the child tables.
+    """
+    if date_from and date_to and date_from > date_to:
+        raise HTTPException(status_code=400, detail="date_from must not be after date_to")
+    if min_nights is not None and max_nights is not None and min_nights > max_nights:
+        raise HTTPException(status_code=400, detail="min_nights must not be greater than max_nights")
+
+    filters = search.itinerary_filters(
+        location=location,
+        date_from=date_from,
+        date_to=date_to,
+        min_nights=min_nights,
+        max_nights=max_nights,
+        transport_type=transport_type,
+    )
+    if settings.SERIALIZATION_MODE == "fast":
+        rows = db.execute(
+            serializers.itinerary_rows().where(*filters)
+            .order_by(models.Itinerary.id).offset(skip).limit(limit)
+        ).all()
+        return Response(
+            content=serializers.dumps(serializers.build_itineraries(db, rows)),
+            media_type="application/json",
+        )
+    return (
+        db.query(models.Itinerary)
+        .options(*models.itinerary_load_options("selectin"))
+        .filter(*filters)
+        .order_by(models.Itinerary.id)
+        .offset(skip)
+        .limit(limit)
+        .all()
+    )
+
+
+@app.get("/api/itineraries/text-search", response_model=List[schemas.ItinerarySearchResult])
+def text_search_itineraries(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    """
+    Full-text search over itinerary titles and descriptions and their activities'
+    names, locations and descriptions, best matches first.
+
+    Every word of `q` must match (stemmed, case-insensitive), e.g. "snorkeling Phi Phi".
+    Answers 501 on databases without full-text support (SQLite and PostgreSQL have it).
+    """
+    try:
+        hits = fulltext.search(db, q, limit=limit)
+    except fulltext.UnsupportedDialect as exc:
+        raise HTTPException(status_code=501, detail=str(exc))
+    if not hits:
+        return []
+    itineraries = {
+        itinerary.id: itinerary
+        for itinerary in db.query(
+            models.Itinerary.id,
+            models.Itinerary.title,
+            models.Itinerary.duration_nights,
+            models.Itinerary.description,
+        ).filter(models.Itinerary.id.in_([itinerary_id for itinerary_id, _ in hits]))
+    }
+    return [
+        schemas.ItinerarySearchResult(
+            id=itinerary_id,
+            title=itineraries[itinerary_id].title,
+            duration_nights=itineraries[itinerary_id].duration_nights,
+            description=itineraries[itinerary_id].description,
+            rank=rank
+        )
+        for itinerary_id, rank in hits
+        if itinerary_id in itineraries
+    ]
+
+
+@app.get("/api/itineraries/export")
+def export_itineraries(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    table: str = Query("itineraries", pattern="^(itineraries|accommodations|transfers|activities)$"),
+    after_id: int = Query(0, ge=0)
+):
     """
-    itineraries = db.query(models.Itinerary).offset(skip).limit(limit).all()
-    return itineraries
+    Stream the whole catalogue without paging.
+
+    `ndjson` (default) writes one complete itinerary per line, ordered by id.
+    `csv` writes a single table (`table`), ordered by that table's id. To resume
+    an interrupted export, pass the last id received as `after_id`.
+    """
+    if format == "csv":
+        return StreamingResponse(
+            export.iter_csv(models.SessionLocal, table, after_id=after_id),
+            media_type="text/csv",
+            headers={"Content-Disposition": f'attachment; filename="{table}.csv"'},
+        )
+    return StreamingResponse(
+        export.iter_ndjson(models.SessionLocal, after_id=after_id),
+        media_type="application/x-ndjson",
+    )
 
 
 @app.get("/api/itineraries/{itinerary_id}", response_model=schemas.Itinerary)
-def get_itinerary(itinerary_id: int, db: Session = Depends(get_db)):
+def get_itinerary(request: Request, itinerary_id: int, db: Session = Depends(get_db)):
     """
     Get a specific itinerary by ID
     """
-    itinerary = db.query(models.Itinerary).filter(models.Itinerary.id == itinerary_id).first()
-    if itinerary is None:
-        raise HTTPException(status_code=404, detail="Itinerary not found")
-    return itinerary
+    cache_key = f"itinerary:{itinerary_id}"
+    generation = response_cache.cache.generation()
+    entry = response_cache.cache.get(cache_key, generation)
+    if entry is not None:
+        return response_cache.conditional_response(request, entry, "HIT")
+
+    if settings.SERIALIZATION_MODE == "fast":
+        itinerary = db.execute(
+            serializers.itinerary_rows().where(models.Itinerary.id == itinerary_id)
+        ).first()
+        if itinerary is None:
+            raise HTTPException(status_code=404, detail="Itinerary not found")
+        body = serializers.dumps(serializers.build_itineraries(db, [itinerary])[0])
+    else:
+        itinerary = (
+            db.query(models.Itinerary)
+            .options(*models.itinerary_load_options("joined"))
+            .filter(models.Itinerary.id == itinerary_id)
+            .first()
+        )
+        if itinerary is None:
+            raise HTTPException(status_code=404, detail="Itinerary not found")
+        body = serializers.serialize_itinerary(itinerary)
+    entry = response_cache.cache.put(cache_key, body, serializers.last_modified([itinerary]), generation)
+    return response_cache.conditional_response(request, entry, "MISS")
 
 
 @app.post("/api/itineraries", response_model=schemas.Itinerary)
-def create_itinerary(itinerary: schemas.ItineraryCreate, db: Session = Depends(get_db)):
+def create_itinerary(
+    itinerary: schemas.ItineraryCreate,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, max_length=idempotency.MAX_KEY_LENGTH),
+    db: Session = Depends(get_db)
+):
     """
     Create a new itinerary with accommodations, transfers, and activities
+
+    Everything is written in one transaction. Retries are safe with an
+    `Idempotency-Key` header: a repeated request with the same key returns the
+    itinerary the first one created, flagged with `Idempotent-Replayed: true`.
     """
-    # Create the itinerary
+    fingerprint = None
+    if idempotency_key is not None:
+        fingerprint = idempotency.fingerprint(itinerary)
+        existing = _replay(db, response, idempotency_key, fingerprint)
+        if existing is not None:
+            return existing
+
+    # The itinerary and its children as one unit of work; the flush assigns their ids
     db_itinerary = models.Itinerary(
         title=itinerary.title,
         duration_nights=itinerary.duration_nights,
-        description=itinerary.description
+        description=itinerary.description,
+        accommodations=[models.Accommodation(**a.model_dump()) for a in itinerary.accommodations],
+        transfers=[models.Transfer(**t.model_dump()) for t in itinerary.transfers],
+        activities=[models.Activity(**a.model_dump()) for a in itinerary.activities],
     )
     db.add(db_itinerary)
-    db.commit()
-    db.refresh(db_itinerary)
-    
-    # Add accommodations
-    for accommodation in itinerary.accommodations:
-        db_accommodation = models.Accommodation(
-            itinerary_id=db_itinerary.id,
-            name=accommodation.name,
-            location=accommodation.location,
-            check_in_date=accommodation.check_in_date,
-            check_out_date=accommodation.check_out_date,
-            nights=accommodation.nights
-        )
-        db.add(db_accommodation)
+    db.flush()
     
-    # Add transfers
-    for transfer in itinerary.transfers:
-        db_transfer = models.Transfer(
-            itinerary_id=db_itinerary.id,
-            from_location=transfer.from_location,
-            to_location=transfer.to_location,
-            transport_type=transfer.transport_type,
-            date=transfer.date
-        )
-        db.add(db_transfer)
-    
-    # Add activities
-    for activity in itinerary.activities:
-        db_activity = models.Activity(
-            itinerary_id=db_itinerary.id,
-            name=activity.name,
-            location=activity.location,
-            date=activity.date,
-            duration_hours=activity.duration_hours,
-            description=activity.description
+    # Keep the full-text index and the recommendation summary in step with the new
+    # itinerary, and announce it on the change feed
+    fulltext.index_created(db, [db_itinerary.id], [itinerary])
+    summaries.summarize_created(db, [db_itinerary.id], [itinerary])
+    changes.record(db, [db_itinerary.id])
+
+    # Serialized before the commit expires it, so answering needs no reads
+    created = schemas.Itinerary.model_validate(db_itinerary, from_attributes=True)
+    try:
+        if idempotency_key is not None:
+            idempotency.remember(db, idempotency_key, fingerprint, db_itinerary.id, db_itinerary.created_at)
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        if idempotency_key is None:
+            raise
+        # A concurrent request with the same key committed first
+        existing = _replay(db, response, idempotency_key, fingerprint)
+        if existing is None:
+            raise HTTPException(status_code=409, detail="Conflicting request with the same Idempotency-Key")
+        return existing
+    response_cache.cache.invalidate()
+    return created
+
+
+def _replay(db, response, key, fingerprint):
+    try:
+        existing = idempotency.replay(db, key, fingerprint)
+    except idempotency.KeyReused as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+    if existing is not None:
+        response.headers[idempotency.REPLAYED_HEADER] = "true"
+    return existing
+
+
+def _ingest_batch(db, batch, errors):
+    """
+    Write one batch of (index, ItineraryCreate) pairs inside a savepoint so a
+    failing batch is reported per item without losing the rest of the import.
+    """
+    try:
+        with db.begin_nested():
+            ingest.bulk_insert_itineraries(db, [item for _, item in batch])
+    except SQLAlchemyError as exc:
+        errors.extend(
+            schemas.BulkItemError(index=index, error=f"Database error: {exc.__class__.__name__}")
+            for index, _ in batch
         )
-        db.add(db_activity)
-    
-    db.commit()
-    db.refresh(db_itinerary)
-    return db_itinerary
+        return 0
+    return len(batch)
+
+
+async def _iter_bulk_payload(request):
+    """
+    Yield (index, raw item) pairs from an NDJSON stream or a JSON array body.
+    Undecodable NDJSON lines are yielded as ValueError instances.
+    """
+    content_type = request.headers.get("content-type", "")
+    if "ndjson" in content_type or "jsonl" in content_type:
+        index = 0
+        buffer = b""
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    yield index, _decode_line(line)
+                    index += 1
+        if buffer.strip():
+            yield index, _decode_line(buffer)
+        return
+
+    try:
+        payload = json.loads(await request.body())
+    except json.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON stream")
+    if not isinstance(payload, list):
+        raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON stream")
+    for index, item in enumerate(payload):
+        yield index, item
+
+
+def _decode_line(line):
+    try:
+        return json.loads(line)
+    except json.JSONDecodeError as exc:
+        return ValueError(f"Invalid JSON: {exc.msg}")
+
+
+@app.post("/api/itineraries:bulk", response_model=schemas.BulkIngestResult)
+async def bulk_create_itineraries(
+    request: Request,
+    batch_size: int = Query(ingest.DEFAULT_BATCH_SIZE, ge=1, le=10000),
+    db: Session = Depends(get_db)
+):
+    """
+    Create many itineraries from a JSON array or an NDJSON stream
+    (Content-Type: application/x-ndjson).
+
+    Items are validated one by one and written in batches of `batch_size` with
+    bulk inserts, all in a single transaction: if the request fails or the client
+    disconnects part way, nothing is imported. Invalid items are reported in
+    `errors` by their position in the input and do not stop the import.
+    """
+    started = time.perf_counter()
+    received = created = 0
+    errors = []
+    batch = []
+    await run_in_threadpool(ingest.begin_transaction, db)
+
+    async for index, raw in _iter_bulk_payload(request):
+        received += 1
+        if isinstance(raw, ValueError):
+            errors.append(schemas.BulkItemError(index=index, error=str(raw)))
+            continue
+        try:
+            batch.append((index, schemas.ItineraryCreate.model_validate(raw)))
+        except ValidationError as exc:
+            message = "; ".join(
+                f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}"
+                for error in exc.errors()
+            )
+            errors.append(schemas.BulkItemError(index=index, error=message))
+            continue
+        if len(batch) >= batch_size:
+            created += await run_in_threadpool(_ingest_batch, db, batch, errors)
+            batch = []
+
+    if batch:
+        created += await run_in_threadpool(_ingest_batch, db, batch, errors)
+    await run_in_threadpool(db.commit)
+    if created:
+        response_cache.cache.invalidate()
+
+    elapsed = time.perf_counter() - started
+    return schemas.BulkIngestResult(
+        received=received,
+        created=created,
+        failed=len(errors),
+        errors=sorted(errors, key=lambda error: error.index),
+        elapsed_seconds=round(elapsed, 4),
+        items_per_second=round(created / elapsed, 1) if elapsed > 0 else 0.0,
+    )
 
 
 if __name__ == "__main__":
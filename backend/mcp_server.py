@@ -1,74 +1,170 @@
-from fastapi import FastAPI, Depends, HTTPException, Path
+from fastapi import FastAPI, Depends, HTTPException, Path, Query
+from fastapi.exceptions import RequestValidationError
 from sqlalchemy.orm import Session
 import models
+import db_metrics
 import schemas
-from typing import List
-import random
+import async_api
+import recommendations
+import recommendation_index
+import similarity
+import changes
+import serializers
+import backfill
+import instrumentation
+import profiler
+import settings
+from typing import List, Optional
 
 app = FastAPI(title="MCP Server for Travel Itineraries")
+app.add_exception_handler(RequestValidationError, serializers.validation_error_response)
 
-# Dependency to get the database session
+if settings.METRICS_ENABLED:
+    instrumentation.install(app, "mcp", models.read_engine,
+                            async_engine=models.get_async_engine() if models.ASYNC_MODE else None)
+if settings.PROFILER_ENABLED:
+    profiler.install(app, "mcp")
+
+# With ITINERARY_DB_MODE=async the async handlers are registered first and
+# take over the matching paths below
+if models.ASYNC_MODE:
+    app.include_router(async_api.recommendation_router)
+
+# Dependency to get the database session; the recommendation server only reads,
+# so it uses the read-only pool when one is configured
 def get_db():
-    db = models.SessionLocal()
+    db = models.ReadSessionLocal()
     try:
         yield db
     finally:
         db.close()
 
+# Applies itineraries created through the API to the recommendation index
+change_feed = changes.ChangeFeedFollower(models.ReadSessionLocal)
+change_feed.subscribe(recommendation_index.index.apply)
+
+@app.on_event("startup")
+def prepare_recommendations():
+    """
+    Summarize itineraries written before the summary table existed (unless run.py
+    has already done it once for all workers), then build the in-memory
+    recommendation index and follow the change feed from where it was built.
+    Maps the similar-itineraries index too, if one has been built.
+    """
+    if settings.STARTUP_BACKFILL:
+        backfill.run()
+
+    if settings.RECOMMENDATION_INDEX:
+        db = models.ReadSessionLocal()
+        try:
+            recommendation_index.index.build(db)
+        finally:
+            db.close()
+        change_feed.start(recommendation_index.index.position)
+
+    similarity.index.ensure_loaded()
+
+@app.on_event("shutdown")
+def stop_following_changes():
+    change_feed.stop()
+
 @app.get("/")
 def read_root():
     return {"message": "Welcome MCP Server to the Travel Itinerary API!"}
 
 
+@app.get("/api/metrics/pool")
+def get_pool_metrics():
+    """
+    Connection pool occupancy, saturation and checkout wait times; in async
+    mode the async handlers' pool is under `async`
+    """
+    return db_metrics.pool_status(models.read_engine, models.get_async_engine() if models.ASYNC_MODE else None)
+
+
+@app.get("/api/metrics/recommendation-index")
+def get_recommendation_index_metrics():
+    """
+    Size, build time and change feed position of the in-memory recommendation index
+    """
+    return dict(recommendation_index.index.stats(), change_feed=change_feed.stats())
+
+
+@app.get("/api/metrics/similarity-index")
+def get_similarity_index_metrics():
+    """
+    Size, shape and build time of the similar-itineraries index
+    """
+    return similarity.index.stats()
+
+
 @app.get("/api/recommendations/{nights}", response_model=List[schemas.RecommendedItinerary])
 def get_recommendations(
     nights: int = Path(..., ge=2, le=8),  
+    limit: Optional[int] = Query(None, ge=1, le=100),
+    min_score: Optional[float] = Query(None, ge=0, le=1),
     db: Session = Depends(get_db)
 ):
 
     """
     Get recommended itineraries for a specific duration (2-8 nights)
+
+    `limit` returns only the top-scoring itineraries and `min_score` drops
+    anything scored below it.
     """
     if nights < 2 or nights > 8:
         raise HTTPException(status_code=400, detail="Duration must be between 2 and 8 nights")
     
-    # Get itineraries with the specified duration
-    itineraries = db.query(models.Itinerary).filter(
-        models.Itinerary.duration_nights == nights
-    ).all()
-    
-    # If no exact matches, get itineraries with similar duration
-    if not itineraries:
-        itineraries = db.query(models.Itinerary).filter(
-            models.Itinerary.duration_nights.between(nights-1, nights+1)
-        ).all()
-    
-    # Transform to recommended itineraries with scores and highlights
-    recommended_itineraries = []
-    for itinerary in itineraries:
-        # Generate a recommendation score (in a real system, this would be based on algorithms)
-        score = round(random.uniform(0.7, 0.98), 2)
-        
-        # Extract highlights from activities
-        highlights = []
-        for activity in itinerary.activities[:3]:  # Take up to 3 activities as highlights
-            highlights.append(activity.name)
-        
-        recommended_itineraries.append(
-            schemas.RecommendedItinerary(
-                id=itinerary.id,
-                title=itinerary.title,
-                duration_nights=itinerary.duration_nights,
-                description=itinerary.description,
-                recommendation_score=score,
-                highlights=highlights
-            )
-        )
-    
-    # Sort by recommendation score
-    recommended_itineraries.sort(key=lambda x: x.recommendation_score, reverse=True)
-    
-    return recommended_itineraries
+    if settings.RECOMMENDATION_INDEX:
+        recommendation_index.index.refresh_if_due(db)
+        return recommendation_index.index.recommend(nights, limit=limit, min_score=min_score)
+    return recommendations.recommend(db, nights, limit=limit, min_score=min_score)
+
+
+@app.get("/api/itineraries/{itinerary_id}/similar", response_model=List[schemas.SimilarItinerary])
+def get_similar_itineraries(
+    itinerary_id: int,
+    limit: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    """
+    Itineraries with similar locations, activities and pacing, most similar first
+
+    Served from the index built by `python similarity.py`; itineraries created
+    since the last build can be looked up but are not returned as results yet.
+    """
+    state = similarity.index.snapshot()
+    if state is None:
+        raise HTTPException(status_code=503, detail=similarity.NOT_BUILT)
+    items = similarity.similar(db, itinerary_id, limit, state=state)
+    if items is None:
+        raise HTTPException(status_code=404, detail="Itinerary not found")
+    return items
+
+
+@app.post("/api/recommendations:batch", response_model=schemas.BatchRecommendationResult)
+def get_batch_recommendations(
+    request: schemas.BatchRecommendationRequest,
+    db: Session = Depends(get_db)
+):
+    """
+    Recommendations for several night counts and users in one call
+
+    Each query takes the same `limit` and `min_score` as the single-duration
+    endpoint, plus an optional `user_id` (echoed back) and per-user feature
+    `weights`. Results come back grouped per query, in request order, and all
+    queries share one candidate scan.
+    """
+    try:
+        groups = recommendations.recommend_batch(db, request.queries)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return {
+        "results": [
+            {"nights": query.nights, "user_id": query.user_id, "items": items}
+            for query, items in groups
+        ]
+    }
 
 
 if __name__ == "__main__":
@@ -1,7 +1,10 @@
-from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, create_engine, Index
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, JSON, create_engine, Index, event
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship, sessionmaker
+from sqlalchemy.orm import relationship, sessionmaker, selectinload, joinedload
 from datetime import datetime
+import os
+import settings
+import db_metrics
 
 Base = declarative_base()
 
@@ -12,22 +15,27 @@ class Itinerary(Base):
     title = Column(String, nullable=False)
     duration_nights = Column(Integer, nullable=False)
     description = Column(String)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    # Part of the keyset pagination key, so never NULL (see backfill.py)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     
-    # Relationships
-    accommodations = relationship("Accommodation", back_populates="itinerary", cascade="all, delete-orphan")
-    transfers = relationship("Transfer", back_populates="itinerary", cascade="all, delete-orphan")
-    activities = relationship("Activity", back_populates="itinerary", cascade="all, delete-orphan")
+    # Relationships, in insertion order so every serialization path lists children identically
+    accommodations = relationship("Accommodation", back_populates="itinerary", cascade="all, delete-orphan", order_by="Accommodation.id")
+    transfers = relationship("Transfer", back_populates="itinerary", cascade="all, delete-orphan", order_by="Transfer.id")
+    activities = relationship("Activity", back_populates="itinerary", cascade="all, delete-orphan", order_by="Activity.id")
     
-    # Index for faster querying by duration
-    __table_args__ = (Index('idx_duration_nights', 'duration_nights'),)
+    # Index for faster querying by duration, and a composite index that backs
+    # keyset pagination ordered by (created_at, id)
+    __table_args__ = (
+        Index('idx_duration_nights', 'duration_nights'),
+        Index('idx_itinerary_created_at_id', 'created_at', 'id'),
+    )
 
 
 class Accommodation(Base):
     __tablename__ = "accommodations"
     
     id = Column(Integer, primary_key=True, index=True)
-    itinerary_id = Column(Integer, ForeignKey("itineraries.id", ondelete="CASCADE"), nullable=False)
+    itinerary_id = Column(Integer, ForeignKey("itineraries.id", ondelete="CASCADE"), nullable=False, index=True)
     name = Column(String, nullable=False)
     location = Column(String, nullable=False)
     check_in_date = Column(Date, nullable=False)
@@ -45,7 +53,7 @@ class Transfer(Base):
     __tablename__ = "transfers"
     
     id = Column(Integer, primary_key=True, index=True)
-    itinerary_id = Column(Integer, ForeignKey("itineraries.id", ondelete="CASCADE"), nullable=False)
+    itinerary_id = Column(Integer, ForeignKey("itineraries.id", ondelete="CASCADE"), nullable=False, index=True)
     from_location = Column(String, nullable=False)
     to_location = Column(String, nullable=False)
     transport_type = Column(String, nullable=False)
@@ -54,15 +62,18 @@ class Transfer(Base):
     # Relationship
     itinerary = relationship("Itinerary", back_populates="transfers")
     
-    # Index for faster querying by date
-    __table_args__ = (Index('idx_transfer_date', 'date'),)
+    # Indexes for faster querying by date and transport type
+    __table_args__ = (
+        Index('idx_transfer_date', 'date'),
+        Index('idx_transfer_transport_type', 'transport_type'),
+    )
 
 
 class Activity(Base):
     __tablename__ = "activities"
     
     id = Column(Integer, primary_key=True, index=True)
-    itinerary_id = Column(Integer, ForeignKey("itineraries.id", ondelete="CASCADE"), nullable=False)
+    itinerary_id = Column(Integer, ForeignKey("itineraries.id", ondelete="CASCADE"), nullable=False, index=True)
     name = Column(String, nullable=False)
     location = Column(String, nullable=False)
     date = Column(Date, nullable=False)
@@ -79,17 +90,225 @@ class Activity(Base):
     )
 
 
-# Database connection
-SQLALCHEMY_DATABASE_URL = "sqlite:///./travel_itineraries.db"
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+class ItinerarySummary(Base):
+    """
+    One denormalized row per itinerary with everything a recommendation needs,
+    kept up to date by summaries.py on every write path.
+    """
+    __tablename__ = "itinerary_summary"
+
+    itinerary_id = Column(Integer, ForeignKey("itineraries.id", ondelete="CASCADE"), primary_key=True)
+    title = Column(String, nullable=False)
+    description = Column(String)
+    duration_nights = Column(Integer, nullable=False)
+    highlights = Column(JSON, nullable=False)
+    activity_count = Column(Integer, nullable=False)
+    activity_hours = Column(Float, nullable=False)
+    distinct_locations = Column(Integer, nullable=False)
+    transfer_legs = Column(Integer, nullable=False)
+    score = Column(Float, nullable=False)
+
+
+# Serves "best itineraries for N nights" as a single index range scan, already
+# in recommendation order (score descending, lower id first on ties)
+Index(
+    "idx_summary_nights_score",
+    ItinerarySummary.duration_nights,
+    ItinerarySummary.score.desc(),
+    ItinerarySummary.itinerary_id,
+)
+
+
+class ItineraryChange(Base):
+    """
+    Append-only feed of writes to itineraries, one row per changed itinerary,
+    which other processes tail through changes.py. `sequence` only ever grows
+    (AUTOINCREMENT on SQLite never reuses values).
+    """
+    __tablename__ = "itinerary_changes"
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    sequence = Column(Integer, primary_key=True, autoincrement=True)
+    # None for a reset, after which followers rebuild whatever they derive
+    itinerary_id = Column(Integer)
+    operation = Column(String, nullable=False)
+    changed_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class IdempotencyKey(Base):
+    """
+    Client-supplied Idempotency-Key of a create, written in the same transaction
+    as the itinerary it created (see idempotency.py).
+    """
+    __tablename__ = "idempotency_keys"
+
+    key = Column(String, primary_key=True)
+    # SHA-256 of the request payload, to refuse reuse of a key for another request
+    fingerprint = Column(String, nullable=False)
+    itinerary_id = Column(Integer, nullable=False)
+    # The itinerary's created_at, so a later itinerary reusing its id is told
+    # apart; indexed for the purge of expired keys
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+
+# Full-text index over itinerary titles, descriptions and activities, one
+# document per itinerary (queried and kept in sync by fulltext.py). SQLite uses
+# an FTS5 table whose rowid is the itinerary id; PostgreSQL a tsvector column
+# with a GIN index.
+FULLTEXT_DDL = {
+    "sqlite": [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS itinerary_fts USING fts5("
+        "title, description, activities, tokenize='porter unicode61')",
+    ],
+    "postgresql": [
+        "CREATE TABLE IF NOT EXISTS itinerary_fts ("
+        "itinerary_id INTEGER PRIMARY KEY REFERENCES itineraries(id) ON DELETE CASCADE, "
+        "document TSVECTOR NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS idx_itinerary_fts_document ON itinerary_fts USING GIN (document)",
+    ],
+}
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _create_fulltext_index(target, connection, **kw):
+    for statement in FULLTEXT_DDL.get(connection.dialect.name, []):
+        connection.exec_driver_sql(statement)
+
+
+# Loading strategies for the itinerary graph
+def itinerary_load_options(strategy="selectin"):
+    """
+    Loader options that fetch accommodations, transfers and activities up front
+    instead of lazily, one SELECT per itinerary per relationship.
+
+    "selectin" adds one `WHERE itinerary_id IN (...)` query per child table, so a
+    page costs a fixed 4 queries whatever its size. "joined" fetches everything in
+    a single LEFT OUTER JOIN, which suits single-itinerary lookups but multiplies
+    rows across the three collections, so avoid it for list endpoints.
+    """
+    if strategy == "selectin":
+        loader = selectinload
+    elif strategy == "joined":
+        loader = joinedload
+    else:
+        raise ValueError(f"Unknown loading strategy: {strategy}")
+    return [
+        loader(Itinerary.accommodations),
+        loader(Itinerary.transfers),
+        loader(Itinerary.activities),
+    ]
+
+
+# Database connection, configured from the environment (see settings.py)
+SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
+
+
+def engine_options(url, async_driver=False):
+    """
+    create_engine keyword arguments for `url` built from the pool settings.
+    """
+    options = {"echo": settings.DB_ECHO, "pool_pre_ping": settings.DB_POOL_PRE_PING}
+    if url.startswith("sqlite") and not async_driver:
+        options["connect_args"] = {"check_same_thread": False}
+    # In-memory SQLite databases live inside a single connection and can't be pooled
+    if ":memory:" not in url and "mode=memory" not in url:
+        options.update(
+            poolclass=db_metrics.TimedAsyncQueuePool if async_driver else db_metrics.TimedQueuePool,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+        )
+    return options
+
+
+def apply_sqlite_profile(target_engine, read_only=False):
+    """
+    Tune every new connection of a SQLite engine for concurrent readers and a
+    writer: WAL journaling so reads don't wait on writes, synchronous=NORMAL
+    (safe under WAL, one fsync per checkpoint instead of per commit), memory
+    mapped reads, a bigger page cache and a busy timeout instead of immediate
+    "database is locked" errors. Read-only engines also set query_only.
+    """
+    @event.listens_for(target_engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if read_only:
+            cursor.execute("PRAGMA query_only=ON")
+        else:
+            cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE}")
+        cursor.execute(f"PRAGMA cache_size=-{settings.SQLITE_CACHE_SIZE_KB}")
+        cursor.execute(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.close()
+
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **engine_options(SQLALCHEMY_DATABASE_URL))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+IS_SQLITE = engine.url.get_backend_name() == "sqlite"
+SQLITE_PERFORMANCE = IS_SQLITE and settings.SQLITE_PROFILE == "performance"
+if SQLITE_PERFORMANCE:
+    apply_sqlite_profile(engine)
+
 # Create tables
 Base.metadata.create_all(bind=engine)
 
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+# Read-only connection for the recommendation server: an explicit replica URL,
+# or with the SQLite performance profile a separate read-only pool on the same
+# file, so recommendation reads never queue behind the API's writes
+if settings.DATABASE_READ_URL:
+    READ_DATABASE_URL = settings.DATABASE_READ_URL
+elif SQLITE_PERFORMANCE and engine.url.database not in (None, "", ":memory:"):
+    READ_DATABASE_URL = f"sqlite:///file:{os.path.abspath(engine.url.database)}?mode=ro&uri=true"
+else:
+    READ_DATABASE_URL = None
+
+if READ_DATABASE_URL:
+    read_engine = create_engine(READ_DATABASE_URL, **engine_options(READ_DATABASE_URL))
+    if SQLITE_PERFORMANCE and read_engine.url.get_backend_name() == "sqlite":
+        apply_sqlite_profile(read_engine, read_only=True)
+else:
+    read_engine = engine
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+
+# Async database connection, used when ITINERARY_DB_MODE=async. The async
+# driver (aiosqlite/asyncpg) is only imported when the async engine is first needed.
+ASYNC_MODE = settings.DB_MODE == "async"
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+ASYNC_DATABASE_URL = settings.ASYNC_DATABASE_URL or engine.url.set(
+    drivername=ASYNC_DRIVERS.get(engine.url.get_backend_name(), engine.url.drivername)
+).render_as_string(hide_password=False)
+_async_session_factory = None
+
+def get_async_session_factory():
+    global _async_session_factory
+    if _async_session_factory is None:
+        from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+        async_engine = create_async_engine(
+            ASYNC_DATABASE_URL, **engine_options(ASYNC_DATABASE_URL, async_driver=True)
+        )
+        if SQLITE_PERFORMANCE:
+            apply_sqlite_profile(async_engine.sync_engine)
+        # Objects stay usable after commit; reloading them would need an await
+        _async_session_factory = async_sessionmaker(async_engine, expire_on_commit=False)
+    return _async_session_factory
+
+def get_async_engine():
+    return get_async_session_factory().kw["bind"]
+
+async def get_async_db():
+    async with get_async_session_factory()() as db:
+        yield db
\ No newline at end of file
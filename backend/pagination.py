@@ -0,0 +1,25 @@
+import base64
+import json
+from datetime import datetime
+
+
+def encode_cursor(created_at, itinerary_id):
+    """
+    Build an opaque cursor pointing just after the given (created_at, id) key.
+    """
+    payload = json.dumps([created_at.isoformat(), itinerary_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """
+    Turn a cursor back into its (created_at, id) key.
+
+    Raises ValueError if the cursor is malformed.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, itinerary_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at), int(itinerary_id)
+    except (TypeError, ValueError, json.JSONDecodeError) as exc:
+        raise ValueError("Invalid pagination cursor") from exc
@@ -0,0 +1,192 @@
+"""
+On-demand sampling profiler for the API and MCP server.
+
+While running, a background thread snapshots the Python stack of every other
+thread in the process (sys._current_frames) at a fixed interval and counts
+identical stacks. Stopping writes them to PROFILE_DIR in the collapsed-stack
+format understood by flamegraph.pl, speedscope and inferno:
+
+    module.py:handler;serializers.py:serialize_itineraries;... 42
+
+The server keeps serving while it samples. install(app, service) mounts the
+admin endpoints when PROFILER_ENABLED is set:
+
+    POST /admin/profiler/start?duration=30   start sampling (stops itself after `duration` s)
+    POST /admin/profiler/stop                stop now and write the profile
+    GET  /admin/profiler                     status and the last profile written
+
+Requests must send ADMIN_TOKEN in the X-Admin-Token header; install() refuses
+to mount the endpoints when no token is configured.
+"""
+import hmac
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Optional
+from fastapi import Depends, Header, HTTPException, Query
+import settings
+
+# Python functions that sit at the top of an idle thread's stack: threadpool
+# workers waiting for work and the event loop waiting in select
+IDLE_LEAVES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+}
+
+MAX_DURATION_SECONDS = 600
+
+
+class SamplingProfiler:
+    def __init__(self, service, output_dir):
+        self.service = service
+        self.output_dir = output_dir
+        self.stacks = Counter()
+        self.samples = 0
+        self.last_profile = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self._labels = {}
+        self._started = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, duration=None, interval=None, include_idle=False):
+        """
+        Start sampling every `interval` seconds for at most `duration` seconds.
+        Raises RuntimeError if the profiler is already running.
+        """
+        with self._lock:
+            if self.running:
+                raise RuntimeError("Profiler is already running")
+            self.stacks = Counter()
+            self.samples = 0
+            self._stop.clear()
+            self._started = time.time()
+            self._thread = threading.Thread(
+                target=self._run,
+                args=(duration, interval or settings.PROFILER_INTERVAL_MS / 1000, include_idle),
+                name="sampling-profiler",
+                daemon=True,
+            )
+            self._thread.start()
+
+    def stop(self):
+        """
+        Stop sampling and return the written profile (None if it was not running).
+        """
+        thread = self._thread
+        if thread is None:
+            return None
+        self._stop.set()
+        thread.join()
+        return self.last_profile
+
+    def status(self):
+        return {
+            "service": self.service,
+            "running": self.running,
+            "samples": self.samples,
+            "started_at": self._started if self.running else None,
+            "last_profile": self.last_profile,
+        }
+
+    def _run(self, duration, interval, include_idle):
+        deadline = time.monotonic() + duration if duration else None
+        try:
+            while not self._stop.wait(interval):
+                if deadline is not None and time.monotonic() >= deadline:
+                    break
+                self._sample(include_idle)
+        finally:
+            self.last_profile = self._write()
+
+    def _sample(self, include_idle):
+        own_thread = threading.get_ident()
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_thread:
+                continue
+            if not include_idle:
+                code = frame.f_code
+                if (os.path.basename(code.co_filename), code.co_name) in IDLE_LEAVES:
+                    continue
+            stack = []
+            while frame is not None:
+                stack.append(self._label(frame.f_code))
+                frame = frame.f_back
+            stack.reverse()
+            self.stacks[";".join(stack)] += 1
+        self.samples += 1
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            # Collapsed stacks are split on ";" and the count on the last space
+            label = f"{os.path.basename(code.co_filename)}:{code.co_name}".replace(";", ":").replace(" ", "_")
+            self._labels[code] = label
+        return label
+
+    def _write(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = os.path.join(
+            self.output_dir, f"{self.service}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.folded"
+        )
+        with open(path, "w") as output:
+            for stack, count in self.stacks.most_common():
+                output.write(f"{stack} {count}\n")
+        return {
+            "path": os.path.abspath(path),
+            "samples": self.samples,
+            "stacks": len(self.stacks),
+            "duration_seconds": round(time.time() - self._started, 3),
+        }
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    if not settings.ADMIN_TOKEN or x_admin_token is None or not hmac.compare_digest(
+        x_admin_token.encode(), settings.ADMIN_TOKEN.encode()
+    ):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+def install(app, service):
+    """
+    Mount the profiler admin endpoints on `app`. Raises RuntimeError when
+    ADMIN_TOKEN is not set: the endpoints write files and cost CPU, so they are
+    never served unauthenticated.
+    """
+    if not settings.ADMIN_TOKEN:
+        raise RuntimeError("PROFILER_ENABLED requires ADMIN_TOKEN to be set")
+    profiler = SamplingProfiler(service, settings.PROFILE_DIR)
+    app.state.profiler = profiler
+
+    @app.get("/admin/profiler", include_in_schema=False, dependencies=[Depends(require_admin)])
+    def get_profiler_status():
+        return profiler.status()
+
+    @app.post("/admin/profiler/start", include_in_schema=False, dependencies=[Depends(require_admin)])
+    def start_profiler(
+        duration: float = Query(30, gt=0, le=MAX_DURATION_SECONDS),
+        interval_ms: Optional[float] = Query(None, ge=1, le=1000),
+        include_idle: bool = False,
+    ):
+        try:
+            profiler.start(duration, interval_ms / 1000 if interval_ms else None, include_idle)
+        except RuntimeError as exc:
+            raise HTTPException(status_code=409, detail=str(exc))
+        return profiler.status()
+
+    @app.post("/admin/profiler/stop", include_in_schema=False, dependencies=[Depends(require_admin)])
+    def stop_profiler():
+        result = profiler.stop()
+        if result is None:
+            raise HTTPException(status_code=409, detail="Profiler has not been started")
+        return result
+
+    return profiler
@@ -0,0 +1,46 @@
+from contextlib import contextmanager
+from sqlalchemy import event
+
+
+class QueryCounter:
+    """
+    Records every SQL statement an engine sends to the database while active.
+
+    Usage:
+        with QueryCounter(models.engine) as counter:
+            client.get("/api/itineraries")
+        print(counter.count)
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._before_cursor_execute)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        event.remove(self.engine, "before_cursor_execute", self._before_cursor_execute)
+        return False
+
+
+@contextmanager
+def assert_max_queries(engine, expected):
+    """
+    Fail with an AssertionError if the block runs more than `expected` statements.
+    """
+    with QueryCounter(engine) as counter:
+        yield counter
+    if counter.count > expected:
+        executed = "\n".join(f"  {i + 1}. {sql}" for i, sql in enumerate(counter.statements))
+        raise AssertionError(
+            f"Expected at most {expected} queries, {counter.count} were executed:\n{executed}"
+        )
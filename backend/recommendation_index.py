@@ -0,0 +1,272 @@
+"""
+In-memory recommendation index for the MCP server.
+
+The index holds itinerary_summary in per-night buckets. Each bucket is a pair of
+parallel arrays (scores, ids) kept in recommendation order: score descending,
+then lower id first. Titles, descriptions and highlights live in a dict by id.
+Lookups walk a bucket (or lazily merge the three fallback buckets) without
+touching SQL.
+
+The index is built once and then kept current from the change feed
+(changes.py): the summaries of itineraries in changes its feed cursor has not
+seen yet are read by id, whatever the operation, and merged into copies of the
+affected buckets, replacing the itinerary's previous entry or dropping it when
+its summary is gone. The new buckets are then swapped in, so readers never see a half-updated bucket and never take a lock.
+The MCP server's change feed follower applies new changes as they arrive; a
+request that finds the index older than RECOMMENDATION_INDEX_REFRESH_MS (no
+follower running, or the follower falling behind) catches it up itself. A
+reset in the feed rebuilds the index.
+"""
+import heapq
+import sys
+import threading
+import time
+from array import array
+from itertools import islice
+from sqlalchemy import select
+import changes
+import models
+import schemas
+import settings
+
+_COLUMNS = (
+    models.ItinerarySummary.itinerary_id,
+    models.ItinerarySummary.duration_nights,
+    models.ItinerarySummary.score,
+    models.ItinerarySummary.title,
+    models.ItinerarySummary.description,
+    models.ItinerarySummary.highlights,
+)
+
+LOAD_YIELD_PER = 10000
+APPLY_CHUNK_SIZE = 1000
+
+
+class _Bucket:
+    """
+    One night count: parallel arrays of scores and ids in recommendation order.
+    """
+
+    __slots__ = ("scores", "ids")
+
+    def __init__(self, scores=None, ids=None):
+        self.scores = scores if scores is not None else array("d")
+        self.ids = ids if ids is not None else array("q")
+
+    def __len__(self):
+        return len(self.ids)
+
+    def entries(self):
+        # (-score, id) sorts ascending in recommendation order, as heapq.merge needs
+        return ((-score, itinerary_id) for score, itinerary_id in zip(self.scores, self.ids))
+
+    def merged(self, additions, removed=()):
+        """
+        A new bucket without the ids in `removed` and with `additions`
+        [(score, id)] merged in.
+        """
+        scores, ids = array("d"), array("q")
+        entries = self.entries()
+        if removed:
+            entries = (entry for entry in entries if entry[1] not in removed)
+        for negative_score, itinerary_id in heapq.merge(
+            entries, sorted((-score, itinerary_id) for score, itinerary_id in additions)
+        ):
+            scores.append(-negative_score)
+            ids.append(itinerary_id)
+        return _Bucket(scores, ids)
+
+
+class RecommendationIndex:
+    def __init__(self, refresh_interval=None):
+        self.refresh_interval = (
+            refresh_interval if refresh_interval is not None else settings.RECOMMENDATION_INDEX_REFRESH_MS / 1000
+        )
+        self.cursor = changes.FeedCursor()
+        self.build_seconds = None
+        self._buckets = {}
+        self._details = {}
+        self._refreshed_at = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._details)
+
+    @property
+    def position(self):
+        return self.cursor.position
+
+    @property
+    def built(self):
+        return self._refreshed_at is not None
+
+    def build(self, db):
+        """
+        Load every summary row, replacing the current contents.
+        """
+        with self._lock:
+            self._build(db)
+
+    def refresh(self, db):
+        """
+        Apply every change the index's feed cursor has not seen. Returns how many
+        itineraries were added or replaced.
+        """
+        with self._lock:
+            return self._refresh(db)
+
+    def apply(self, db, feed):
+        """
+        Apply a batch of changes (changes.since rows), as a ChangeFeedFollower
+        subscriber. Changes the index has already seen are skipped.
+        """
+        with self._lock:
+            if self.built:
+                self._apply(db, self.cursor.unseen(feed))
+
+    def refresh_if_due(self, db, wait=True):
+        """
+        Build on first use, then refresh at most every `refresh_interval`
+        seconds. Requests that find another one refreshing carry on with the
+        current contents; with `wait=False` they don't wait for another one's
+        first build either. Returns whether the index is built.
+        """
+        if not self.built:
+            if not self._lock.acquire(blocking=wait):
+                return False
+            try:
+                if not self.built:
+                    self._build(db)
+            finally:
+                self._lock.release()
+            return True
+        if not self.due or not self._lock.acquire(blocking=False):
+            return True
+        try:
+            self._refresh(db)
+        finally:
+            self._lock.release()
+        return True
+
+    @property
+    def due(self):
+        return not self.built or time.monotonic() - self._refreshed_at >= self.refresh_interval
+
+    def clear(self):
+        with self._lock:
+            self._buckets, self._details, self.cursor = {}, {}, changes.FeedCursor()
+            self._refreshed_at = None
+
+    def _build(self, db):
+        started = time.perf_counter()
+        additions, details = {}, {}
+        # Read in the same transaction as the rows, so the snapshot and the
+        # position agree; changes still in flight below it are watched as gaps
+        cursor = changes.FeedCursor.at(db, changes.latest_sequence(db))
+        for row in db.execute(
+            select(*_COLUMNS).order_by(models.ItinerarySummary.itinerary_id)
+            .execution_options(yield_per=LOAD_YIELD_PER)
+        ):
+            additions.setdefault(row.duration_nights, []).append((row.score, row.itinerary_id))
+            details[row.itinerary_id] = _details(row)
+        buckets = {nights: _Bucket().merged(entries) for nights, entries in additions.items()}
+        self._details, self._buckets, self.cursor = details, buckets, cursor
+        self._refreshed_at = time.monotonic()
+        self.build_seconds = time.perf_counter() - started
+        return len(details)
+
+    def _refresh(self, db):
+        added = 0
+        while True:
+            feed = self.cursor.fetch(db)
+            if not feed:
+                self._refreshed_at = time.monotonic()
+                return added
+            added += self._apply(db, feed)
+
+    def _apply(self, db, feed):
+        if not feed:
+            return 0
+        if any(change.operation == changes.RESET for change in feed):
+            return self._build(db)
+
+        changed = list(dict.fromkeys(change.itinerary_id for change in feed))
+        # Every changed itinerary already indexed leaves its bucket; those that
+        # still have a summary come back with the row as it is now
+        removals = {}
+        for itinerary_id in changed:
+            if itinerary_id in self._details:
+                removals.setdefault(self._details[itinerary_id][1], set()).add(itinerary_id)
+        additions, details = {}, {}
+        for start in range(0, len(changed), APPLY_CHUNK_SIZE):
+            for row in db.execute(
+                select(*_COLUMNS)
+                .where(models.ItinerarySummary.itinerary_id.in_(changed[start:start + APPLY_CHUNK_SIZE]))
+            ):
+                additions.setdefault(row.duration_nights, []).append((row.score, row.itinerary_id))
+                details[row.itinerary_id] = _details(row)
+        # Publish new buckets only after their details are in place, and drop
+        # the details of deleted itineraries only once no bucket lists them
+        self._details.update(details)
+        for nights in set(additions) | set(removals):
+            bucket = self._buckets.get(nights, _Bucket()).merged(additions.get(nights, ()), removals.get(nights, ()))
+            if bucket:
+                self._buckets[nights] = bucket
+            else:
+                self._buckets.pop(nights, None)
+        for itinerary_id in set().union(*removals.values()) - details.keys():
+            del self._details[itinerary_id]
+        self.cursor.observe(feed)
+        self._refreshed_at = time.monotonic()
+        return len(details)
+
+    def recommend(self, nights, limit=None, min_score=None):
+        """
+        Same results as recommendations.recommend for the indexed rows.
+        """
+        bucket = self._buckets.get(nights)
+        if bucket:
+            entries = bucket.entries()
+        else:
+            entries = heapq.merge(*(
+                self._buckets[near].entries()
+                for near in (nights - 1, nights, nights + 1)
+                if near in self._buckets
+            ))
+        if min_score is not None:
+            entries = _until_below(entries, min_score)
+        results = []
+        for negative_score, itinerary_id in islice(entries, limit):
+            title, duration_nights, description, highlights = self._details[itinerary_id]
+            results.append(schemas.RecommendedItinerary(
+                id=itinerary_id,
+                title=title,
+                duration_nights=duration_nights,
+                description=description,
+                recommendation_score=-negative_score,
+                highlights=list(highlights),
+            ))
+        return results
+
+    def stats(self):
+        return {
+            "itineraries": len(self),
+            "buckets": {nights: len(bucket) for nights, bucket in sorted(self._buckets.items())},
+            "position": self.position,
+            "build_seconds": round(self.build_seconds, 4) if self.build_seconds is not None else None,
+        }
+
+
+def _details(row):
+    # Activity names repeat across itineraries; intern them so each is stored once
+    return (row.title, row.duration_nights, row.description, tuple(sys.intern(name) for name in row.highlights))
+
+
+def _until_below(entries, min_score):
+    for entry in entries:
+        if -entry[0] < min_score:
+            return
+        yield entry
+
+
+index = RecommendationIndex()
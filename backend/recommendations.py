@@ -0,0 +1,209 @@
+import heapq
+import math
+from sqlalchemy import exists, select, union_all
+import models
+import schemas
+import scoring
+import vector_scoring
+
+
+def recommend(db, nights, limit=None, min_score=None):
+    """
+    Recommended itineraries for `nights`, best first.
+
+    Falls back to itineraries within one night of the request when none match
+    exactly. Served from itinerary_summary alone (see summaries.py), walking
+    idx_summary_nights_score in score order. Shared by the sync and async MCP
+    handlers.
+    """
+    summary = models.ItinerarySummary
+
+    # Use itineraries with the specified duration, or with a similar duration if there are none
+    duration_filter = summary.duration_nights == nights
+    if not db.execute(select(exists().where(duration_filter))).scalar():
+        duration_filter = summary.duration_nights.between(nights-1, nights+1)
+
+    statement = (
+        select(summary.itinerary_id, summary.title, summary.duration_nights,
+               summary.description, summary.score, summary.highlights)
+        .where(duration_filter)
+        .order_by(summary.score.desc(), summary.itinerary_id)
+    )
+    if min_score is not None:
+        statement = statement.where(summary.score >= min_score)
+    if limit is not None:
+        statement = statement.limit(limit)
+
+    return [
+        schemas.RecommendedItinerary(
+            id=row.itinerary_id,
+            title=row.title,
+            duration_nights=row.duration_nights,
+            description=row.description,
+            recommendation_score=row.score,
+            highlights=row.highlights
+        )
+        for row in db.execute(statement)
+    ]
+
+
+class _TopK:
+    """
+    The `k` best (score, itinerary_id) pairs seen, or all of them if k is None.
+    Ties go to the lower id, as in the single-duration endpoint.
+    """
+
+    def __init__(self, k):
+        self.k = k
+        self.heap = []
+
+    def push(self, score, itinerary_id):
+        entry = (score, -itinerary_id)
+        if self.k is None or len(self.heap) < self.k:
+            heapq.heappush(self.heap, entry)
+        elif entry > self.heap[0]:
+            heapq.heapreplace(self.heap, entry)
+
+    def best(self):
+        return [(score, -negative_id) for score, negative_id in sorted(self.heap, reverse=True)]
+
+
+def _weights_key(weights):
+    """
+    Validated weights as a hashable key, None for the default weights.
+    """
+    if weights is None:
+        return None
+    unknown = set(weights) - set(scoring.FEATURE_NAMES)
+    if unknown:
+        raise ValueError(
+            f"Unknown weights: {', '.join(sorted(unknown))}; expected {', '.join(scoring.FEATURE_NAMES)}"
+        )
+    if not all(math.isfinite(value) for value in weights.values()):
+        raise ValueError("Weights must be finite numbers")
+    if any(value < 0 for value in weights.values()) or not any(value > 0 for value in weights.values()):
+        raise ValueError("Weights must be non-negative with at least one positive weight")
+    return tuple(weights.get(name, 0.0) for name in scoring.FEATURE_NAMES)
+
+
+def _candidate_statement(buckets):
+    """
+    One statement for every night bucket: the best `k` rows of a bucket through
+    idx_summary_nights_score, or the whole bucket when k is None.
+    """
+    summary = models.ItinerarySummary
+    columns = (summary.itinerary_id, summary.duration_nights, summary.score)
+    parts = [
+        select(
+            select(*columns)
+            .where(summary.duration_nights == nights)
+            .order_by(summary.score.desc(), summary.itinerary_id)
+            .limit(k)
+            .subquery()
+        )
+        for nights, k in sorted(buckets.items())
+        if k is not None
+    ]
+    whole = sorted(nights for nights, k in buckets.items() if k is None)
+    if whole:
+        parts.append(select(*columns).where(summary.duration_nights.in_(whole)))
+    return parts[0] if len(parts) == 1 else union_all(*parts)
+
+
+def recommend_batch(db, queries):
+    """
+    Answer several `schemas.RecommendationQuery`s at once, in request order, as
+    [(query, [RecommendedItinerary])] pairs.
+
+    Queries ranked by the stored score share a single statement that fetches
+    the candidates for every night count they could need (their own, or the ±1
+    fallback). Where a limit is set, a bucket is cut to its best rows on the
+    index, since the top k of a filtered or merged range always comes from the
+    top k of each bucket. Queries with custom weights share one
+    vector_scoring.FeatureMatrix of the buckets they need, scored once per
+    distinct set of weights. Either way a query uses the fallback only if no
+    itinerary had the exact duration. A last query loads titles and highlights
+    for the winners. Raises ValueError on invalid weights.
+    """
+    summary = models.ItinerarySummary
+    weight_keys = [_weights_key(query.weights) for query in queries]
+    winners = [None] * len(queries)
+    stored = [position for position, key in enumerate(weight_keys) if key is None]
+    if stored:
+        _rank_by_stored_score(db, queries, stored, winners)
+    weighted = [position for position, key in enumerate(weight_keys) if key is not None]
+    if weighted:
+        _rank_by_weights(db, queries, weighted, weight_keys, winners)
+
+    winner_ids = {itinerary_id for best in winners for _, itinerary_id in best}
+    details = {}
+    if winner_ids:
+        details = {
+            row.itinerary_id: row
+            for row in db.execute(
+                select(summary.itinerary_id, summary.title, summary.duration_nights,
+                       summary.description, summary.highlights)
+                .where(summary.itinerary_id.in_(winner_ids))
+            )
+        }
+
+    return [
+        (query, [
+            schemas.RecommendedItinerary(
+                id=itinerary_id,
+                title=details[itinerary_id].title,
+                duration_nights=details[itinerary_id].duration_nights,
+                description=details[itinerary_id].description,
+                recommendation_score=score,
+                highlights=details[itinerary_id].highlights
+            )
+            for score, itinerary_id in best
+        ])
+        for query, best in zip(queries, winners)
+    ]
+
+
+def _rank_by_stored_score(db, queries, positions, winners):
+    # nights -> rows needed from that bucket (None: all of them)
+    buckets = {}
+    by_nights = {}
+    for position in positions:
+        query = queries[position]
+        for nights in (query.nights - 1, query.nights, query.nights + 1):
+            by_nights.setdefault(nights, []).append(position)
+            if nights not in buckets:
+                buckets[nights] = query.limit
+            elif buckets[nights] is not None:
+                buckets[nights] = None if query.limit is None else max(buckets[nights], query.limit)
+
+    exact = {position: _TopK(queries[position].limit) for position in positions}
+    fallback = {position: _TopK(queries[position].limit) for position in positions}
+    present = set()
+    for row in db.execute(_candidate_statement(buckets)):
+        present.add(row.duration_nights)
+        for position in by_nights[row.duration_nights]:
+            query = queries[position]
+            if query.min_score is not None and row.score < query.min_score:
+                continue
+            if row.duration_nights == query.nights:
+                exact[position].push(row.score, row.itinerary_id)
+            fallback[position].push(row.score, row.itinerary_id)
+
+    for position in positions:
+        winners[position] = (exact if queries[position].nights in present else fallback)[position].best()
+
+
+def _rank_by_weights(db, queries, positions, weight_keys, winners):
+    nights = {
+        near
+        for position in positions
+        for near in (queries[position].nights - 1, queries[position].nights, queries[position].nights + 1)
+    }
+    matrix = vector_scoring.FeatureMatrix.from_summaries(db, sorted(nights))
+    scores = {}
+    for position in positions:
+        query = queries[position]
+        key = weight_keys[position]
+        if key not in scores:
+            scores[key] = matrix.scores(dict(zip(scoring.FEATURE_NAMES, key)))
+        winners[position] = matrix.top(scores[key], query.limit, matrix.nights_mask(query.nights), query.min_score)
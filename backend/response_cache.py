@@ -0,0 +1,223 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from email.utils import formatdate
+from typing import Optional
+from fastapi import Response
+import settings
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    body: bytes
+    etag: str
+    last_modified: float
+
+    def encode(self):
+        return f"{self.etag}\n{self.last_modified}\n".encode() + self.body
+
+    @classmethod
+    def decode(cls, raw):
+        etag, last_modified, body = raw.split(b"\n", 2)
+        return cls(body=body, etag=etag.decode(), last_modified=float(last_modified))
+
+
+class MemoryBackend:
+    """
+    Per-process LRU cache with a time-to-live on every entry. clear() bumps a
+    generation counter, and set() drops entries computed under an older one.
+    """
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def generation(self):
+        return self._generation
+
+    def get(self, key, generation=None):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            expires_at, entry = item
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry, generation=None):
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, entry)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+
+class RedisBackend:
+    """
+    Cache stored in any Redis-compatible client (get/set/incr), shared by all
+    worker processes. Writes bump a generation counter that is part of every
+    key, so invalidation is a single INCR rather than a key scan.
+    """
+
+    def __init__(self, client, ttl, prefix="itinerary-cache:"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def generation(self):
+        generation = self.client.get(self.prefix + "generation") or b"0"
+        return generation.decode() if isinstance(generation, bytes) else str(generation)
+
+    def _key(self, key, generation):
+        if generation is None:
+            generation = self.generation()
+        return f"{self.prefix}{generation}:{key}"
+
+    def get(self, key, generation=None):
+        raw = self.client.get(self._key(key, generation))
+        return CachedResponse.decode(raw) if raw is not None else None
+
+    def set(self, key, entry, generation=None):
+        # An entry computed before an invalidation lands under the old
+        # generation's key, which nothing reads any more
+        self.client.set(self._key(key, generation), entry.encode(), ex=self.ttl)
+
+    def clear(self):
+        self.client.incr(self.prefix + "generation")
+
+
+class LocalRedisStub:
+    """
+    In-process stand-in for a Redis client implementing the commands
+    RedisBackend uses; for development and benchmarks without a Redis server.
+    """
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        with self._lock:
+            value, expires_at = self._data.get(name, (None, None))
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._data[name]
+                return None
+            return value
+
+    def set(self, name, value, ex=None):
+        with self._lock:
+            self._data[name] = (value, time.monotonic() + ex if ex else None)
+        return True
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            value, expires_at = self._data.get(name, (b"0", None))
+            value = int(value) + amount
+            self._data[name] = (str(value).encode(), expires_at)
+            return value
+
+
+class ResponseCache:
+    """
+    Serialized JSON responses keyed by endpoint and parameters, with hit/miss
+    counters. Call invalidate() after every write to itineraries commits.
+
+    Read the generation before querying and pass it to get() and put(): a body
+    built from data an invalidation has since replaced is then not cached.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def generation(self):
+        return self.backend.generation() if self.backend is not None else None
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key, generation=None) -> Optional[CachedResponse]:
+        entry = self.backend.get(key, generation) if self.backend is not None else None
+        self._count(entry is not None)
+        return entry
+
+    def put(self, key, body, last_modified, generation=None):
+        entry = CachedResponse(
+            body=body,
+            etag='"' + hashlib.sha1(body).hexdigest()[:20] + '"',
+            last_modified=last_modified,
+        )
+        if self.backend is not None:
+            self.backend.set(key, entry, generation)
+        return entry
+
+    def invalidate(self):
+        if self.backend is not None:
+            self.backend.clear()
+
+    def stats(self):
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {
+            "backend": type(self.backend).__name__ if self.backend is not None else None,
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+def conditional_response(request, entry, cache_status):
+    """
+    200 with the cached body, or 304 if the client's If-None-Match already
+    matches the entry's ETag.
+    """
+    headers = {
+        "ETag": entry.etag,
+        "Last-Modified": formatdate(entry.last_modified, usegmt=True),
+        "X-Cache": cache_status,
+    }
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = {tag.strip() for tag in if_none_match.split(",")}
+        tags |= {tag[2:] for tag in tags if tag.startswith("W/")}
+        if entry.etag in tags or "*" in tags:
+            return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+
+def _create_backend():
+    if settings.RESPONSE_CACHE_BACKEND == "none":
+        return None
+    if settings.RESPONSE_CACHE_BACKEND == "redis":
+        if settings.REDIS_URL:
+            import redis
+            client = redis.Redis.from_url(settings.REDIS_URL)
+        else:
+            client = LocalRedisStub()
+        return RedisBackend(client, settings.RESPONSE_CACHE_TTL)
+    return MemoryBackend(settings.RESPONSE_CACHE_MAX_ENTRIES, settings.RESPONSE_CACHE_TTL)
+
+
+cache = ResponseCache(_create_backend())
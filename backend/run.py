@@ -1,37 +1,232 @@
-import uvicorn
+"""
+Process supervisor for the API (main.py) and the MCP server (mcp_server.py).
+
+Each service listens on one socket that the supervisor binds and shares with a
+pool of uvicorn worker processes, so the kernel spreads connections over all
+workers. Services start in order and the next one is only started once the
+previous one answers its health check, within READY_TIMEOUT (the MCP server
+builds its recommendation index first, over a minute at a million rows).
+Workers that exit are restarted, with a growing delay if they keep crashing at
+startup. SIGINT/SIGTERM shut all workers down gracefully, also while a service
+is still starting, and whatever is still running after the shutdown timeout is
+killed.
+
+    python run.py [--api-workers N] [--mcp-workers N] [--ready-timeout S] [--no-seed]
+"""
+import argparse
+import os
+import signal
+import socket
 import subprocess
-import threading
+import sys
 import time
+import urllib.error
+import urllib.request
+import settings
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# A worker that exits sooner than this after starting counts as a crash loop
+MIN_UPTIME_SECONDS = 5
+MAX_RESTART_DELAY_SECONDS = 30
+POLL_INTERVAL_SECONDS = 0.5
+
+
+def log(message):
+    print(f"[supervisor] {message}", flush=True)
+
+
+class Service:
+    """
+    A FastAPI app served by `workers` uvicorn processes sharing one listening socket.
+    """
+
+    def __init__(self, name, app, host, port, workers, health_path="/"):
+        self.name = name
+        self.app = app
+        self.host = host
+        self.port = port
+        self.workers = max(workers, 1)
+        self.health_path = health_path
+        self.socket = None
+        self.processes = [None] * self.workers
+        self.started_at = [0.0] * self.workers
+        self.restart_delay = [0.0] * self.workers
+        self.restart_at = [None] * self.workers
+
+    @property
+    def url(self):
+        host = "127.0.0.1" if self.host in ("0.0.0.0", "") else self.host
+        return f"http://{host}:{self.port}"
+
+    def bind(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(2048)
+        sock.set_inheritable(True)
+        self.socket = sock
+
+    def spawn(self, slot):
+        fd = self.socket.fileno()
+        self.processes[slot] = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", f"{self.app}:app", "--fd", str(fd)],
+            cwd=BACKEND_DIR,
+            pass_fds=(fd,),
+        )
+        self.started_at[slot] = time.monotonic()
+        self.restart_at[slot] = None
+
+    def start(self):
+        for slot in range(self.workers):
+            self.spawn(slot)
+
+    def healthy(self):
+        try:
+            with urllib.request.urlopen(self.url + self.health_path, timeout=2) as response:
+                return response.status == 200
+        except (urllib.error.URLError, OSError):
+            return False
 
-def run_main_server():
-    print("Starting main FastAPI server...")
-    subprocess.run(["python", "main.py"])
+    def wait_ready(self, timeout, stopping=lambda: False):
+        """
+        Wait until a worker answers the health check. False if all workers exit,
+        the timeout passes or `stopping()` turns true first.
+        """
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline and not stopping():
+            if self.healthy():
+                return True
+            if all(process.poll() is not None for process in self.processes):
+                return False
+            time.sleep(0.1)
+        return False
+
+    def check(self):
+        """
+        Restart workers that have exited, backing off while they crash at startup.
+        """
+        now = time.monotonic()
+        for slot, process in enumerate(self.processes):
+            if self.restart_at[slot] is not None:
+                if now >= self.restart_at[slot]:
+                    log(f"{self.name}: restarting worker {slot}")
+                    self.spawn(slot)
+                continue
+            code = process.poll()
+            if code is None:
+                continue
+            if now - self.started_at[slot] < MIN_UPTIME_SECONDS:
+                self.restart_delay[slot] = min(max(self.restart_delay[slot] * 2, 1.0), MAX_RESTART_DELAY_SECONDS)
+            else:
+                self.restart_delay[slot] = 0.0
+            log(f"{self.name}: worker {slot} (pid {process.pid}) exited with code {code}, "
+                f"restarting in {self.restart_delay[slot]:.0f}s")
+            self.restart_at[slot] = now + self.restart_delay[slot]
+
+    def running(self):
+        return [process for process in self.processes if process is not None and process.poll() is None]
+
+    def terminate(self):
+        for process in self.running():
+            process.terminate()
+
+    def kill(self):
+        for process in self.running():
+            process.kill()
+
+
+class Supervisor:
+    def __init__(self, services, shutdown_timeout=30, ready_timeout=600):
+        self.services = services
+        self.shutdown_timeout = shutdown_timeout
+        self.ready_timeout = ready_timeout
+        self._stopping = False
+
+    def _request_stop(self, signum, frame):
+        self._stopping = True
+
+    def run(self):
+        signal.signal(signal.SIGINT, self._request_stop)
+        signal.signal(signal.SIGTERM, self._request_stop)
+        try:
+            for service in self.services:
+                service.bind()
+                service.start()
+                log(f"{service.name}: started {service.workers} worker(s) on {service.url}")
+                if not service.wait_ready(self.ready_timeout, lambda: self._stopping):
+                    if self._stopping:
+                        return 0
+                    log(f"{service.name}: not healthy after {self.ready_timeout}s, shutting down")
+                    return 1
+                log(f"{service.name}: ready")
+            log("all services ready")
+            while not self._stopping:
+                for service in self.services:
+                    service.check()
+                time.sleep(POLL_INTERVAL_SECONDS)
+            return 0
+        finally:
+            self.shutdown()
+
+    def shutdown(self):
+        log("shutting down")
+        for service in self.services:
+            service.terminate()
+        deadline = time.monotonic() + self.shutdown_timeout
+        while time.monotonic() < deadline and any(service.running() for service in self.services):
+            time.sleep(0.1)
+        for service in self.services:
+            if service.running():
+                log(f"{service.name}: killing workers still running after {self.shutdown_timeout}s")
+                service.kill()
+            for process in service.processes:
+                if process is not None:
+                    process.wait()
+            if service.socket is not None:
+                service.socket.close()
 
-def run_mcp_server():
-    print("Starting MCP recommendation server...")
-    subprocess.run(["python", "mcp_server.py"])
 
 def seed_database():
     print("Seeding database...")
-    subprocess.run(["python", "seed_data.py"])
+    subprocess.run([sys.executable, "seed_data.py"], cwd=BACKEND_DIR, check=True)
+
+
+def backfill_database():
+    """
+    Backfill derived tables once here, rather than in every worker at startup.
+    """
+    subprocess.run([sys.executable, "backfill.py"], cwd=BACKEND_DIR, check=True)
+    os.environ["STARTUP_BACKFILL"] = "false"
+
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the API and MCP servers")
+    parser.add_argument("--host", default=settings.HOST)
+    parser.add_argument("--api-port", type=int, default=8000)
+    parser.add_argument("--mcp-port", type=int, default=8001)
+    parser.add_argument("--api-workers", type=int, default=settings.API_WORKERS)
+    parser.add_argument("--mcp-workers", type=int, default=settings.MCP_WORKERS)
+    parser.add_argument("--shutdown-timeout", type=int, default=settings.SHUTDOWN_TIMEOUT)
+    parser.add_argument("--ready-timeout", type=int, default=settings.READY_TIMEOUT,
+                        help="seconds each service gets to pass its health check at startup")
+    parser.add_argument("--no-seed", action="store_true", help="keep the current database contents")
+    args = parser.parse_args()
+
     # First seed the database
-    seed_database()
-    
-    # Start both servers in separate threads
-    main_thread = threading.Thread(target=run_main_server)
-    mcp_thread = threading.Thread(target=run_mcp_server)
-    
-    main_thread.start()
-    time.sleep(2)  # Give the main server a head start
-    mcp_thread.start()
-    
-    print("Both servers are running!")
-    print("Main API server: http://localhost:8000")
-    print("MCP Recommendation server: http://localhost:8001")
-    print("API Documentation: http://localhost:8000/docs")
-    
-    # Wait for both threads to complete
-    main_thread.join()
-    mcp_thread.join()
\ No newline at end of file
+    if not args.no_seed:
+        seed_database()
+    backfill_database()
+
+    supervisor = Supervisor(
+        [
+            Service("api", "main", args.host, args.api_port, args.api_workers),
+            Service("mcp", "mcp_server", args.host, args.mcp_port, args.mcp_workers),
+        ],
+        shutdown_timeout=args.shutdown_timeout,
+        ready_timeout=args.ready_timeout,
+    )
+    print(f"Main API server: http://localhost:{args.api_port}")
+    print(f"MCP Recommendation server: http://localhost:{args.mcp_port}")
+    print(f"API Documentation: http://localhost:{args.api_port}/docs")
+    sys.exit(supervisor.run())
@@ -1,5 +1,6 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Dict, List, Optional
+from typing_extensions import Annotated
 from datetime import datetime
 
 # Accommodation schemas
@@ -88,6 +89,36 @@ class Itinerary(ItineraryBase):
         orm_mode = True
 
 
+# Bulk ingestion result
+class BulkItemError(BaseModel):
+    index: int
+    error: str
+
+
+class BulkIngestResult(BaseModel):
+    received: int
+    created: int
+    failed: int
+    errors: List[BulkItemError] = []
+    elapsed_seconds: float
+    items_per_second: float
+
+
+# Keyset-paginated list of itineraries
+class ItineraryPage(BaseModel):
+    items: List[Itinerary]
+    next_cursor: Optional[str] = None
+
+
+# Full-text search hit
+class ItinerarySearchResult(BaseModel):
+    id: int
+    title: str
+    duration_nights: int
+    description: Optional[str] = None
+    rank: float
+
+
 # Recommendation schema
 class RecommendedItinerary(BaseModel):
     id: int
@@ -98,4 +129,41 @@ class RecommendedItinerary(BaseModel):
     highlights: List[str]
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+
+class SimilarItinerary(BaseModel):
+    id: int
+    title: str
+    duration_nights: int
+    description: Optional[str] = None
+    similarity: float
+    highlights: List[str]
+
+    class Config:
+        orm_mode = True
+
+
+# Batch recommendations: several night counts and users in one call
+class RecommendationQuery(BaseModel):
+    nights: int = Field(..., ge=2, le=8)
+    limit: Optional[int] = Field(None, ge=1, le=100)
+    min_score: Optional[float] = Field(None, ge=0, le=1)
+    user_id: Optional[str] = None
+    # Per-user feature weights (see scoring.FEATURE_NAMES); default weights when
+    # unset. JSON bodies may spell NaN and Infinity, which are refused here
+    weights: Optional[Dict[str, Annotated[float, Field(allow_inf_nan=False)]]] = None
+
+
+class BatchRecommendationRequest(BaseModel):
+    queries: List[RecommendationQuery] = Field(..., min_length=1, max_length=50)
+
+
+class RecommendationGroup(BaseModel):
+    nights: int
+    user_id: Optional[str] = None
+    items: List[RecommendedItinerary]
+
+
+class BatchRecommendationResult(BaseModel):
+    results: List[RecommendationGroup]
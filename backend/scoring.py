@@ -0,0 +1,80 @@
+from dataclasses import dataclass
+from typing import Dict, List
+
+# Ideal amount of planned activity per night, in hours
+TARGET_ACTIVITY_HOURS_PER_NIGHT = 4.0
+
+# Airport arrival and departure; only legs beyond these count against a trip
+BASE_TRANSFER_LEGS = 2
+
+HIGHLIGHT_COUNT = 3
+
+FEATURE_NAMES = ("pacing", "diversity", "transfer_ease", "coverage")
+
+DEFAULT_WEIGHTS = {
+    "pacing": 0.35,
+    "diversity": 0.25,
+    "transfer_ease": 0.2,
+    "coverage": 0.2,
+}
+
+
+@dataclass(frozen=True)
+class ItineraryScore:
+    itinerary_id: int
+    score: float
+    features: Dict[str, float]
+    highlights: List[str]
+
+
+def compute_features(nights, activity_hours, activity_count, distinct_locations, transfer_legs):
+    """
+    Turn raw itinerary aggregates into features in the range [0, 1].
+
+    - pacing: how close activity hours per night are to the target
+    - diversity: distinct activity/accommodation locations per night
+    - transfer_ease: penalises transfer legs beyond arrival and departure
+    - coverage: activities per night
+    """
+    nights = max(nights, 1)
+    hours_per_night = activity_hours / nights
+    extra_legs = max(transfer_legs - BASE_TRANSFER_LEGS, 0)
+    return {
+        "pacing": max(0.0, 1 - abs(hours_per_night - TARGET_ACTIVITY_HOURS_PER_NIGHT) / TARGET_ACTIVITY_HOURS_PER_NIGHT),
+        "diversity": min(distinct_locations / nights, 1.0),
+        "transfer_ease": max(0.0, 1 - extra_legs / nights),
+        "coverage": min(activity_count / nights, 1.0),
+    }
+
+
+def score_features(features, weights=DEFAULT_WEIGHTS):
+    """
+    Weighted average of the features, rounded like the API has always reported it.
+    """
+    total_weight = sum(weights.get(name, 0) for name in FEATURE_NAMES)
+    if total_weight <= 0:
+        return 0.0
+    weighted = sum(features[name] * weights.get(name, 0) for name in FEATURE_NAMES)
+    return round(weighted / total_weight, 2)
+
+
+def score_itinerary(itinerary, weights=DEFAULT_WEIGHTS):
+    """
+    Score an ORM itinerary from its loaded accommodations, transfers and activities.
+    """
+    activities = sorted(itinerary.activities, key=lambda activity: (activity.date, activity.id))
+    locations = {activity.location for activity in activities}
+    locations.update(accommodation.location for accommodation in itinerary.accommodations)
+    features = compute_features(
+        nights=itinerary.duration_nights,
+        activity_hours=sum(activity.duration_hours for activity in activities),
+        activity_count=len(activities),
+        distinct_locations=len(locations),
+        transfer_legs=len(itinerary.transfers),
+    )
+    return ItineraryScore(
+        itinerary_id=itinerary.id,
+        score=score_features(features, weights),
+        features=features,
+        highlights=[activity.name for activity in activities[:HIGHLIGHT_COUNT]],
+    )
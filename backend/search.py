@@ -0,0 +1,55 @@
+from sqlalchemy import or_, select
+import models
+
+
+def itinerary_filters(
+    location=None,
+    date_from=None,
+    date_to=None,
+    min_nights=None,
+    max_nights=None,
+    transport_type=None,
+):
+    """
+    WHERE clauses on itineraries for the search filters. Child-table filters
+    are semi-joins (`itineraries.id IN (SELECT itinerary_id ...)`) whose inner
+    query is driven by the child table's index:
+
+    - location: an accommodation or activity at that location
+      (idx_accommodation_location, idx_activity_location)
+    - date_from/date_to: an activity or transfer within the range
+      (idx_activity_date, idx_transfer_date)
+    - min_nights/max_nights: idx_duration_nights
+    - transport_type: a transfer of that type (idx_transfer_transport_type)
+    """
+    filters = []
+    if location:
+        filters.append(or_(
+            models.Itinerary.id.in_(
+                select(models.Accommodation.itinerary_id).where(models.Accommodation.location == location)
+            ),
+            models.Itinerary.id.in_(
+                select(models.Activity.itinerary_id).where(models.Activity.location == location)
+            ),
+        ))
+    if date_from or date_to:
+        activity_dates, transfer_dates = [], []
+        if date_from:
+            activity_dates.append(models.Activity.date >= date_from)
+            transfer_dates.append(models.Transfer.date >= date_from)
+        if date_to:
+            activity_dates.append(models.Activity.date <= date_to)
+            transfer_dates.append(models.Transfer.date <= date_to)
+        filters.append(or_(
+            models.Itinerary.id.in_(select(models.Activity.itinerary_id).where(*activity_dates)),
+            models.Itinerary.id.in_(select(models.Transfer.itinerary_id).where(*transfer_dates)),
+        ))
+    if min_nights is not None:
+        filters.append(models.Itinerary.duration_nights >= min_nights)
+    if max_nights is not None:
+        filters.append(models.Itinerary.duration_nights <= max_nights)
+    if transport_type:
+        filters.append(models.Itinerary.id.in_(
+            select(models.Transfer.itinerary_id).where(models.Transfer.transport_type == transport_type)
+        ))
+    return filters
@@ -1,16 +1,33 @@
+from sqlalchemy import select, text
 from sqlalchemy.orm import Session
-from models import SessionLocal, Itinerary, Accommodation, Transfer, Activity
+from models import SessionLocal, engine, Itinerary, Accommodation, Transfer, Activity, ItinerarySummary, IdempotencyKey
+import fulltext
+import summaries
+import changes
+import synthetic_data
+import argparse
 from datetime import date, timedelta
 
-def seed_database():
-    db = SessionLocal()
-    
-    # Clear existing data
+def clear_database(db):
     db.query(Activity).delete()
     db.query(Transfer).delete()
     db.query(Accommodation).delete()
     db.query(Itinerary).delete()
+    db.execute(text("DELETE FROM itinerary_fts"))
+    db.query(ItinerarySummary).delete()
+    db.query(IdempotencyKey).delete()
+    changes.record_reset(db)
     db.commit()
+
+
+def seed_database():
+    """
+    Load the curated Phuket and Krabi itineraries (2-8 nights).
+    """
+    db = SessionLocal()
+    
+    # Clear existing data
+    clear_database(db)
     
     # Create seed data for Phuket
     
@@ -491,11 +508,72 @@ def seed_database():
         description="Try rock climbing on Railay's world-famous limestone cliffs"
     ))
     
+    db.commit()
+    
+    # Rebuild the full-text index and recommendation summaries for the seeded
+    # itineraries, and announce them on the change feed
+    fulltext.reindex(db)
+    summaries.refresh(db)
+    changes.record(db, db.execute(select(Itinerary.id).order_by(Itinerary.id)).scalars().all())
     db.commit()
     db.close()
     
     print("Database seeded successfully!")
 
 
+def seed_synthetic_database(count, seed=0, nights_distribution=None, children=3,
+                            batch_size=synthetic_data.DEFAULT_BATCH_SIZE, append=False,
+                            index_fulltext=True):
+    """
+    Load `count` generated itineraries for load testing, see synthetic_data.py.
+    """
+    if not append:
+        db = SessionLocal()
+        clear_database(db)
+        db.close()
+
+    def report(written, total, elapsed):
+        print(f"  {written}/{total} itineraries, {written / elapsed:.0f} itineraries/sec")
+
+    rate = synthetic_data.seed_synthetic(
+        engine, count, seed=seed, nights_distribution=nights_distribution, children=children,
+        batch_size=batch_size, index_fulltext=index_fulltext, progress=report,
+    )
+    print(f"Seeded {count} synthetic itineraries ({rate:.0f} itineraries/sec)")
+
+
+def parse_nights_distribution(value):
+    """
+    "2:1,3:3,5:2" -> {2: 1.0, 3: 3.0, 5: 2.0}
+    """
+    distribution = {}
+    for part in value.split(","):
+        nights, weight = part.split(":")
+        distribution[int(nights)] = float(weight)
+    return distribution
+
+
 if __name__ == "__main__":
-    seed_database()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Seed the travel itinerary database")
+    parser.add_argument("--synthetic", type=int, metavar="N",
+                        help="generate N synthetic itineraries instead of the curated data")
+    parser.add_argument("--seed", type=int, default=0, help="random seed for synthetic data")
+    parser.add_argument("--children", type=int, default=3,
+                        help="accommodations and activities per synthetic itinerary, at most; "
+                             "accommodations are also capped by the nights and 8 hotels, activities by 12, "
+                             "and transfers are one more than the accommodations")
+    parser.add_argument("--nights", type=parse_nights_distribution,
+                        help='nights distribution as nights:weight pairs, e.g. "2:1,3:3,5:2"')
+    parser.add_argument("--batch-size", type=int, default=synthetic_data.DEFAULT_BATCH_SIZE)
+    parser.add_argument("--append", action="store_true", help="keep existing itineraries")
+    parser.add_argument("--no-fulltext", action="store_true", help="skip the full-text index")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        seed_synthetic_database(
+            args.synthetic, seed=args.seed, nights_distribution=args.nights,
+            children=args.children, batch_size=args.batch_size, append=args.append,
+            index_fulltext=not args.no_fulltext,
+        )
+    else:
+        seed_database()
\ No newline at end of file
@@ -0,0 +1,147 @@
+import json
+import math
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import List
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+from sqlalchemy import select
+import models
+import schemas
+
+try:
+    import orjson
+except ImportError:  # the fast path still works, just with the stdlib encoder
+    orjson = None
+
+# JSON bodies identical to what FastAPI's response_model produces, for
+# endpoints that return pre-serialized responses (e.g. from the response cache)
+_itinerary_adapter = TypeAdapter(schemas.Itinerary)
+_itinerary_list_adapter = TypeAdapter(List[schemas.Itinerary])
+
+
+def serialize_itinerary(itinerary):
+    return _itinerary_adapter.dump_json(
+        _itinerary_adapter.validate_python(itinerary, from_attributes=True)
+    )
+
+
+def serialize_itineraries(itineraries):
+    return _itinerary_list_adapter.dump_json(
+        _itinerary_list_adapter.validate_python(itineraries, from_attributes=True)
+    )
+
+
+def last_modified(itineraries):
+    """
+    Latest created_at (stored as naive UTC) as a Unix timestamp; now for empty pages.
+    """
+    stamps = [i.created_at for i in itineraries if i.created_at is not None]
+    if not stamps:
+        return time.time()
+    return max(stamps).replace(tzinfo=timezone.utc).timestamp()
+
+
+# Fast path: plain tuples from Core selects turned straight into dicts, in the
+# same field order and with the same value formatting as the schemas above.
+# Column lists mirror schemas.Itinerary / Accommodation / Transfer / Activity.
+ITINERARY_COLUMNS = (
+    models.Itinerary.title,
+    models.Itinerary.duration_nights,
+    models.Itinerary.description,
+    models.Itinerary.id,
+    models.Itinerary.created_at,
+)
+CHILD_COLUMNS = {
+    "accommodations": (
+        models.Accommodation,
+        ("name", "location", "check_in_date", "check_out_date", "nights", "id", "itinerary_id"),
+    ),
+    "transfers": (
+        models.Transfer,
+        ("from_location", "to_location", "transport_type", "date", "id", "itinerary_id"),
+    ),
+    "activities": (
+        models.Activity,
+        ("name", "location", "date", "duration_hours", "description", "id", "itinerary_id"),
+    ),
+}
+# Schema fields typed as datetime but stored as DATE
+DATE_FIELDS = {"check_in_date", "check_out_date", "date"}
+
+
+def itinerary_rows():
+    """
+    Core select of the itinerary columns the fast path needs; add filters,
+    ordering and limits before executing it.
+    """
+    return select(*ITINERARY_COLUMNS)
+
+
+def _as_datetime_string(value):
+    # Pydantic widens date to midnight datetime
+    return datetime(value.year, value.month, value.day).isoformat()
+
+
+def build_itineraries(db, rows):
+    """
+    Itinerary dicts for rows of itinerary_rows(), children included, using one
+    query per child table and no ORM objects.
+    """
+    ids = [row.id for row in rows]
+    children = {name: defaultdict(list) for name in CHILD_COLUMNS}
+    if ids:
+        for name, (model, fields) in CHILD_COLUMNS.items():
+            columns = [getattr(model, field) for field in fields]
+            date_positions = [i for i, field in enumerate(fields) if field in DATE_FIELDS]
+            statement = select(*columns).where(model.itinerary_id.in_(ids)).order_by(model.id)
+            grouped = children[name]
+            for values in db.execute(statement).tuples():
+                values = list(values)
+                for i in date_positions:
+                    if values[i] is not None:
+                        values[i] = _as_datetime_string(values[i])
+                grouped[values[-1]].append(dict(zip(fields, values)))
+
+    return [
+        {
+            "title": row.title,
+            "duration_nights": row.duration_nights,
+            "description": row.description,
+            "id": row.id,
+            "created_at": row.created_at.isoformat() if row.created_at is not None else None,
+            "accommodations": children["accommodations"].get(row.id, []),
+            "transfers": children["transfers"].get(row.id, []),
+            "activities": children["activities"].get(row.id, []),
+        }
+        for row in rows
+    ]
+
+
+def dumps(content):
+    """
+    Compact JSON bytes, matching FastAPI's JSONResponse rendering.
+    """
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+
+def _finite(value):
+    if isinstance(value, float) and not math.isfinite(value):
+        return str(value)
+    if isinstance(value, dict):
+        return {key: _finite(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_finite(item) for item in value]
+    return value
+
+
+async def validation_error_response(request, exc):
+    """
+    FastAPI's 422 response, with NaN and Infinity in the echoed input spelled as
+    strings: request bodies may contain them, but JSON responses can't.
+    """
+    return JSONResponse(status_code=422, content={"detail": _finite(jsonable_encoder(exc.errors()))})
@@ -0,0 +1,380 @@
+"""
+Content-based "similar itineraries" for the MCP server.
+
+Every itinerary becomes one unit vector made of two blocks:
+
+- TF-IDF over its activity names and its activity and accommodation locations
+  (the MAX_TERMS terms found in the most itineraries), L2-normalised
+- its scoring features (pacing, diversity, transfer ease, coverage) and night
+  count, standardised over all itineraries
+
+so the dot product of two vectors is their cosine similarity. Vectors are
+built offline (`python similarity.py`) into an inverted-file index: spherical
+k-means splits them into about sqrt(n) clusters and they are written grouped by
+cluster. A query ranks the centroids and scans only the SIMILARITY_NPROBE
+closest clusters.
+
+The index is a directory of .npy files and meta.json at SIMILARITY_INDEX_PATH,
+memory-mapped when loaded, so every worker shares the page cache. A rebuild
+replaces the directory and servers pick it up on their next query. Itineraries
+created since the last build can be queried (their vector is computed from the
+database with the stored vocabulary) but are only returned as neighbours after
+the next build.
+"""
+import argparse
+import json
+import math
+import os
+import shutil
+import threading
+import time
+import uuid
+
+import numpy as np
+from sqlalchemy import func, literal, select, union_all
+
+import models
+import schemas
+import settings
+import vector_scoring
+
+MAX_TERMS = 256
+
+# Share of each block in the combined vector
+TEXT_WEIGHT = 1.0
+NUMERIC_WEIGHT = 0.5
+
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE = 20000
+
+FORMAT_VERSION = 1
+# Reads of an index replaced while it was being loaded before giving up
+LOAD_ATTEMPTS = 3
+NOT_BUILT = "The similar-itineraries index has not been built; run python similarity.py"
+ARRAYS = ("vectors", "ids", "centroids", "offsets", "sorted_ids", "positions")
+
+
+def _terms():
+    activity, accommodation = models.Activity, models.Accommodation
+    return union_all(
+        select(activity.itinerary_id, literal("activity").label("kind"), activity.name.label("term")),
+        select(activity.itinerary_id, literal("location"), activity.location),
+        select(accommodation.itinerary_id, literal("location"), accommodation.location),
+    ).subquery()
+
+
+def _vocabulary(connection):
+    terms = _terms()
+    rows = connection.execute(
+        select(terms.c.kind, terms.c.term, func.count(terms.c.itinerary_id.distinct()).label("itineraries"))
+        .where(terms.c.term.isnot(None))
+        .group_by(terms.c.kind, terms.c.term)
+        .order_by(func.count(terms.c.itinerary_id.distinct()).desc(), terms.c.kind, terms.c.term)
+        .limit(MAX_TERMS)
+    ).all()
+    return [f"{row.kind}:{row.term}" for row in rows], np.array([row.itineraries for row in rows], dtype=np.float64)
+
+
+def _term_counts(connection, vocabulary, itinerary_ids=None):
+    """
+    (itinerary ids, vocabulary columns, counts) of every vocabulary term used.
+    """
+    terms = _terms()
+    statement = (
+        select(terms.c.itinerary_id, terms.c.kind, terms.c.term, func.count())
+        .group_by(terms.c.itinerary_id, terms.c.kind, terms.c.term)
+    )
+    if itinerary_ids is not None:
+        statement = statement.where(terms.c.itinerary_id.in_(list(itinerary_ids)))
+    columns = {term: column for column, term in enumerate(vocabulary)}
+    ids, used, counts = [], [], []
+    for itinerary_id, kind, term, count in connection.execute(statement):
+        column = columns.get(f"{kind}:{term}")
+        if column is not None:
+            ids.append(itinerary_id)
+            used.append(column)
+            counts.append(count)
+    return np.array(ids, dtype=np.int64), np.array(used, dtype=np.int64), np.array(counts, dtype=np.float64)
+
+
+def _numeric(matrix):
+    """
+    Ids in ascending order and their raw numeric block: features, then nights.
+    """
+    order = np.argsort(matrix.ids)
+    return matrix.ids[order], np.column_stack([matrix.features[order], matrix.nights[order]]).astype(np.float64)
+
+
+def _vectors(db, meta, matrix, itinerary_ids=None):
+    """
+    (ids, unit float32 vectors) for the itineraries in a FeatureMatrix, which
+    holds every itinerary unless `itinerary_ids` says which.
+    """
+    ids, numeric = _numeric(matrix)
+    numeric = (numeric - meta["numeric_mean"]) / meta["numeric_scale"] * (NUMERIC_WEIGHT / math.sqrt(numeric.shape[1]))
+
+    text = np.zeros((len(ids), len(meta["vocabulary"])))
+    rows, columns, counts = _term_counts(db.connection(), meta["vocabulary"], itinerary_ids)
+    if len(ids) and len(rows):
+        positions = np.minimum(np.searchsorted(ids, rows), len(ids) - 1)
+        known = ids[positions] == rows
+        text[positions[known], columns[known]] = (1 + np.log(counts[known])) * np.asarray(meta["idf"])[columns[known]]
+    text *= TEXT_WEIGHT / np.maximum(np.linalg.norm(text, axis=1, keepdims=True), 1e-12)
+
+    vectors = np.hstack([text, numeric])
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    return ids, vectors.astype(np.float32)
+
+
+def _assign(vectors, centroids, chunk=8192):
+    labels = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), chunk):
+        labels[start:start + chunk] = np.argmax(vectors[start:start + chunk] @ centroids.T, axis=1)
+    return labels
+
+
+def _kmeans(vectors, clusters, seed):
+    """
+    Spherical k-means on a sample; returns (unit centroids, cluster of every vector).
+    """
+    rng = np.random.default_rng(seed)
+    sample = vectors
+    if len(vectors) > KMEANS_SAMPLE:
+        sample = vectors[np.sort(rng.choice(len(vectors), KMEANS_SAMPLE, replace=False))]
+    centroids = sample[rng.choice(len(sample), clusters, replace=False)].copy()
+    for _ in range(KMEANS_ITERATIONS):
+        labels = _assign(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, sample)
+        norms = np.linalg.norm(sums, axis=1)
+        # Clusters left empty keep their previous centroid
+        filled = norms > 0
+        centroids[filled] = sums[filled] / norms[filled, None]
+    return centroids, _assign(vectors, centroids)
+
+
+def build(db, path=None, clusters=None, seed=0):
+    """
+    Build the index for every summarized itinerary and write it to `path`,
+    replacing any previous index. Returns meta.json's contents.
+    """
+    path = path or settings.SIMILARITY_INDEX_PATH
+    started = time.perf_counter()
+    vocabulary, document_counts = _vocabulary(db.connection())
+    matrix = vector_scoring.FeatureMatrix.from_summaries(db)
+    if not len(matrix):
+        raise ValueError("No summarized itineraries to index")
+    _, numeric = _numeric(matrix)
+    spread = numeric.std(axis=0)
+    meta = {
+        "version": FORMAT_VERSION,
+        "build_id": uuid.uuid4().hex,
+        "count": len(matrix),
+        "vocabulary": vocabulary,
+        "idf": (np.log((1 + len(matrix)) / (1 + document_counts)) + 1).tolist(),
+        "numeric_mean": numeric.mean(axis=0).tolist(),
+        "numeric_scale": np.where(spread > 0, spread, 1.0).tolist(),
+    }
+    ids, vectors = _vectors(db, meta, matrix)
+
+    clusters = min(clusters or max(1, round(math.sqrt(len(ids)))), len(ids))
+    centroids, labels = _kmeans(vectors, clusters, seed)
+    order = np.lexsort((ids, labels))
+    arrays = {
+        "vectors": vectors[order],
+        "ids": ids[order],
+        "centroids": centroids.astype(np.float32),
+        "offsets": np.searchsorted(labels[order], np.arange(clusters + 1)).astype(np.int64),
+        "sorted_ids": ids,
+        "positions": np.argsort(ids[order], kind="stable").astype(np.int64),
+    }
+    meta.update(clusters=clusters, dimensions=vectors.shape[1], built_at=time.time(),
+                build_seconds=round(time.perf_counter() - started, 3))
+
+    # Write next to the live index and swap directories, so servers never load a half-written one
+    staging = path + ".tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    for name, array in arrays.items():
+        np.save(os.path.join(staging, f"{name}.npy"), array)
+    with open(os.path.join(staging, "meta.json"), "w") as output:
+        json.dump(meta, output)
+    previous = path + ".old"
+    shutil.rmtree(previous, ignore_errors=True)
+    if os.path.exists(path):
+        os.rename(path, previous)
+    os.rename(staging, path)
+    shutil.rmtree(previous, ignore_errors=True)
+    return meta
+
+
+class SimilarityIndex:
+    """
+    A built index, memory-mapped from disk and reloaded when it is rebuilt.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or settings.SIMILARITY_INDEX_PATH
+        # (meta, arrays), swapped as a whole on reload
+        self._state = None
+        self._version = None
+        self._lock = threading.Lock()
+
+    @property
+    def meta(self):
+        return self._state[0] if self._state else None
+
+    def ensure_loaded(self):
+        """
+        Map the index files, again if they were rebuilt since. Returns False if
+        no index has been built.
+        """
+        try:
+            version = os.stat(os.path.join(self.path, "meta.json")).st_mtime_ns
+        except FileNotFoundError:
+            return self._state is not None
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    state = self._load()
+                    if state is not None:
+                        self._state, self._version = state, version
+        return self._state is not None
+
+    def _read_meta(self):
+        with open(os.path.join(self.path, "meta.json")) as source:
+            return json.load(source)
+
+    def _load(self):
+        """
+        (meta, arrays) of a single build, or None if rebuilds kept replacing
+        the directory while it was read.
+        """
+        for _ in range(LOAD_ATTEMPTS):
+            try:
+                meta = self._read_meta()
+                arrays = {
+                    name: np.load(os.path.join(self.path, f"{name}.npy"), mmap_mode="r") for name in ARRAYS
+                }
+                # A rebuild swapped in between would leave arrays from two builds
+                if self._read_meta().get("build_id") == meta.get("build_id"):
+                    return meta, arrays
+            except FileNotFoundError:
+                # Between the two renames of a rebuild
+                pass
+        return None
+
+    def snapshot(self):
+        """
+        The loaded (meta, arrays), or None if no index has been built. A query
+        keeps using one snapshot, so a reload cannot change it halfway.
+        """
+        self.ensure_loaded()
+        return self._state
+
+    def vector(self, itinerary_id, state=None):
+        """
+        The stored vector of an indexed itinerary, or None.
+        """
+        _, arrays = state or self._state
+        sorted_ids = arrays["sorted_ids"]
+        index = int(np.searchsorted(sorted_ids, itinerary_id))
+        if index == len(sorted_ids) or sorted_ids[index] != itinerary_id:
+            return None
+        return np.asarray(arrays["vectors"][arrays["positions"][index]])
+
+    def nearest(self, vector, limit=10, exclude=None, nprobe=None, state=None):
+        """
+        [(similarity, itinerary_id)] of the closest indexed itineraries, most
+        similar first (lower id first on ties).
+        """
+        _, arrays = state or self._state
+        centroids, offsets = arrays["centroids"], arrays["offsets"]
+        nprobe = min(nprobe or settings.SIMILARITY_NPROBE, len(centroids))
+        probed = np.argpartition(-(centroids @ vector), nprobe - 1)[:nprobe]
+        ranges = [(offsets[cluster], offsets[cluster + 1]) for cluster in probed]
+        ids = np.concatenate([arrays["ids"][start:end] for start, end in ranges])
+        similarities = np.concatenate([arrays["vectors"][start:end] @ vector for start, end in ranges])
+        if exclude is not None:
+            keep = ids != exclude
+            ids, similarities = ids[keep], similarities[keep]
+        if len(ids) > limit:
+            threshold = -np.partition(-similarities, limit - 1)[limit - 1]
+            keep = similarities >= threshold
+            ids, similarities = ids[keep], similarities[keep]
+        order = np.lexsort((ids, -similarities))[:limit]
+        return [(float(similarities[i]), int(ids[i])) for i in order]
+
+    def stats(self):
+        if not self.ensure_loaded():
+            return {"built": False}
+        meta = self.meta
+        return {
+            "built": True,
+            "itineraries": meta["count"],
+            "clusters": meta["clusters"],
+            "dimensions": meta["dimensions"],
+            "terms": len(meta["vocabulary"]),
+            "built_at": meta["built_at"],
+            "build_seconds": meta["build_seconds"],
+        }
+
+
+def similar(db, itinerary_id, limit=10, nprobe=None, state=None):
+    """
+    Itineraries most similar to `itinerary_id` as schemas.SimilarItinerary, or
+    None if it does not exist. `state` is an index.snapshot(), taken here if
+    not given; the index must be built.
+    """
+    state = state or index.snapshot()
+    meta = state[0]
+    vector = index.vector(itinerary_id, state)
+    if vector is None:
+        # Created after the index was built: vectorize it with the stored vocabulary
+        matrix = vector_scoring.FeatureMatrix.from_summaries(db, itinerary_ids=[itinerary_id])
+        if not len(matrix):
+            return None
+        _, vectors = _vectors(db, meta, matrix, [itinerary_id])
+        vector = vectors[0]
+
+    neighbours = index.nearest(vector, limit, exclude=itinerary_id, nprobe=nprobe, state=state)
+    summary = models.ItinerarySummary
+    details = {
+        row.itinerary_id: row
+        for row in db.execute(
+            select(summary.itinerary_id, summary.title, summary.duration_nights,
+                   summary.description, summary.highlights)
+            .where(summary.itinerary_id.in_([itinerary_id for _, itinerary_id in neighbours]))
+        )
+    }
+    return [
+        schemas.SimilarItinerary(
+            id=neighbour,
+            title=details[neighbour].title,
+            duration_nights=details[neighbour].duration_nights,
+            description=details[neighbour].description,
+            similarity=round(similarity, 4),
+            highlights=details[neighbour].highlights,
+        )
+        for similarity, neighbour in neighbours
+        if neighbour in details
+    ]
+
+
+index = SimilarityIndex()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the similar-itineraries index")
+    parser.add_argument("--output", default=settings.SIMILARITY_INDEX_PATH, help="index directory")
+    parser.add_argument("--clusters", type=int, help="k-means clusters (default: sqrt of the itinerary count)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    db = models.ReadSessionLocal()
+    try:
+        meta = build(db, args.output, clusters=args.clusters, seed=args.seed)
+    finally:
+        db.close()
+    print(f"Indexed {meta['count']} itineraries ({meta['dimensions']} dimensions, {meta['clusters']} clusters) "
+          f"in {meta['build_seconds']} s to {args.output}")
@@ -0,0 +1,133 @@
+from collections import defaultdict
+from sqlalchemy import delete, func, insert, select
+import models
+import scoring
+
+REFRESH_CHUNK_SIZE = 1000
+
+
+def build_summary(itinerary_id, title, description, nights, activities, accommodation_locations, transfer_legs):
+    """
+    itinerary_summary row for one itinerary.
+
+    `activities` are (name, location, duration_hours) tuples in (date, id) order,
+    the order highlights are taken in.
+    """
+    locations = {location for _, location, _ in activities}
+    locations.update(accommodation_locations)
+    activity_hours = sum(hours for _, _, hours in activities)
+    features = scoring.compute_features(
+        nights=nights,
+        activity_hours=activity_hours,
+        activity_count=len(activities),
+        distinct_locations=len(locations),
+        transfer_legs=transfer_legs,
+    )
+    return {
+        "itinerary_id": itinerary_id,
+        "title": title,
+        "description": description,
+        "duration_nights": nights,
+        "highlights": [name for name, _, _ in activities[:scoring.HIGHLIGHT_COUNT]],
+        "activity_count": len(activities),
+        "activity_hours": activity_hours,
+        "distinct_locations": len(locations),
+        "transfer_legs": transfer_legs,
+        "score": scoring.score_features(features),
+    }
+
+
+def write_summaries(db, rows):
+    """
+    Add or replace summary rows. Works with a Session or a Connection and runs in
+    the caller's transaction.
+    """
+    rows = list(rows)
+    if not rows:
+        return
+    db.execute(
+        delete(models.ItinerarySummary)
+        .where(models.ItinerarySummary.itinerary_id.in_([row["itinerary_id"] for row in rows]))
+    )
+    db.execute(insert(models.ItinerarySummary), rows)
+
+
+def summarize_created(db, itinerary_ids, itineraries):
+    """
+    Summarize freshly created itineraries straight from their
+    `schemas.ItineraryCreate` payloads, without reading them back.
+    """
+    def summarize(itinerary_id, itinerary):
+        # Children get ids in payload order, so a stable sort by date is (date, id) order
+        activities = sorted(itinerary.activities, key=lambda activity: activity.date)
+        return build_summary(
+            itinerary_id, itinerary.title, itinerary.description, itinerary.duration_nights,
+            [(activity.name, activity.location, activity.duration_hours) for activity in activities],
+            [accommodation.location for accommodation in itinerary.accommodations],
+            len(itinerary.transfers),
+        )
+
+    write_summaries(db, (
+        summarize(itinerary_id, itinerary) for itinerary_id, itinerary in zip(itinerary_ids, itineraries)
+    ))
+
+
+def refresh(db, itinerary_ids=None):
+    """
+    Rebuild summaries from the itinerary tables, for the given ids or for every
+    itinerary, in chunks of one query per table. Runs in the caller's transaction.
+    """
+    if itinerary_ids is None:
+        itinerary_ids = db.execute(select(models.Itinerary.id).order_by(models.Itinerary.id)).scalars().all()
+    itinerary_ids = list(itinerary_ids)
+    for start in range(0, len(itinerary_ids), REFRESH_CHUNK_SIZE):
+        chunk = itinerary_ids[start:start + REFRESH_CHUNK_SIZE]
+
+        activities = defaultdict(list)
+        for row in db.execute(
+            select(models.Activity.itinerary_id, models.Activity.name,
+                   models.Activity.location, models.Activity.duration_hours)
+            .where(models.Activity.itinerary_id.in_(chunk))
+            .order_by(models.Activity.itinerary_id, models.Activity.date, models.Activity.id)
+        ):
+            activities[row.itinerary_id].append((row.name, row.location, row.duration_hours))
+
+        accommodation_locations = defaultdict(list)
+        for row in db.execute(
+            select(models.Accommodation.itinerary_id, models.Accommodation.location)
+            .where(models.Accommodation.itinerary_id.in_(chunk))
+        ):
+            accommodation_locations[row.itinerary_id].append(row.location)
+
+        transfer_legs = dict(db.execute(
+            select(models.Transfer.itinerary_id, func.count())
+            .where(models.Transfer.itinerary_id.in_(chunk))
+            .group_by(models.Transfer.itinerary_id)
+        ).all())
+
+        write_summaries(db, (
+            build_summary(
+                row.id, row.title, row.description, row.duration_nights,
+                activities[row.id], accommodation_locations[row.id], transfer_legs.get(row.id, 0),
+            )
+            for row in db.execute(
+                select(models.Itinerary.id, models.Itinerary.title,
+                       models.Itinerary.description, models.Itinerary.duration_nights)
+                .where(models.Itinerary.id.in_(chunk))
+            )
+        ))
+
+
+def backfill(db):
+    """
+    Summarize itineraries that have no summary yet, e.g. rows written before the
+    summary table existed. Returns their ids.
+    """
+    missing = db.execute(
+        select(models.Itinerary.id)
+        .outerjoin(models.ItinerarySummary, models.ItinerarySummary.itinerary_id == models.Itinerary.id)
+        .where(models.ItinerarySummary.itinerary_id.is_(None))
+        .order_by(models.Itinerary.id)
+    ).scalars().all()
+    refresh(db, missing)
+    return missing
@@ -0,0 +1,208 @@
+import random
+import time
+from datetime import date, datetime, timedelta
+from sqlalchemy import insert
+import models
+import fulltext
+import summaries
+import changes
+
+# Share of itineraries per number of nights; weights, not necessarily summing to 1
+DEFAULT_NIGHTS_DISTRIBUTION = {2: 1, 3: 3, 4: 3, 5: 3, 6: 2, 7: 2, 8: 1}
+
+# Itineraries written per executemany batch, and batches per transaction
+DEFAULT_BATCH_SIZE = 10000
+BATCHES_PER_TRANSACTION = 10
+
+HOTELS = [
+    ("Patong Beach Hotel", "Patong Beach, Phuket"),
+    ("Kata Beach Resort", "Kata Beach, Phuket"),
+    ("Old Town Boutique Hotel", "Phuket Old Town"),
+    ("Phi Phi Island Village", "Phi Phi Islands"),
+    ("Ao Nang Cliff Resort", "Ao Nang, Krabi"),
+    ("Railay Bay Resort", "Railay Beach"),
+    ("Krabi Town Hotel", "Krabi Town"),
+    ("Khao Lak Beach Resort", "Khao Lak"),
+]
+ACTIVITIES = [
+    ("Phi Phi Islands Tour", "Phi Phi Islands", 8, "Full day tour with snorkeling and beach time"),
+    ("Phang Nga Bay Tour", "Phang Nga Bay", 7, "Sea canoeing around James Bond Island"),
+    ("Phuket Old Town Walking Tour", "Phuket Old Town", 4, "Sino-Portuguese architecture and street food"),
+    ("Big Buddha Visit", "Chalong, Phuket", 3, "Visit the Big Buddha and Wat Chalong"),
+    ("Four Islands Tour", "Krabi", 8, "Island hopping with snorkeling opportunities"),
+    ("Rock Climbing", "Railay Beach", 4, "Climbing on Railay's limestone cliffs"),
+    ("Tiger Cave Temple", "Krabi Town", 4, "Climb 1,237 steps for panoramic views"),
+    ("Thai Cooking Class", "Ao Nang, Krabi", 4, "Market visit and hands-on cooking"),
+    ("Elephant Sanctuary Visit", "Phuket", 5, "Ethical sanctuary with feeding and bathing"),
+    ("Similan Islands Diving", "Similan Islands", 10, "Liveaboard dive day in the Similan Islands"),
+    ("Sunset Kayaking", "Ao Thalane", 3, "Mangrove kayaking at sunset"),
+    ("Night Market Food Tour", "Phuket Town", 3, "Evening street food tasting"),
+]
+TRANSPORT_TYPES = ["Private Car", "Ferry", "Speedboat", "Minivan", "Taxi"]
+AIRPORTS = ["Phuket International Airport", "Krabi International Airport"]
+TITLES = ["Beach Getaway", "Island Explorer", "Adventure", "Family Escape", "Honeymoon", "Highlights"]
+
+
+class ItineraryGenerator:
+    """
+    Deterministic generator of synthetic itineraries as plain row dicts, ready
+    for executemany inserts. The same seed always yields the same data. Rows
+    carry no ids: the database assigns them.
+
+    `children` is an upper bound on accommodations and activities per itinerary:
+    - accommodations are distinct hotels of at least one night each, so there
+      are min(children, nights, len(HOTELS)) of them
+    - activities are distinct, min(children, len(ACTIVITIES))
+    - transfers run airport -> each hotel -> airport, one more than the
+      accommodations
+    """
+
+    def __init__(self, seed=0, nights_distribution=None, children=3):
+        self.rng = random.Random(seed)
+        distribution = nights_distribution or DEFAULT_NIGHTS_DISTRIBUTION
+        self.nights_values = list(distribution)
+        self.nights_weights = [distribution[nights] for nights in self.nights_values]
+        self.children = max(children, 1)
+        self.created_at = datetime(2024, 1, 1)
+
+    def generate(self):
+        """
+        Rows for one itinerary: the itinerary and its accommodations, transfers
+        and activities, the children without their itinerary_id yet.
+        """
+        rng = self.rng
+        nights = rng.choices(self.nights_values, self.nights_weights)[0]
+        start = date(2024, 1, 1) + timedelta(days=rng.randrange(365))
+        self.created_at += timedelta(seconds=1)
+
+        hotels = rng.sample(HOTELS, min(self.children, len(HOTELS), nights))
+        stays, remaining = [], nights
+        for position, (name, location) in enumerate(hotels):
+            stay = remaining if position == len(hotels) - 1 else max(1, remaining // (len(hotels) - position))
+            stays.append((name, location, stay))
+            remaining -= stay
+
+        accommodations, transfers, activities = [], [], []
+        airport = rng.choice(AIRPORTS)
+        check_in = start
+        previous = airport
+        for name, location, stay in stays:
+            accommodations.append({
+                "name": name, "location": location,
+                "check_in_date": check_in, "check_out_date": check_in + timedelta(days=stay),
+                "nights": stay,
+            })
+            transfers.append({
+                "from_location": previous, "to_location": name,
+                "transport_type": rng.choice(TRANSPORT_TYPES), "date": check_in,
+            })
+            previous = name
+            check_in += timedelta(days=stay)
+        transfers.append({
+            "from_location": previous, "to_location": airport,
+            "transport_type": "Private Car", "date": check_in,
+        })
+
+        for day, (name, location, hours, description) in enumerate(
+            rng.sample(ACTIVITIES, min(self.children, len(ACTIVITIES)))
+        ):
+            activities.append({
+                "name": name, "location": location,
+                "date": start + timedelta(days=1 + day % max(nights - 1, 1)),
+                "duration_hours": float(hours), "description": description,
+            })
+
+        itinerary = {
+            "title": f"{stays[0][1].split(',')[0]} {rng.choice(TITLES)}",
+            "duration_nights": nights,
+            "description": f"{nights}-night trip around {', '.join(location for _, location, _ in stays)}",
+            "created_at": self.created_at,
+        }
+        return itinerary, accommodations, transfers, activities
+
+
+def seed_synthetic(
+    engine,
+    count,
+    seed=0,
+    nights_distribution=None,
+    children=3,
+    batch_size=DEFAULT_BATCH_SIZE,
+    index_fulltext=True,
+    progress=None,
+):
+    """
+    Append `count` synthetic itineraries to the database behind `engine`.
+
+    Parents go in with one batched INSERT ... RETURNING per batch, so the
+    database assigns their ids (and advances PostgreSQL's sequences) even with
+    other writers running; children follow as plain executemany inserts. Each
+    transaction holds BATCHES_PER_TRANSACTION batches together with their
+    recommendation summaries and change feed entries. Returns items/sec.
+    """
+    generator = ItineraryGenerator(seed=seed, nights_distribution=nights_distribution, children=children)
+    started = time.perf_counter()
+    written = 0
+    insert_itineraries = insert(models.Itinerary).returning(models.Itinerary.id, sort_by_parameter_order=True)
+    with engine.connect() as connection:
+        while written < count:
+            with connection.begin():
+                for _ in range(BATCHES_PER_TRANSACTION):
+                    size = min(batch_size, count - written)
+                    if size <= 0:
+                        break
+                    generated = [generator.generate() for _ in range(size)]
+                    itineraries = [itinerary for itinerary, _, _, _ in generated]
+                    ids = connection.execute(insert_itineraries, itineraries).scalars().all()
+                    accommodations, transfers, activities = [], [], []
+                    for itinerary_id, (itinerary, stays, legs, things) in zip(ids, generated):
+                        itinerary["id"] = itinerary_id
+                        for rows, children in ((accommodations, stays), (transfers, legs), (activities, things)):
+                            for row in children:
+                                row["itinerary_id"] = itinerary_id
+                            rows.extend(children)
+                    connection.execute(insert(models.Accommodation), accommodations)
+                    connection.execute(insert(models.Transfer), transfers)
+                    connection.execute(insert(models.Activity), activities)
+                    _summarize_batch(connection, itineraries, accommodations, transfers, activities)
+                    changes.record(connection, [row["id"] for row in itineraries])
+                    if index_fulltext:
+                        _index_batch(connection, itineraries, activities)
+                    written += size
+            if progress:
+                progress(written, count, time.perf_counter() - started)
+    elapsed = time.perf_counter() - started
+    return written / elapsed if elapsed > 0 else 0.0
+
+
+def _index_batch(connection, itineraries, activities):
+    by_itinerary = {}
+    for activity in activities:
+        by_itinerary.setdefault(activity["itinerary_id"], []).append(
+            " ".join((activity["name"], activity["location"], activity["description"]))
+        )
+    fulltext.index_documents(connection, (
+        (row["id"], row["title"], row["description"], " ".join(by_itinerary.get(row["id"], [])))
+        for row in itineraries
+    ))
+
+
+def _summarize_batch(connection, itineraries, accommodations, transfers, activities):
+    by_itinerary = {row["id"]: ([], [], 0) for row in itineraries}
+    # Stable sort: activities keep insertion (id) order within a day
+    for activity in sorted(activities, key=lambda row: row["date"]):
+        by_itinerary[activity["itinerary_id"]][0].append(
+            (activity["name"], activity["location"], activity["duration_hours"])
+        )
+    for accommodation in accommodations:
+        by_itinerary[accommodation["itinerary_id"]][1].append(accommodation["location"])
+    legs = {}
+    for transfer in transfers:
+        legs[transfer["itinerary_id"]] = legs.get(transfer["itinerary_id"], 0) + 1
+    summaries.write_summaries(connection, (
+        summaries.build_summary(
+            row["id"], row["title"], row["description"], row["duration_nights"],
+            by_itinerary[row["id"]][0], by_itinerary[row["id"]][1], legs.get(row["id"], 0),
+        )
+        for row in itineraries
+    ))
@@ -0,0 +1,30 @@
+"""
+Shared fixtures. Each test gets an empty SQLite database of its own; the app's
+default database is pointed at a scratch file before any backend module is
+imported, so running the tests never touches travel_itineraries.db.
+"""
+import os
+import tempfile
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='itinerary-tests-'), 'app.db')}")
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+import response_cache
+from benchmarks.common import temp_database, override_db
+
+
+@pytest.fixture
+def session_factory():
+    _, factory, _ = temp_database()
+    return factory
+
+
+@pytest.fixture
+def client(session_factory):
+    override_db(main.app, main.get_db, session_factory)
+    response_cache.cache.invalidate()
+    yield TestClient(main.app, raise_server_exceptions=False)
+    main.app.dependency_overrides.clear()
@@ -0,0 +1,35 @@
+import backfill
+import fulltext
+import models
+import recommendation_index
+from benchmarks.common import populate
+
+
+def test_backfill_summarizes_and_indexes_older_rows_once(session_factory):
+    populate(session_factory, 4)
+    with session_factory() as db:
+        db.query(models.ItinerarySummary).delete()
+        db.commit()
+
+    assert backfill.run(session_factory) == (0, 4, 4)
+    assert backfill.run(session_factory) == (0, 0, 0)
+    with session_factory() as db:
+        assert db.query(models.ItinerarySummary).count() == 4
+        assert len(fulltext.search(db, "Benchmark")) == 4
+
+
+def test_running_recommendation_index_sees_backfilled_summaries(session_factory):
+    populate(session_factory, 4)
+    with session_factory() as db:
+        db.query(models.ItinerarySummary).filter(models.ItinerarySummary.itinerary_id > 2).delete()
+        db.commit()
+    index = recommendation_index.RecommendationIndex()
+    with session_factory() as db:
+        index.build(db)
+    assert len(index) == 2
+
+    backfill.run(session_factory)
+    with session_factory() as db:
+        index.refresh(db)
+
+    assert len(index) == 4
@@ -0,0 +1,53 @@
+import json
+
+import ingest
+import models
+from benchmarks.bulk_ingest import make_payload
+
+
+def ndjson(count):
+    return "\n".join(json.dumps(make_payload(i)) for i in range(count))
+
+
+def test_bulk_ingest_creates_every_valid_item(client, session_factory):
+    body = ndjson(5) + "\nnot json\n" + json.dumps({"title": "missing fields"})
+    response = client.post("/api/itineraries:bulk?batch_size=2", content=body,
+                           headers={"Content-Type": "application/x-ndjson"})
+
+    assert response.status_code == 200
+    result = response.json()
+    assert (result["received"], result["created"], result["failed"]) == (7, 5, 2)
+    assert [error["index"] for error in result["errors"]] == [5, 6]
+    with session_factory() as db:
+        assert db.query(models.Itinerary).count() == 5
+
+
+def test_bulk_ingest_rolls_back_earlier_batches_when_the_request_fails(client, session_factory, monkeypatch):
+    calls = []
+    insert = ingest.bulk_insert_itineraries
+
+    def fail_on_third_batch(db, itineraries):
+        calls.append(len(itineraries))
+        if len(calls) == 3:
+            raise RuntimeError("worker crashed")
+        return insert(db, itineraries)
+
+    monkeypatch.setattr(ingest, "bulk_insert_itineraries", fail_on_third_batch)
+    response = client.post("/api/itineraries:bulk?batch_size=2", content=ndjson(6),
+                           headers={"Content-Type": "application/x-ndjson"})
+
+    assert response.status_code == 500
+    assert calls == [2, 2, 2]
+    with session_factory() as db:
+        assert db.query(models.Itinerary).count() == 0
+        assert db.query(models.ItineraryChange).count() == 0
+
+
+def test_savepoints_stay_inside_the_transaction_on_sqlite(session_factory):
+    with session_factory() as db:
+        ingest.begin_transaction(db)
+        with db.begin_nested():
+            ingest.bulk_insert_itineraries(db, [])
+            db.add(models.Itinerary(title="Draft", duration_nights=2))
+        db.rollback()
+        assert db.query(models.Itinerary).count() == 0
@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+import changes
+import models
+
+
+def add_change(db, sequence, itinerary_id=None, changed_at=None):
+    db.execute(insert(models.ItineraryChange).values(
+        sequence=sequence, itinerary_id=itinerary_id or sequence, operation=changes.CREATED,
+        changed_at=changed_at or datetime.utcnow(),
+    ))
+    db.commit()
+
+
+def sequences(feed):
+    return sorted(change.sequence for change in feed)
+
+
+def test_cursor_delivers_a_sequence_that_commits_after_a_higher_one(session_factory):
+    cursor = changes.FeedCursor(grace=60)
+    with session_factory() as db:
+        add_change(db, 1)
+        add_change(db, 3)
+        feed = cursor.fetch(db)
+        cursor.observe(feed)
+        assert sequences(feed) == [1, 3]
+        assert (cursor.position, cursor.gaps) == (3, 1)
+
+        # Sequence 2 was still in flight and commits late
+        add_change(db, 2)
+        add_change(db, 4)
+        feed = cursor.fetch(db)
+        cursor.observe(feed)
+        assert sequences(feed) == [2, 4]
+        assert (cursor.position, cursor.gaps) == (4, 0)
+        assert cursor.fetch(db) == []
+
+
+def test_cursor_gives_up_on_gaps_after_the_grace_period(session_factory):
+    cursor = changes.FeedCursor(grace=0)
+    with session_factory() as db:
+        add_change(db, 5)
+        cursor.observe(cursor.fetch(db))
+        add_change(db, 3)
+        assert cursor.fetch(db) == []
+
+
+def test_cursor_at_a_position_watches_holes_below_it(session_factory):
+    with session_factory() as db:
+        for sequence in (1, 2, 5):
+            add_change(db, sequence)
+        cursor = changes.FeedCursor.at(db, 5, grace=60)
+        assert cursor.gaps == 2
+
+        add_change(db, 4)
+        assert sequences(cursor.fetch(db)) == [4]
+        assert [change.sequence for change in cursor.unseen(cursor.fetch(db))] == [4]
+
+
+def test_follower_delivers_late_changes_once(session_factory):
+    delivered = []
+    follower = changes.ChangeFeedFollower(session_factory, interval=3600)
+    follower.subscribe(lambda db, feed: delivered.extend(change.sequence for change in feed))
+    with session_factory() as db:
+        add_change(db, 1)
+        follower.cursor = changes.FeedCursor.at(db, 0)
+        add_change(db, 3)
+        follower.poll()
+        add_change(db, 2)
+        follower.poll()
+        follower.poll()
+
+    assert delivered == [1, 3, 2]
+
+
+def test_prune_deletes_changes_past_the_retention(session_factory):
+    with session_factory() as db:
+        add_change(db, 1, changed_at=datetime.utcnow() - timedelta(hours=48))
+        add_change(db, 2)
+
+    pruner = changes.FeedPruner(session_factory)
+    assert pruner.prune() == 1
+    with session_factory() as db:
+        assert [change.sequence for change in changes.since(db, 0)] == [2]
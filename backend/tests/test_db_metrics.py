@@ -0,0 +1,51 @@
+import asyncio
+import threading
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+import db_metrics
+import instrumentation
+
+
+def test_concurrent_checkouts_are_all_counted(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", poolclass=db_metrics.TimedQueuePool,
+                           pool_size=4, max_overflow=4, connect_args={"check_same_thread": False})
+    metrics = engine.pool.metrics
+    start = threading.Barrier(8)
+
+    def check_out():
+        start.wait()
+        for _ in range(50):
+            with engine.connect() as connection:
+                connection.execute(text("SELECT 1"))
+
+    threads = [threading.Thread(target=check_out) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert engine.pool.metrics is metrics
+    assert metrics.checkouts == 400
+    engine.dispose()
+    assert engine.pool.metrics is metrics
+
+
+def test_async_pool_is_reported(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", poolclass=db_metrics.TimedQueuePool)
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}",
+                                       poolclass=db_metrics.TimedAsyncQueuePool)
+
+    async def query():
+        async with async_engine.connect() as connection:
+            await connection.execute(text("SELECT 1"))
+        await async_engine.dispose()
+
+    asyncio.run(query())
+
+    assert db_metrics.pool_status(engine, async_engine)["async"]["checkouts"] == 1
+    rendered = instrumentation.MetricsRegistry("api", engine, async_engine).render()
+    assert 'db_pool_checkouts{service="api"} 0' in rendered
+    assert 'db_pool_checkouts{service="api",pool="async"} 1' in rendered
+    assert rendered.count("# TYPE db_pool_checkouts gauge") == 1
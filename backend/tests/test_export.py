@@ -0,0 +1,28 @@
+import json
+
+import export
+from benchmarks.bulk_ingest import make_payload
+from benchmarks.common import populate
+
+
+def test_writes_succeed_while_an_export_is_paused(client, session_factory):
+    populate(session_factory, 5)
+    lines = export.iter_ndjson(session_factory, batch_size=2)
+    received = [json.loads(line) for line in next(lines).splitlines()]
+
+    # The client stops reading; a writer must not be locked out meanwhile
+    created = client.post("/api/itineraries", json=make_payload(0))
+
+    assert created.status_code == 200
+    received += [json.loads(line) for chunk in lines for line in chunk.splitlines()]
+    assert [itinerary["id"] for itinerary in received] == [1, 2, 3, 4, 5, created.json()["id"]]
+    assert received[0]["activities"]
+
+
+def test_csv_export_resumes_after_id(client, session_factory):
+    populate(session_factory, 5)
+    rows = b"".join(export.iter_csv(session_factory, "itineraries", after_id=2, batch_size=2))
+
+    header, *lines = rows.decode().splitlines()
+    assert header.startswith("id,")
+    assert [int(line.split(",")[0]) for line in lines] == [3, 4, 5]
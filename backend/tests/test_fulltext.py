@@ -0,0 +1,25 @@
+import fulltext
+from benchmarks.common import populate
+
+
+def test_backfill_indexes_itineraries_written_before_the_index(client, session_factory):
+    # populate() writes through the ORM, which doesn't maintain the full-text index
+    populate(session_factory, 5)
+    assert client.get("/api/itineraries/text-search", params={"q": "Benchmark"}).json() == []
+
+    with session_factory() as db:
+        assert fulltext.backfill(db) == 5
+        db.commit()
+        assert fulltext.backfill(db) == 0
+
+    hits = client.get("/api/itineraries/text-search", params={"q": "Benchmark Trip 3"}).json()
+    assert hits[0]["title"] == "Benchmark Trip 3"
+
+
+def test_text_search_answers_501_without_full_text_support(client, monkeypatch):
+    monkeypatch.setattr(fulltext, "_dialect_name", lambda db: "mysql")
+
+    response = client.get("/api/itineraries/text-search", params={"q": "beach"})
+
+    assert response.status_code == 501
+    assert response.json()["detail"] == "Full-text search is not available on mysql databases"
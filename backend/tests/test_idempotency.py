@@ -0,0 +1,111 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete
+
+import idempotency
+import models
+from benchmarks.bulk_ingest import make_payload
+
+
+def create(client, payload, key):
+    return client.post("/api/itineraries", json=payload, headers={"Idempotency-Key": key})
+
+
+def stored_keys(session_factory):
+    with session_factory() as db:
+        return {row.key: row.itinerary_id for row in db.query(models.IdempotencyKey)}
+
+
+def test_retry_with_the_same_key_replays_the_first_itinerary(client, session_factory):
+    first = create(client, make_payload(0), "retry")
+    second = create(client, make_payload(0), "retry")
+
+    assert first.status_code == second.status_code == 200
+    assert idempotency.REPLAYED_HEADER not in first.headers
+    assert second.headers[idempotency.REPLAYED_HEADER] == "true"
+    assert second.json() == first.json()
+    with session_factory() as db:
+        assert db.query(models.Itinerary).count() == 1
+
+
+def test_key_reused_for_another_payload_is_refused(client):
+    create(client, make_payload(0), "reused")
+
+    response = create(client, make_payload(1), "reused")
+
+    assert response.status_code == 422
+    assert response.json()["detail"] == "Idempotency-Key was already used for a different request"
+
+
+def test_losing_a_race_for_the_key_replays_the_winner(client, monkeypatch):
+    winner = create(client, make_payload(0), "race").json()
+    replay, calls = idempotency.replay, []
+
+    def miss_before_the_insert(db, key, fingerprint):
+        # As if the other request committed between our lookup and our insert
+        calls.append(key)
+        return None if len(calls) == 1 else replay(db, key, fingerprint)
+
+    monkeypatch.setattr(idempotency, "replay", miss_before_the_insert)
+    response = create(client, make_payload(0), "race")
+
+    assert response.status_code == 200
+    assert response.headers[idempotency.REPLAYED_HEADER] == "true"
+    assert response.json()["id"] == winner["id"]
+    assert len(calls) == 2
+
+
+def test_conflict_when_the_winner_cannot_be_replayed(client, monkeypatch):
+    create(client, make_payload(0), "conflict")
+    monkeypatch.setattr(idempotency, "replay", lambda db, key, fingerprint: None)
+
+    response = create(client, make_payload(0), "conflict")
+
+    assert response.status_code == 409
+
+
+def test_key_of_a_deleted_itinerary_is_replaced(client, session_factory):
+    create(client, make_payload(0), "dangling")
+    with session_factory() as db:
+        db.execute(delete(models.Itinerary))
+        db.commit()
+
+    # Another payload too: a key whose itinerary is gone is as good as expired
+    response = create(client, make_payload(1), "dangling")
+
+    assert response.status_code == 200
+    assert idempotency.REPLAYED_HEADER not in response.headers
+    assert response.json()["title"] == make_payload(1)["title"]
+    assert stored_keys(session_factory) == {"dangling": response.json()["id"]}
+    assert create(client, make_payload(1), "dangling").headers[idempotency.REPLAYED_HEADER] == "true"
+
+
+def test_key_does_not_replay_an_itinerary_that_took_its_id(client, session_factory):
+    first = create(client, make_payload(0), "stale").json()
+    with session_factory() as db:
+        db.execute(delete(models.Itinerary))
+        db.commit()
+    # SQLite hands the deleted itinerary's id to the next one
+    other = client.post("/api/itineraries", json=make_payload(1)).json()
+    assert other["id"] == first["id"]
+
+    response = create(client, make_payload(0), "stale")
+
+    assert response.status_code == 200
+    assert idempotency.REPLAYED_HEADER not in response.headers
+    assert response.json()["title"] == make_payload(0)["title"]
+    assert response.json()["id"] != other["id"]
+
+
+def test_create_purges_every_expired_key(client, session_factory):
+    expired = datetime.utcnow() - timedelta(seconds=idempotency.settings.IDEMPOTENCY_KEY_TTL + 60)
+    with session_factory() as db:
+        db.add_all([
+            models.IdempotencyKey(key=f"old-{i}", fingerprint="x", itinerary_id=i, created_at=expired)
+            for i in range(3)
+        ])
+        db.commit()
+
+    response = create(client, make_payload(0), "new")
+
+    assert stored_keys(session_factory) == {"new": response.json()["id"]}
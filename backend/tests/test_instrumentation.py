@@ -0,0 +1,32 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+import instrumentation
+
+
+def test_failed_statements_leave_no_start_time_behind(session_factory):
+    with session_factory() as db:
+        connection = db.connection()
+        for _ in range(3):
+            with pytest.raises(OperationalError):
+                db.execute(text("SELECT * FROM no_such_table"))
+            db.rollback()
+            connection = db.connection()
+        db.execute(text("SELECT 1"))
+
+        assert connection.info["query_started"] == []
+
+
+def test_statements_are_attributed_to_the_current_request(session_factory):
+    stats = instrumentation.RequestStats("/test")
+    token = instrumentation._current_request.set(stats)
+    try:
+        with session_factory() as db:
+            db.execute(text("SELECT 1"))
+            with pytest.raises(OperationalError):
+                db.execute(text("SELECT * FROM no_such_table"))
+    finally:
+        instrumentation._current_request.reset(token)
+
+    assert stats.queries == 1
@@ -0,0 +1,67 @@
+import base64
+from datetime import datetime, timedelta
+
+import pytest
+
+import models
+import pagination
+
+
+def add_itineraries(session_factory, created_at):
+    with session_factory() as db:
+        db.add_all([
+            models.Itinerary(title=f"Trip {i}", duration_nights=3, created_at=moment)
+            for i, moment in enumerate(created_at)
+        ])
+        db.commit()
+
+
+def walk(client, limit):
+    ids, cursor = [], None
+    while True:
+        params = {"limit": limit, **({"cursor": cursor} if cursor else {})}
+        page = client.get("/api/itineraries/page", params=params).json()
+        ids += [item["id"] for item in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return ids
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2024, 5, 17, 8, 30, 15, 250000)
+
+    cursor = pagination.encode_cursor(created_at, 42)
+
+    assert "=" not in cursor
+    assert pagination.decode_cursor(cursor) == (created_at, 42)
+
+
+@pytest.mark.parametrize("cursor", [
+    "not a cursor",
+    base64.urlsafe_b64encode(b'{"created_at": 1}').decode(),
+    base64.urlsafe_b64encode(b'["yesterday", 3]').decode(),
+    base64.urlsafe_b64encode(b'["2024-01-01T00:00:00", "x"]').decode(),
+])
+def test_tampered_cursor_is_a_bad_request(client, cursor):
+    with pytest.raises(ValueError):
+        pagination.decode_cursor(cursor)
+
+    response = client.get("/api/itineraries/page", params={"cursor": cursor})
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid pagination cursor"
+
+
+def test_pages_cover_every_itinerary_once_in_created_order(client, session_factory):
+    start = datetime(2024, 1, 1)
+    # Inserted out of creation order: ids 1-7 are created 7, 6, ... 1 seconds in
+    add_itineraries(session_factory, [start + timedelta(seconds=7 - i) for i in range(7)])
+
+    assert walk(client, 3) == [7, 6, 5, 4, 3, 2, 1]
+
+
+def test_ties_on_created_at_are_broken_by_id(client, session_factory):
+    moment = datetime(2024, 1, 1)
+    add_itineraries(session_factory, [moment] * 5 + [moment - timedelta(seconds=1)])
+
+    assert walk(client, 2) == [6, 1, 2, 3, 4, 5]
@@ -0,0 +1,36 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import profiler
+import settings
+
+
+@pytest.fixture
+def app(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "s3cret")
+    monkeypatch.setattr(settings, "PROFILE_DIR", str(tmp_path))
+    app = FastAPI()
+    profiler.install(app, "test")
+    return app
+
+
+def test_install_requires_an_admin_token(monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", None)
+
+    with pytest.raises(RuntimeError, match="ADMIN_TOKEN"):
+        profiler.install(FastAPI(), "test")
+
+
+@pytest.mark.parametrize("headers", [{}, {"X-Admin-Token": "wrong"}, {"X-Admin-Token": ""}])
+def test_admin_endpoints_reject_missing_or_wrong_tokens(app, headers):
+    client = TestClient(app)
+
+    assert client.get("/admin/profiler", headers=headers).status_code == 403
+    assert client.post("/admin/profiler/start", headers=headers).status_code == 403
+
+
+def test_admin_endpoints_accept_the_token(app):
+    response = TestClient(app).get("/admin/profiler", headers={"X-Admin-Token": "s3cret"})
+
+    assert response.status_code == 200
@@ -0,0 +1,161 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import async_api
+import changes
+import mcp_server
+import models
+import recommendation_index
+import recommendations
+import schemas
+from benchmarks.common import populate, override_db
+
+
+@pytest.fixture
+def mcp_client(session_factory):
+    populate(session_factory, 60)
+    override_db(mcp_server.app, mcp_server.get_db, session_factory)
+    yield TestClient(mcp_server.app, raise_server_exceptions=False)
+    mcp_server.app.dependency_overrides.clear()
+
+
+def batch(client, weights):
+    body = '{"queries": [{"nights": 3, "limit": 5, "weights": %s}]}' % weights
+    return client.post("/api/recommendations:batch", content=body, headers={"Content-Type": "application/json"})
+
+
+def test_batch_accepts_custom_weights(mcp_client):
+    response = batch(mcp_client, '{"pacing": 1, "coverage": 0.5}')
+
+    assert response.status_code == 200
+    items = response.json()["results"][0]["items"]
+    assert 0 < len(items) <= 5
+    assert [item["recommendation_score"] for item in items] == sorted(
+        (item["recommendation_score"] for item in items), reverse=True
+    )
+
+
+@pytest.mark.parametrize("weights", [
+    '{"pacing": NaN, "coverage": 1}',
+    '{"pacing": Infinity}',
+    '{"pacing": -Infinity, "coverage": 1}',
+])
+def test_batch_rejects_non_finite_weights(mcp_client, weights):
+    assert batch(mcp_client, weights).status_code == 422
+
+
+@pytest.mark.parametrize("weights, message", [
+    ({"pacing": 1, "speed": 1}, "Unknown weights: speed"),
+    ({"pacing": -1, "coverage": 1}, "non-negative"),
+    ({"pacing": 0}, "at least one positive"),
+    ({"pacing": float("nan")}, "finite"),
+    ({"pacing": float("inf")}, "finite"),
+])
+def test_invalid_weights_are_refused(weights, message):
+    query = schemas.RecommendationQuery.model_construct(nights=3, weights=weights)
+
+    with pytest.raises(ValueError, match=message):
+        recommendations._weights_key(query.weights)
+
+
+def test_batch_answers_400_for_unknown_weights(mcp_client):
+    response = batch(mcp_client, '{"speed": 1}')
+
+    assert response.status_code == 400
+    assert "Unknown weights" in response.json()["detail"]
+
+
+@pytest.fixture
+def async_client(session_factory, monkeypatch):
+    populate(session_factory, 30)
+    index = recommendation_index.RecommendationIndex()
+    monkeypatch.setattr(recommendation_index, "index", index)
+    monkeypatch.setattr(models, "ReadSessionLocal", session_factory)
+    app = FastAPI()
+    app.include_router(async_api.recommendation_router)
+    return TestClient(app), index
+
+
+def test_async_recommendations_build_the_index_off_the_event_loop(async_client, monkeypatch):
+    client, index = async_client
+    build, loops = index._build, []
+
+    def record_loop(db):
+        try:
+            loops.append(asyncio.get_running_loop())
+        except RuntimeError:
+            loops.append(None)
+        return build(db)
+
+    monkeypatch.setattr(index, "_build", record_loop)
+    response = client.get("/api/recommendations/3", params={"limit": 5})
+
+    assert response.status_code == 200
+    assert len(response.json()) == 5
+    assert loops == [None]
+
+
+def test_async_recommendations_answer_503_during_the_first_build(async_client):
+    client, index = async_client
+
+    with index._lock:
+        response = client.get("/api/recommendations/3")
+
+    assert response.status_code == 503
+    assert client.get("/api/recommendations/3").status_code == 200
+
+
+def assert_matches_sql(index, db):
+    for nights in range(2, 9):
+        for limit, min_score in ((None, None), (3, None), (None, 0.6), (5, 0.5)):
+            expected = recommendations.recommend(db, nights, limit=limit, min_score=min_score)
+            assert index.recommend(nights, limit=limit, min_score=min_score) == expected, (nights, limit, min_score)
+
+
+def test_index_follows_inserts_updates_and_deletes(session_factory):
+    populate(session_factory, 40)
+    index = recommendation_index.RecommendationIndex()
+    with session_factory() as db:
+        index.build(db)
+        assert_matches_sql(index, db)
+
+    populate(session_factory, 10, seed=1)
+    with session_factory() as db:
+        summary = models.ItinerarySummary
+        changes.record(db, range(41, 51))
+        # Move one itinerary to another bucket and rescore another in place
+        db.query(summary).filter(summary.itinerary_id == 1).update({"duration_nights": 8, "score": 0.99})
+        db.query(summary).filter(summary.itinerary_id == 2).update({"score": 0.01, "title": "Renamed"})
+        changes.record(db, [1, 2], changes.UPDATED)
+        # Empty the 2-night bucket, so requests for it fall back to 1-3 nights
+        deleted = [row.itinerary_id for row in db.query(summary.itinerary_id).filter(summary.duration_nights == 2)]
+        db.query(summary).filter(summary.itinerary_id.in_(deleted)).delete()
+        db.query(models.Itinerary).filter(models.Itinerary.id.in_(deleted)).delete()
+        changes.record(db, deleted, changes.DELETED)
+        db.commit()
+
+        assert index.refresh(db) == 12
+        assert deleted and 2 not in index.stats()["buckets"]
+        assert len(index) == 50 - len(deleted)
+        assert_matches_sql(index, db)
+
+
+def test_refresh_if_due_waits_for_the_interval(session_factory):
+    populate(session_factory, 10)
+    index = recommendation_index.RecommendationIndex(refresh_interval=3600)
+    with session_factory() as db:
+        index.refresh_if_due(db)
+        populate(session_factory, 1, seed=1)
+        changes.record(db, [11])
+        db.commit()
+
+        index.refresh_if_due(db)
+        assert len(index) == 10
+
+        index.refresh_interval = 0
+        index.refresh_if_due(db)
+        assert len(index) == 11
+        assert_matches_sql(index, db)
@@ -0,0 +1,38 @@
+import pytest
+
+import response_cache
+
+
+@pytest.fixture(params=["memory", "redis"])
+def cache(request):
+    if request.param == "memory":
+        backend = response_cache.MemoryBackend(max_entries=8, ttl=60)
+    else:
+        backend = response_cache.RedisBackend(response_cache.LocalRedisStub(), ttl=60)
+    return response_cache.ResponseCache(backend)
+
+
+def test_put_then_get_hits(cache):
+    generation = cache.generation()
+    assert cache.get("itinerary:1", generation) is None
+    cache.put("itinerary:1", b"{}", 0.0, generation)
+
+    assert cache.get("itinerary:1", cache.generation()).body == b"{}"
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (1, 1)
+
+
+def test_body_computed_before_an_invalidation_is_not_cached(cache):
+    generation = cache.generation()
+    assert cache.get("itinerary:1", generation) is None
+    # A write commits and invalidates while the miss is being recomputed
+    cache.invalidate()
+    cache.put("itinerary:1", b"stale", 0.0, generation)
+
+    assert cache.get("itinerary:1", cache.generation()) is None
+
+
+def test_invalidate_drops_cached_entries(cache):
+    cache.put("itinerary:1", b"{}", 0.0, cache.generation())
+    cache.invalidate()
+
+    assert cache.get("itinerary:1", cache.generation()) is None
@@ -0,0 +1,49 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+import async_api
+import main
+import models
+import search
+from benchmarks.common import populate
+from benchmarks.explain_search import CASES, query_plan
+
+
+@pytest.mark.parametrize("filters, indexes", CASES, ids=lambda case: ",".join(sorted(case)))
+def test_search_filters_are_answered_from_indexes(session_factory, filters, indexes):
+    populate(session_factory, 200)
+    statement = select(models.Itinerary.id).where(*search.itinerary_filters(**filters))
+    with session_factory() as db:
+        plan = query_plan(db.connection(), statement)
+
+    for index in indexes:
+        assert any(index in step for step in plan), (index, plan)
+
+
+def test_search_filters_combine(client, session_factory):
+    populate(session_factory, 50)
+    response = client.get("/api/itineraries/search", params={"min_nights": 3, "max_nights": 4, "transport_type": "Ferry"})
+
+    assert response.status_code == 200
+    with session_factory() as db:
+        expected = {
+            itinerary.id for itinerary in db.query(models.Itinerary)
+            if 3 <= itinerary.duration_nights <= 4 and any(t.transport_type == "Ferry" for t in itinerary.transfers)
+        }
+    assert expected and {item["id"] for item in response.json()} == expected
+
+
+def test_search_is_reachable_with_the_async_router_mounted_first(client, session_factory):
+    # ITINERARY_DB_MODE=async mounts async_api's routes ahead of main.py's, whose
+    # dependencies the client fixture points at the test database
+    app = FastAPI()
+    app.include_router(async_api.itinerary_router)
+    app.router.routes.extend(main.app.routes)
+    populate(session_factory, 10)
+
+    response = TestClient(app).get("/api/itineraries/search", params={"min_nights": 2})
+
+    assert response.status_code == 200
+    assert len(response.json()) == 10
@@ -0,0 +1,42 @@
+import numpy as np
+
+import similarity
+from benchmarks.common import populate
+
+
+def test_similar_uses_one_snapshot_across_a_rebuild(session_factory, tmp_path):
+    populate(session_factory, 30)
+    path = str(tmp_path / "index")
+    index = similarity.SimilarityIndex(path)
+    with session_factory() as db:
+        first = similarity.build(db, path, clusters=3)
+        state = index.snapshot()
+        expected = similarity.similar(db, 1, 5, state=state)
+
+        second = similarity.build(db, path, clusters=5)
+        assert second["build_id"] != first["build_id"]
+        # The request that started on the first build finishes on it
+        assert similarity.similar(db, 1, 5, state=state) == expected
+        assert len(state[1]["offsets"]) == first["clusters"] + 1
+        assert index.snapshot()[0]["build_id"] == second["build_id"]
+
+
+def test_load_retries_when_a_rebuild_swaps_the_directory(session_factory, tmp_path, monkeypatch):
+    populate(session_factory, 30)
+    path = str(tmp_path / "index")
+    index = similarity.SimilarityIndex(path)
+    with session_factory() as db:
+        similarity.build(db, path, clusters=3)
+        load, rebuilt = np.load, []
+
+        def load_during_rebuild(*args, **kwargs):
+            if not rebuilt:
+                rebuilt.append(similarity.build(db, path, clusters=5))
+            return load(*args, **kwargs)
+
+        monkeypatch.setattr(similarity.np, "load", load_during_rebuild)
+        meta, arrays = index.snapshot()
+
+    assert meta["build_id"] == rebuilt[0]["build_id"]
+    assert len(arrays["offsets"]) == meta["clusters"] + 1
+    assert len(arrays["centroids"]) == meta["clusters"]
@@ -0,0 +1,41 @@
+import models
+import synthetic_data
+from benchmarks.bulk_ingest import make_payload
+
+
+def test_api_creates_after_seeding(client, session_factory):
+    engine = session_factory.kw["bind"]
+    first = client.post("/api/itineraries", json=make_payload(0)).json()
+
+    synthetic_data.seed_synthetic(engine, 20, batch_size=8)
+    created = client.post("/api/itineraries", json=make_payload(1))
+
+    assert created.status_code == 200
+    assert created.json()["id"] == first["id"] + 21
+    with session_factory() as db:
+        assert db.query(models.Itinerary).count() == 22
+        assert db.query(models.ItinerarySummary).count() == 22
+        seeded = db.get(models.Itinerary, first["id"] + 1)
+        assert seeded.accommodations and seeded.activities
+        assert len(seeded.transfers) == len(seeded.accommodations) + 1
+
+
+def test_same_seed_same_rows(session_factory):
+    rows = [synthetic_data.ItineraryGenerator(seed=7).generate() for _ in range(2)]
+
+    assert rows[0] == rows[1]
+
+
+def test_seeding_alongside_another_writer(client, session_factory):
+    engine = session_factory.kw["bind"]
+    created = []
+
+    def write_between_transactions(written, count, elapsed):
+        created.append(client.post("/api/itineraries", json=make_payload(written)).status_code)
+
+    synthetic_data.seed_synthetic(engine, 2 * synthetic_data.BATCHES_PER_TRANSACTION, batch_size=1,
+                                  progress=write_between_transactions)
+
+    assert created == [200, 200]
+    with session_factory() as db:
+        assert db.query(models.Itinerary).count() == 2 * synthetic_data.BATCHES_PER_TRANSACTION + 2
@@ -0,0 +1,181 @@
+"""
+Columnar recommendation scoring with NumPy.
+
+A FeatureMatrix holds the scoring features of many itineraries as one
+(itineraries x features) array, with ids and night counts alongside. Building
+one costs a handful of grouped queries (no ORM objects, no per-itinerary
+loop), and scoring it under any set of weights is a few vector operations, so
+a matrix loaded once can be re-weighted for every user in a request.
+
+Features and scores are the same floats scoring.compute_features and
+scoring.score_features produce for each itinerary: the arithmetic below is the
+same IEEE operations, applied in the same order, per column.
+"""
+from itertools import chain
+import numpy as np
+from sqlalchemy import func, select, union
+import models
+import scoring
+
+
+class FeatureMatrix:
+    def __init__(self, ids, nights, features):
+        self.ids = ids
+        self.nights = nights
+        # One column per scoring.FEATURE_NAMES entry
+        self.features = features
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def from_aggregates(cls, ids, nights, activity_hours, activity_count, distinct_locations, transfer_legs):
+        """
+        Vectorized scoring.compute_features over parallel sequences of aggregates.
+        """
+        nights = np.asarray(nights, dtype=np.int64)
+        span = np.maximum(nights, 1).astype(np.float64)
+        hours_per_night = np.asarray(activity_hours, dtype=np.float64) / span
+        extra_legs = np.maximum(np.asarray(transfer_legs, dtype=np.int64) - scoring.BASE_TRANSFER_LEGS, 0)
+        target = scoring.TARGET_ACTIVITY_HOURS_PER_NIGHT
+        columns = {
+            "pacing": np.maximum(0.0, 1 - np.abs(hours_per_night - target) / target),
+            "diversity": np.minimum(np.asarray(distinct_locations, dtype=np.float64) / span, 1.0),
+            "transfer_ease": np.maximum(0.0, 1 - extra_legs / span),
+            "coverage": np.minimum(np.asarray(activity_count, dtype=np.float64) / span, 1.0),
+        }
+        features = np.column_stack([columns[name] for name in scoring.FEATURE_NAMES])
+        return cls(np.asarray(ids, dtype=np.int64), nights, features)
+
+    @classmethod
+    def load(cls, db, nights=None):
+        """
+        Features straight from the itinerary tables, for every itinerary or those
+        with the given night counts: one grouped query per child table, plus one
+        for distinct locations across activities and accommodations.
+        """
+        connection = db.connection()
+        itineraries = select(models.Itinerary.id, models.Itinerary.duration_nights).order_by(models.Itinerary.id)
+        if nights is not None:
+            itineraries = itineraries.where(models.Itinerary.duration_nights.in_(list(nights)))
+        rows = connection.execute(itineraries).all()
+        ids = np.fromiter((row.id for row in rows), dtype=np.int64, count=len(rows))
+        night_counts = np.fromiter((row.duration_nights for row in rows), dtype=np.int64, count=len(rows))
+
+        def scoped(statement, itinerary_id):
+            if nights is None:
+                return statement
+            return statement.where(itinerary_id.in_(
+                select(models.Itinerary.id).where(models.Itinerary.duration_nights.in_(list(nights)))
+            ))
+
+        activity = models.Activity
+        activity_hours, activity_count = np.zeros(len(ids)), np.zeros(len(ids), dtype=np.int64)
+        grouped = connection.execute(scoped(
+            select(activity.itinerary_id, func.sum(activity.duration_hours), func.count())
+            .group_by(activity.itinerary_id),
+            activity.itinerary_id,
+        )).all()
+        if grouped:
+            keys, hours, counts = zip(*grouped)
+            positions = np.searchsorted(ids, keys)
+            activity_hours[positions] = np.array(hours, dtype=np.float64)
+            activity_count[positions] = counts
+
+        transfer_legs = np.zeros(len(ids), dtype=np.int64)
+        grouped = connection.execute(scoped(
+            select(models.Transfer.itinerary_id, func.count()).group_by(models.Transfer.itinerary_id),
+            models.Transfer.itinerary_id,
+        )).all()
+        if grouped:
+            keys, counts = zip(*grouped)
+            transfer_legs[np.searchsorted(ids, keys)] = counts
+
+        locations = union(
+            scoped(select(activity.itinerary_id, activity.location), activity.itinerary_id),
+            scoped(select(models.Accommodation.itinerary_id, models.Accommodation.location),
+                   models.Accommodation.itinerary_id),
+        ).subquery()
+        distinct_locations = np.zeros(len(ids), dtype=np.int64)
+        grouped = connection.execute(
+            select(locations.c.itinerary_id, func.count()).group_by(locations.c.itinerary_id)
+        ).all()
+        if grouped:
+            keys, counts = zip(*grouped)
+            distinct_locations[np.searchsorted(ids, keys)] = counts
+
+        return cls.from_aggregates(ids, night_counts, activity_hours, activity_count, distinct_locations, transfer_legs)
+
+    @classmethod
+    def from_summaries(cls, db, nights=None, itinerary_ids=None):
+        """
+        Features from the aggregates already stored in itinerary_summary, in one
+        query, optionally only for the given night counts or itineraries.
+        """
+        summary = models.ItinerarySummary
+        statement = select(summary.itinerary_id, summary.duration_nights, summary.activity_hours,
+                           summary.activity_count, summary.distinct_locations, summary.transfer_legs)
+        if nights is not None:
+            statement = statement.where(summary.duration_nights.in_(list(nights)))
+        if itinerary_ids is not None:
+            statement = statement.where(summary.itinerary_id.in_(list(itinerary_ids)))
+        # Core rows through the session's connection skip the ORM result layer,
+        # which costs more than the query itself for plain columns
+        rows = db.connection().execute(statement).all()
+        # Flattened into one float64 array (ids and counts are exact far beyond
+        # any real table size), which is much faster than converting columns
+        data = np.fromiter(chain.from_iterable(rows), dtype=np.float64, count=6 * len(rows)).reshape(-1, 6)
+        return cls.from_aggregates(*data.T)
+
+    def nights_mask(self, nights):
+        """
+        Rows with exactly `nights`, or within one night when there are none, as
+        recommendations.recommend picks them.
+        """
+        mask = self.nights == nights
+        if not mask.any():
+            mask = np.abs(self.nights - nights) <= 1
+        return mask
+
+    def scores(self, weights=scoring.DEFAULT_WEIGHTS):
+        """
+        scoring.score_features for every row under `weights`, rounded the same way.
+        """
+        vector = [weights.get(name, 0) for name in scoring.FEATURE_NAMES]
+        total_weight = sum(vector)
+        if total_weight <= 0:
+            return np.zeros(len(self))
+        # Column by column, in the order score_features adds them up
+        weighted = np.zeros(len(self))
+        for column, weight in enumerate(vector):
+            weighted = weighted + self.features[:, column] * weight
+        return _round(weighted / total_weight)
+
+    def top(self, scores, limit=None, mask=None, min_score=None):
+        """
+        [(score, itinerary_id)] of the rows selected by `mask`, in recommendation
+        order (score descending, lower id first), cut to `limit`.
+        """
+        keep = np.ones(len(self), dtype=bool) if mask is None else mask.copy()
+        if min_score is not None:
+            keep &= scores >= min_score
+        candidates = np.flatnonzero(keep)
+        if limit is not None and len(candidates) > limit:
+            if limit <= 0:
+                return []
+            # Everything scoring at least the limit-th best score, ties included
+            threshold = -np.partition(-scores[candidates], limit - 1)[limit - 1]
+            candidates = candidates[scores[candidates] >= threshold]
+        order = candidates[np.lexsort((self.ids[candidates], -scores[candidates]))][:limit]
+        return [(float(score), int(itinerary_id)) for score, itinerary_id in zip(scores[order], self.ids[order])]
+
+
+def _round(values):
+    # np.round scales by 100 and rounds half to even, which can land on the other
+    # side of a tie than Python's round() (correctly rounded from the exact binary
+    # value); redo those few with round() itself
+    rounded = np.round(values, 2)
+    suspect = np.flatnonzero(np.abs(np.abs(values * 100 - np.trunc(values * 100)) - 0.5) < 1e-6)
+    for position in suspect:
+        rounded[position] = round(float(values[position]), 2)
+    return rounded